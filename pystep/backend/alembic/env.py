@@ -0,0 +1,46 @@
+"""
+Ambiente das migrações: usa o engine e os modelos da aplicação.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.database import engine, Base
+import app.models  # noqa: F401 (registra as tabelas em Base.metadata)
+
+
+if context.config.config_file_name is not None:
+    fileConfig(context.config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Gera o SQL sem conectar ao banco (alembic upgrade head --sql)"""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        # render_as_batch: o SQLite não altera colunas/constraints no lugar
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=True
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,92 @@
+"""Casos de teste, limites por exercício, recursos por submissão e job_id
+
+Bancos criados antes destas mudanças (Base.metadata.create_all não altera
+tabelas existentes). Em um banco novo, criado já com estas colunas, a
+revisão só registra a versão: o que já existe é pulado.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _exercise_columns() -> list:
+    return [
+        sa.Column("fail_fast", sa.Boolean(), nullable=True),
+        sa.Column("reference_solution", sa.Text(), nullable=True),
+        sa.Column("time_budget", sa.Float(), nullable=True),
+        sa.Column("memory_budget_mb", sa.Integer(), nullable=True),
+    ]
+
+
+def _submission_columns() -> list:
+    return [
+        sa.Column("cpu_user", sa.Float(), nullable=True),
+        sa.Column("cpu_system", sa.Float(), nullable=True),
+        sa.Column("peak_rss_kb", sa.Integer(), nullable=True),
+        sa.Column("stdout_bytes", sa.Integer(), nullable=True),
+        sa.Column("queue_time", sa.Float(), nullable=True),
+        sa.Column("job_id", sa.String(length=32), nullable=True),
+    ]
+
+
+def _columns(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table: str) -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    existing = _columns("exercises")
+    with op.batch_alter_table("exercises") as batch:
+        for column in _exercise_columns():
+            if column.name not in existing:
+                batch.add_column(column)
+
+    if "exercise_test_cases" not in tables:
+        op.create_table(
+            "exercise_test_cases",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("exercise_id", sa.Integer(), nullable=False),
+            sa.Column("input_data", sa.Text(), nullable=True),
+            sa.Column("expected_output", sa.Text(), nullable=False),
+            sa.Column("ordem", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["exercise_id"], ["exercises.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_exercise_test_cases_id", "exercise_test_cases", ["id"])
+        op.create_index("ix_exercise_test_cases_exercise_id", "exercise_test_cases", ["exercise_id"])
+
+    existing = _columns("submissions")
+    with op.batch_alter_table("submissions") as batch:
+        for column in _submission_columns():
+            if column.name not in existing:
+                batch.add_column(column)
+    if "ix_submissions_job_id" not in _indexes("submissions"):
+        op.create_index("ix_submissions_job_id", "submissions", ["job_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_submissions_job_id", table_name="submissions")
+    with op.batch_alter_table("submissions") as batch:
+        for column in reversed(_submission_columns()):
+            batch.drop_column(column.name)
+
+    op.drop_table("exercise_test_cases")
+
+    with op.batch_alter_table("exercises") as batch:
+        for column in reversed(_exercise_columns()):
+            batch.drop_column(column.name)
@@ -18,9 +18,12 @@ from app.schemas import UserCreate, UserLogin, Token, UserResponse
 
 router = APIRouter()
 
+# register/login são síncronos (def): o FastAPI os roda no threadpool,
+# então o hash da senha (bcrypt) e as consultas não bloqueiam o event loop
+
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """
     Registra um novo usuário.
     
@@ -59,7 +62,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+def login(credentials: UserLogin, db: Session = Depends(get_db)):
     """
     Autentica usuário e retorna token JWT.
     """
@@ -5,77 +5,215 @@ Execute Routes
 Endpoints para execução de código Python.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+from contextlib import aclosing
+from typing import Optional
 
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.database import get_db, run_db, SessionLocal
+from app.core.security import get_optional_user_id
 from app.models import User, Exercise, Submission
-from app.schemas import CodeExecutionRequest, CodeExecutionResponse
-from app.services.executor import executor
+from app.schemas import (
+    CodeExecutionRequest, CodeExecutionResponse, ExecutionJobResponse, FeedbackTicketResponse
+)
+from app.services.executor import executor, RESOURCE_FIELDS, ExecutionError, StreamCancelled
+from app.services.scheduler import scheduler, SchedulerBusy, BATCH, INTERACTIVE
 from app.services.ai_tutor import ai_tutor
+from app.services.feedback_tickets import feedback_tickets
+from app.services.job_queue import job_queue, wait_for_job
 
 
 router = APIRouter()
 
 
+def _client_key(user_id: Optional[int], client) -> str:
+    """Chave de fila/limite: o usuário autenticado ou o IP do cliente"""
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{client.host if client else 'unknown'}"
+
+
+def _too_many_requests(e: SchedulerBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=e.detail,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def _resource_fields(result: dict) -> dict:
+    """
+    Campos de uso de recursos do resultado do executor (None em
+    resultados do cache: nada rodou no sandbox)
+    """
+    return {field: result.get(field) for field in RESOURCE_FIELDS}
+
+
+def _save_feedback(submission_id: int, feedback: dict) -> None:
+    """Grava na submissão o feedback que ficou pronto em background"""
+    db = SessionLocal()
+    try:
+        db.query(Submission).filter(Submission.id == submission_id).update(
+            {Submission.feedback: str(feedback)}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
 @router.post("/", response_model=CodeExecutionResponse)
 async def execute_code(
     request: CodeExecutionRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Depends(get_optional_user_id)
 ):
     """
     Executa código Python do aluno e retorna resultado + feedback da IA.
     
+    Com mode="run" o código só é executado (fila interativa, RUN_TIMEOUT,
+    sem correção, IA ou histórico). Com mode="submit" (padrão):
+    
     Fluxo:
-    1. Busca exercício
-    2. Executa código no sandbox
-    3. Analisa com IA
-    4. Salva submissão
+    1. Valida o código e busca o exercício (em paralelo)
+    2. Executa no sandbox: todos os casos de teste em uma única ida
+       ao worker, ou a saída esperada do exercício, com os limites de
+       tempo/memória do exercício. A execução passa pelo scheduler, na
+       fila batch (429 + Retry-After se saturado)
+    3. Feedback imediato (regras locais, sucesso, cache); se a IA for
+       necessária, a resposta sai sem esperar por ela, com um
+       feedback_ticket (GET /feedback/{ticket})
+    4. Salva submissão (com uso de recursos), se autenticado; o feedback
+       da IA é gravado nela quando fica pronto
     5. Atualiza XP (se passou)
+    
+    Nenhuma etapa bloqueia o event loop.
     """
     
-    # Buscar exercício
-    exercise = db.query(Exercise).filter(Exercise.id == request.exercise_id).first()
+    # Validar/compilar o código enquanto o exercício é buscado no banco
+    prepare_task = asyncio.create_task(executor.prepare(request.code))
+    
+    exercise = await run_db(
+        lambda: db.query(Exercise)
+        .options(selectinload(Exercise.test_cases))
+        .filter(Exercise.id == request.exercise_id)
+        .first()
+    )
     if not exercise:
+        prepare_task.cancel()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Exercício não encontrado"
         )
     
-    # Executar código
-    result = executor.test_code(
-        code=request.code,
-        expected_output=exercise.expected_output
-    )
+    await prepare_task
+    key = _client_key(user_id, http_request.client)
+    
+    if request.mode == "run":
+        try:
+            async with scheduler.slot(key, INTERACTIVE):
+                result = await executor.run(
+                    request.code,
+                    input_data=request.input_data or exercise.input_data or "",
+                    timeout=settings.RUN_TIMEOUT
+                )
+        except SchedulerBusy as e:
+            raise _too_many_requests(e)
+        
+        return CodeExecutionResponse(
+            output=result["output"],
+            error=result["error"],
+            status=result["status"],
+            execution_time=result["execution_time"],
+            **_resource_fields(result)
+        )
+    
+    try:
+        async with scheduler.slot(key, BATCH):
+            if exercise.test_cases:
+                result = await executor.run_tests(
+                    request.code,
+                    cases=[
+                        {"input_data": case.input_data or "", "expected_output": case.expected_output}
+                        for case in exercise.test_cases
+                    ],
+                    fail_fast=exercise.fail_fast,
+                    **executor.budget(exercise)
+                )
+            else:
+                result = await executor.run(
+                    request.code,
+                    input_data=request.input_data or exercise.input_data or "",
+                    expected_output=exercise.expected_output,
+                    **executor.budget(exercise)
+                )
+    except SchedulerBusy as e:
+        raise _too_many_requests(e)
     
     # Contar tentativas do usuário neste exercício
-    # (Simplificado: em produção, pegar user_id do token)
     attempt_number = 1
+    if user_id is not None:
+        previous = await run_db(
+            lambda: db.query(Submission)
+            .filter(Submission.user_id == user_id, Submission.exercise_id == exercise.id)
+            .count()
+        )
+        attempt_number = previous + 1
     
-    # Análise da IA
-    ai_feedback = ai_tutor.analyze_code(
-        code=request.code,
-        execution_result=result,
-        exercise_description=exercise.descricao,
-        expected_output=exercise.expected_output,
-        attempt_number=attempt_number
+    # Feedback sem IA; se não houver, a IA roda depois da resposta
+    expected_output = executor.expected_output(exercise, result)
+    ai_feedback = await ai_tutor.instant_feedback(
+        request.code,
+        result,
+        expected_output,
+        attempt_number=attempt_number,
+        exercise_id=exercise.id
     )
     
     # Salvar submissão no banco
-    # submission = Submission(
-    #     user_id=user_id,  # Pegar do token
-    #     exercise_id=exercise.id,
-    #     code=request.code,
-    #     output=result["output"],
-    #     error=result["error"],
-    #     status=result["status"],
-    #     passed=result.get("passed", False),
-    #     execution_time=result["execution_time"],
-    #     feedback=str(ai_feedback),
-    #     attempt_number=attempt_number
-    # )
-    # db.add(submission)
-    # db.commit()
+    submission_id = None
+    if user_id is not None:
+        submission = Submission(
+            user_id=user_id,
+            exercise_id=exercise.id,
+            code=request.code,
+            output=result["output"],
+            error=result["error"],
+            status=result["status"],
+            passed=bool(result.get("passed")),
+            execution_time=result["execution_time"],
+            feedback=str(ai_feedback) if ai_feedback is not None else None,
+            attempt_number=attempt_number,
+            **_resource_fields(result)
+        )
+        
+        def save():
+            db.add(submission)
+            db.commit()
+            return submission.id
+        
+        submission_id = await run_db(save)
+    
+    feedback_ticket = None
+    if ai_feedback is None:
+        async def on_ready(feedback: dict) -> None:
+            if submission_id is not None:
+                await run_db(_save_feedback, submission_id, feedback)
+        
+        feedback_ticket = feedback_tickets.issue(
+            ai_tutor.deferred_analysis(
+                code=request.code,
+                execution_result=result,
+                exercise_description=exercise.descricao,
+                expected_output=expected_output,
+                attempt_number=attempt_number,
+                exercise_id=exercise.id
+            ),
+            on_ready=on_ready
+        ).ticket_id
     
     # Preparar resposta
     response = CodeExecutionResponse(
@@ -87,12 +225,154 @@ async def execute_code(
         expected=result.get("expected"),
         actual=result.get("actual"),
         feedback=ai_feedback,
-        xp_gained=ai_feedback.get("xp_gained", 0) if result.get("passed") else 0
+        feedback_ticket=feedback_ticket,
+        xp_gained=ai_feedback.get("xp_gained", 0) if ai_feedback and result.get("passed") else 0,
+        test_results=result.get("test_results"),
+        mismatch=result.get("mismatch"),
+        **_resource_fields(result)
     )
     
     return response
 
 
+@router.post("/jobs", response_model=ExecutionJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_execution(
+    request: CodeExecutionRequest,
+    user_id: Optional[int] = Depends(get_optional_user_id)
+):
+    """
+    Enfileira a execução na fila persistente (JOB_QUEUE_BACKEND) e
+    retorna o ID do job. O resultado, igual ao do POST /, é obtido em
+    GET /jobs/{job_id}.
+    
+    Os jobs são consumidos por workers separados (`python worker.py`)
+    ou pelos consumidores da própria API (JOB_QUEUE_LOCAL_CONSUMERS).
+    """
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, job_queue.pending) >= settings.JOB_QUEUE_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Fila de execuções cheia, tente novamente em instantes",
+            headers={"Retry-After": "5"}
+        )
+    
+    payload = {**request.model_dump(), "user_id": user_id}
+    job_id = await loop.run_in_executor(None, job_queue.enqueue, payload)
+    return ExecutionJobResponse(job_id=job_id, status="queued")
+
+
+@router.get("/jobs/{job_id}", response_model=ExecutionJobResponse)
+async def get_execution_job(job_id: str, wait: float = 0):
+    """
+    Estado de um job enfileirado.
+    
+    Com `wait` (segundos, máx. 30) a resposta aguarda o job terminar
+    (long polling): volta assim que o resultado fica pronto.
+    """
+    loop = asyncio.get_running_loop()
+    wait = min(max(wait, 0), 30)
+    if wait:
+        job = await wait_for_job(job_id, wait)
+    else:
+        job = await loop.run_in_executor(None, job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado ou expirado"
+        )
+    return ExecutionJobResponse(**job)
+
+
+@router.get("/feedback/{ticket_id}", response_model=FeedbackTicketResponse)
+async def get_feedback(ticket_id: str, wait: float = 0):
+    """
+    Feedback da IA de uma submissão respondida com feedback_ticket.
+    
+    Com `wait` (segundos, máx. 30) a resposta aguarda a análise terminar
+    (long polling): volta assim que o feedback fica pronto.
+    
+    Com FEEDBACK_CACHE_BACKEND=memory, só o processo que emitiu o ticket
+    o conhece (404 nos demais workers); use o backend redis com mais de
+    um worker da API.
+    """
+    ticket = await feedback_tickets.wait(ticket_id, min(max(wait, 0), 30))
+    if ticket is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Feedback não encontrado ou expirado"
+        )
+    return FeedbackTicketResponse(**ticket)
+
+
+@router.websocket("/stream")
+async def execute_stream(websocket: WebSocket, db: Session = Depends(get_db)):
+    """
+    Executa código e envia a saída enquanto o programa roda.
+    
+    Protocolo:
+    1. Cliente envia {"code": str, "exercise_id": int | null, "input_data": str}
+    2. Servidor envia {"type": "stdout" | "stderr", "data": str} por trecho
+    3. Servidor envia {"type": "result", "status", "error", "execution_time",
+       "passed", "mismatch"} e fecha a conexão; se a execução não puder
+       terminar (fila cheia, cliente lento), envia {"type": "error",
+       "detail"} no lugar do veredito
+    
+    Com exercise_id, o veredito compara com input_data/expected_output do
+    exercício, com os limites dele (casos de teste ocultos são corrigidos
+    apenas no POST /).
+    """
+    await websocket.accept()
+    
+    try:
+        request = await websocket.receive_json()
+        code = request.get("code", "")
+        input_data = request.get("input_data") or ""
+        expected_output = None
+        # Sem exercício é uma execução livre: timeout curto
+        budget = {"timeout": settings.RUN_TIMEOUT, "memory_mb": None}
+        
+        exercise_id = request.get("exercise_id")
+        if exercise_id is not None:
+            exercise = await run_db(
+                lambda: db.query(Exercise).filter(Exercise.id == exercise_id).first()
+            )
+            if not exercise:
+                await websocket.send_json({"type": "error", "detail": "Exercício não encontrado"})
+                await websocket.close(code=1008)
+                return
+            input_data = input_data or exercise.input_data or ""
+            expected_output = exercise.expected_output
+            budget = executor.budget(exercise)
+        
+        try:
+            async with scheduler.slot(_client_key(None, websocket.client), INTERACTIVE):
+                stream = executor.stream(code, input_data, expected_output, **budget)
+                async with aclosing(stream) as frames:
+                    async for frame in frames:
+                        await websocket.send_json(frame)
+        except SchedulerBusy as e:
+            await websocket.send_json({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
+            await websocket.close(code=1013)  # Try Again Later
+            return
+        except StreamCancelled:
+            # Cliente lento: a saída não foi lida dentro do tempo limite
+            await websocket.send_json({
+                "type": "error",
+                "detail": "Execução interrompida: a saída não foi lida a tempo"
+            })
+            await websocket.close(code=1011)
+            return
+        except ExecutionError as e:
+            await websocket.send_json({"type": "error", "detail": f"Erro ao executar o código: {e}"})
+            await websocket.close(code=1011)
+            return
+        
+        await websocket.close()
+    
+    except WebSocketDisconnect:
+        pass
+
+
 @router.post("/hint")
 async def get_hint(
     request: dict,
@@ -104,7 +384,9 @@ async def get_hint(
     exercise_id = request.get("exercise_id")
     current_code = request.get("current_code", "")
     
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    exercise = await run_db(
+        lambda: db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    )
     if not exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,3 +397,17 @@ async def get_hint(
     hint = exercise.dica or "Continue tentando! Você está no caminho certo."
     
     return {"hint": hint}
+
+
+@router.get("/stats")
+async def execution_stats():
+    """
+    Estatísticas do executor (tamanho do pool, caches), da fila e da IA
+    tutora (chamadas, cache de feedback, feedback em background).
+    """
+    return {
+        **executor.stats(),
+        "scheduler": scheduler.stats(),
+        "ai_tutor": ai_tutor.stats(),
+        "feedback_tickets": feedback_tickets.stats()
+    }
@@ -10,8 +10,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.models import Exercise
-from app.schemas import ExerciseResponse, ExerciseCreate
+from app.models import Exercise, ExerciseTestCase
+from app.schemas import ExerciseResponse, ExerciseCreate, RegradeJobResponse
+from app.services.regrade import regrade_service
 
 
 router = APIRouter()
@@ -55,11 +56,57 @@ async def create_exercise(exercise_data: ExerciseCreate, db: Session = Depends(g
     """
     Cria um novo exercício.
     
+    Aceita casos de teste ocultos em "test_cases"; se houver, a correção
+    usa todos eles em vez de input_data/expected_output.
+    
     (Admin only - adicionar autenticação depois)
     """
-    new_exercise = Exercise(**exercise_data.dict())
+    new_exercise = Exercise(**exercise_data.dict(exclude={"test_cases"}))
+    new_exercise.test_cases = [
+        ExerciseTestCase(**case.dict()) for case in exercise_data.test_cases
+    ]
     db.add(new_exercise)
     db.commit()
     db.refresh(new_exercise)
     
     return new_exercise
+
+
+@router.post(
+    "/{exercise_id}/regrade",
+    response_model=RegradeJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def regrade_exercise(exercise_id: int, db: Session = Depends(get_db)):
+    """
+    Recorrige todas as submissões do exercício (depois de corrigir
+    expected_output ou os casos de teste).
+
+    Roda em background pela fila batch do scheduler, sem travar as
+    execuções dos alunos; o progresso fica em GET /regrade/{job_id}.
+    Para recorreções grandes fora da API, use `python regrade.py`.
+
+    (Admin only - adicionar autenticação depois)
+    """
+    if not db.query(Exercise.id).filter(Exercise.id == exercise_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exercício não encontrado"
+        )
+
+    job = regrade_service.start(exercise_id)
+    return RegradeJobResponse(**job.view())
+
+
+@router.get("/regrade/{job_id}", response_model=RegradeJobResponse)
+async def get_regrade_job(job_id: str):
+    """
+    Progresso de uma recorreção.
+    """
+    job = regrade_service.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Recorreção não encontrada"
+        )
+    return RegradeJobResponse(**job.view())
@@ -33,11 +33,39 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
+    AI_TUTOR_TIMEOUT: float = 15  # Prazo de cada chamada à IA (s)
+    AI_TUTOR_MAX_RETRIES: int = 1
+    AI_TUTOR_MAX_CONCURRENCY: int = 8  # Chamadas simultâneas (e conexões do pool)
+    
+    # Cache do feedback da IA (app.services.feedback_cache)
+    # "memory" ou "redis" (compartilhado, usa REDIS_URL); vale também para
+    # os tickets de feedback em background: use redis com vários workers
+    FEEDBACK_CACHE_BACKEND: str = "memory"
+    FEEDBACK_CACHE_SIZE: int = 2048  # Entradas no LRU em processo
+    FEEDBACK_CACHE_TTL: int = 86400  # Validade (s) nos dois níveis
+    FEEDBACK_TICKET_TTL: int = 600  # Feedback em background disponível por (s)
     
     # Sandbox
     EXECUTION_TIMEOUT: int = 2
-    MAX_MEMORY_MB: int = 128
+    RUN_TIMEOUT: float = 1  # Botão Executar (sem correção)
+    MAX_MEMORY_MB: int = 128  # RLIMIT_AS por execução (além do uso do worker)
+    MAX_OUTPUT_CHARS: int = 65536  # Saída maior é truncada e a execução encerrada
     ALLOWED_IMPORTS: str = "math,random,datetime,json"
+    SANDBOX_POOL_SIZE: int = 0  # 0 = número de CPUs
+    SANDBOX_MAX_JOBS_PER_WORKER: int = 200
+    SANDBOX_FORK_PER_JOB: bool = True  # Processo novo (fork) por submissão: isolamento total
+    EXECUTION_LINE_BUDGET: int = 0  # Linhas executadas por caso (0 = só o tempo limite)
+    CODE_CACHE_SIZE: int = 1024  # Código validado/compilado em memória
+    EXECUTION_DETERMINISTIC: bool = True  # random com semente fixa e relógio congelado
+    EXECUTION_SEED: int = 42
+    RESULT_CACHE_SIZE: int = 4096  # Resultados de correção (modo determinístico)
+    
+    # Limites por exercício calibrados pela solução de referência (calibrate.py)
+    EXECUTION_BUDGET_RUNS: int = 20  # Execuções da solução por calibração
+    EXECUTION_BUDGET_FACTOR: float = 3.0  # Limite = fator x p95 da solução
+    EXECUTION_BUDGET_MIN_TIMEOUT: float = 0.5  # Folga para a carga da máquina
+    EXECUTION_BUDGET_MAX_TIMEOUT: float = 10.0
+    EXECUTION_BUDGET_MIN_MEMORY_MB: int = 32  # Teto: MAX_MEMORY_MB
     
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
@@ -47,10 +75,27 @@ class Settings(BaseSettings):
         """Converte string de CORS_ORIGINS em lista"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
     
-    # Rate Limiting
+    # Rate Limiting (execuções por usuário na janela, em segundos)
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60
     
+    # Fila de execução (app.services.scheduler)
+    SCHEDULER_QUEUE_SIZE: int = 64  # Submissões aguardando um worker (acima disso: 429)
+    SCHEDULER_INTERACTIVE_QUEUE_SIZE: int = 32  # Execuções do botão Executar
+    SCHEDULER_INTERACTIVE_WEIGHT: int = 4
+    SCHEDULER_BATCH_WEIGHT: int = 1
+    SCHEDULER_INTERACTIVE_RESERVED: int = 1  # Slots que submissões não ocupam
+    SCHEDULER_MAX_RUNNING_PER_USER: int = 1
+    SCHEDULER_MAX_QUEUED_PER_USER: int = 3
+    
+    # Fila persistente de execuções (app.services.job_queue)
+    JOB_QUEUE_BACKEND: str = "memory"  # "memory" (um nó) ou "redis"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    JOB_QUEUE_LOCAL_CONSUMERS: int = 1  # Consumidores dentro da API (0 = só worker.py)
+    JOB_QUEUE_MAX_PENDING: int = 1000  # Acima disso: 429
+    JOB_RESULT_TTL: int = 3600  # Resultados ficam disponíveis por (s)
+    JOB_LEASE_SECONDS: int = 120  # Job "running" há mais que isso volta para a fila
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
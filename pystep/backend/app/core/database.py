@@ -5,10 +5,13 @@ Database Configuration
 Configuração do SQLAlchemy e sessões do banco de dados.
 """
 
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Generator, Callable, TypeVar
 
 from app.core.config import settings
 
@@ -26,6 +29,11 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para modelos
 Base = declarative_base()
 
+# Threads dedicadas ao banco (mesmo tamanho do pool de conexões padrão)
+_db_threads = ThreadPoolExecutor(max_workers=15, thread_name_prefix="db")
+
+T = TypeVar("T")
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -41,3 +49,14 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def run_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Executa uma operação síncrona do banco sem bloquear o event loop.
+    
+    Uso:
+        exercise = await run_db(db.get, Exercise, exercise_id)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_threads, functools.partial(fn, *args, **kwargs))
@@ -7,6 +7,8 @@ Funções para autenticação, hashing de senha e JWT.
 
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
@@ -16,6 +18,9 @@ from app.core.config import settings
 # Contexto para hash de senhas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Extrai o Bearer token do header Authorization (opcional)
+bearer_scheme = HTTPBearer(auto_error=False)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha está correta"""
@@ -63,3 +68,20 @@ def decode_access_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
+
+
+def get_optional_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Optional[int]:
+    """
+    Dependency: ID do usuário do token, ou None sem token válido.
+    """
+    if credentials is None:
+        return None
+    payload = decode_access_token(credentials.credentials)
+    if not payload or payload.get("sub") is None:
+        return None
+    try:
+        return int(payload["sub"])
+    except (TypeError, ValueError):
+        return None
@@ -6,6 +6,8 @@ Ponto de entrada principal da API PyStep.
 Configura rotas, middleware e inicialização.
 """
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -14,6 +16,12 @@ from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.core.database import engine, Base
 from app.api.routes import auth, lessons, exercises, execute, progress, user_lessons
+from app.services.executor import executor
+from app.services.ai_tutor import ai_tutor
+from app.services.feedback_tickets import feedback_tickets
+from app.services.job_queue import job_queue
+from app.services.job_worker import JobWorker
+from app.services.scheduler import scheduler
 
 
 @asynccontextmanager
@@ -21,10 +29,30 @@ async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação"""
     # Startup: Criar tabelas do banco
     Base.metadata.create_all(bind=engine)
+    executor.start()
+    # Consumidores da fila de execuções dentro da API
+    job_worker = None
+    if settings.JOB_QUEUE_LOCAL_CONSUMERS > 0:
+        job_worker = JobWorker(
+            job_queue,
+            executor,
+            concurrency=settings.JOB_QUEUE_LOCAL_CONSUMERS,
+            scheduler=scheduler,
+            loop=asyncio.get_running_loop()
+        )
+        job_worker.start()
     print("🚀 PyStep API iniciada!")
     print(f"📚 Banco de dados: {settings.DATABASE_URL}")
+    print(f"🧪 Sandbox: {executor.pool.size} workers")
+    print(f"📬 Fila de execuções: {settings.JOB_QUEUE_BACKEND}")
     yield
     # Shutdown
+    if job_worker:
+        # Jobs em andamento ainda usam o event loop (slots do scheduler)
+        await asyncio.get_running_loop().run_in_executor(None, job_worker.stop)
+    executor.shutdown()
+    await feedback_tickets.aclose()
+    await ai_tutor.aclose()
     print("👋 PyStep API encerrada")
 
 
@@ -70,16 +70,43 @@ class Exercise(Base):
     xp_reward = Column(Integer, default=10)
     ordem = Column(Integer, nullable=False)
     difficulty = Column(String(50), default="easy")  # easy, medium, hard
+    fail_fast = Column(Boolean, default=False)  # Parar no primeiro caso de teste que falhar
+    reference_solution = Column(Text)  # Solução de referência (calibra os limites)
+    time_budget = Column(Float)  # Tempo limite por caso (s); None = EXECUTION_TIMEOUT
+    memory_budget_mb = Column(Integer)  # Memória por execução; None = MAX_MEMORY_MB
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relacionamentos
     lesson = relationship("Lesson", back_populates="exercises")
     submissions = relationship("Submission", back_populates="exercise")
+    test_cases = relationship(
+        "ExerciseTestCase",
+        back_populates="exercise",
+        cascade="all, delete-orphan",
+        order_by="ExerciseTestCase.ordem"
+    )
     
     def __repr__(self):
         return f"<Exercise {self.id} - {self.titulo}>"
 
 
+class ExerciseTestCase(Base):
+    """Caso de teste oculto de um exercício"""
+    __tablename__ = "exercise_test_cases"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False, index=True)
+    input_data = Column(Text, default="")
+    expected_output = Column(Text, nullable=False)
+    ordem = Column(Integer, default=0)
+    
+    # Relacionamentos
+    exercise = relationship("Exercise", back_populates="test_cases")
+    
+    def __repr__(self):
+        return f"<ExerciseTestCase {self.id} - Ex:{self.exercise_id}>"
+
+
 class UserProgress(Base):
     """Progresso do usuário nas lições"""
     __tablename__ = "user_progress"
@@ -112,9 +139,16 @@ class Submission(Base):
     error = Column(Text)
     status = Column(String(50))  # success, error
     passed = Column(Boolean, default=False)
-    execution_time = Column(Float)
+    execution_time = Column(Float)  # Tempo no worker, sem a fila
+    cpu_user = Column(Float)
+    cpu_system = Column(Float)
+    peak_rss_kb = Column(Integer)
+    stdout_bytes = Column(Integer)
+    queue_time = Column(Float)  # Espera por um worker livre
     feedback = Column(Text)  # Feedback da IA
     attempt_number = Column(Integer, default=1)
+    # Job da fila que gerou a submissão: um job reprocessado não duplica
+    job_id = Column(String(32), unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relacionamentos
@@ -6,7 +6,7 @@ Schemas para validação de entrada/saída da API.
 """
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -69,6 +69,12 @@ class LessonResponse(LessonBase):
 
 # ============= EXERCISE SCHEMAS =============
 
+class ExerciseTestCaseCreate(BaseModel):
+    input_data: str = ""
+    expected_output: str
+    ordem: int = 0
+
+
 class ExerciseBase(BaseModel):
     titulo: str
     descricao: str
@@ -79,15 +85,20 @@ class ExerciseBase(BaseModel):
     xp_reward: int = 10
     ordem: int
     difficulty: str = "easy"
+    fail_fast: bool = False
 
 
 class ExerciseCreate(ExerciseBase):
     lesson_id: int
+    test_cases: List[ExerciseTestCaseCreate] = []  # Casos ocultos (não retornados na resposta)
+    reference_solution: Optional[str] = None  # Não retornada na resposta (ver calibrate.py)
 
 
 class ExerciseResponse(ExerciseBase):
     id: int
     lesson_id: int
+    time_budget: Optional[float] = None  # Limites calibrados (None = padrão global)
+    memory_budget_mb: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -100,6 +111,8 @@ class CodeExecutionRequest(BaseModel):
     code: str
     exercise_id: int
     input_data: str = ""
+    # "run": execução rápida sem correção; "submit": corrigida (IA, XP, histórico)
+    mode: Literal["run", "submit"] = "submit"
 
 
 class CodeExecutionResponse(BaseModel):
@@ -111,7 +124,47 @@ class CodeExecutionResponse(BaseModel):
     expected: Optional[str] = None
     actual: Optional[str] = None
     feedback: Optional[dict] = None
+    # Feedback da IA ainda sendo gerado: GET /api/execute/feedback/{ticket}
+    feedback_ticket: Optional[str] = None
     xp_gained: Optional[int] = 0
+    test_results: Optional[List[dict]] = None  # Resultado por caso de teste
+    mismatch: Optional[dict] = None  # Primeira divergência: {"line", "column", ...}
+    # Uso de recursos da execução (None quando o worker foi finalizado)
+    cpu_user: Optional[float] = None
+    cpu_system: Optional[float] = None
+    peak_rss_kb: Optional[int] = None
+    stdout_bytes: Optional[int] = None
+    queue_time: Optional[float] = None
+
+
+class ExecutionJobResponse(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "done" ou "failed"
+    result: Optional[CodeExecutionResponse] = None
+    error: Optional[str] = None
+
+
+class FeedbackTicketResponse(BaseModel):
+    """Feedback da IA entregue depois do veredito"""
+    ticket_id: str
+    status: str  # "pending", "ready" ou "failed"
+    feedback: Optional[dict] = None
+    error: Optional[str] = None
+    elapsed: float
+
+
+class RegradeJobResponse(BaseModel):
+    """Progresso da recorreção das submissões de um exercício"""
+    job_id: str
+    exercise_id: int
+    status: str  # "queued", "running", "done" ou "failed"
+    total: int
+    processed: int
+    changed: int  # Submissões cujo resultado mudou
+    errors: int
+    error: Optional[str] = None
+    elapsed: float
+    rate: float  # Submissões por segundo
 
 
 # ============= PROGRESS SCHEMAS =============
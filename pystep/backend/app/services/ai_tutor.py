@@ -4,13 +4,33 @@ AI Tutor Service
 
 Sistema de feedback inteligente usando OpenAI.
 Analisa código do aluno e fornece feedback personalizado.
+
+Respostas da IA ficam em cache por exercício e assinatura da falha
+(ver app.services.feedback_cache): erros repetidos não custam tokens.
+Antes disso, os erros comuns de iniciantes são resolvidos por regras
+locais (ver app.services.error_classifier), sem chamada de rede.
+
+No caminho assíncrono (rotas), as chamadas à OpenAI usam um pool de
+conexões compartilhado, têm prazo (AI_TUTOR_TIMEOUT) e concorrência
+limitada (AI_TUTOR_MAX_CONCURRENCY). A rota de submissão não espera a
+IA: responde com instant_feedback() ou com um ticket, e
+deferred_analysis() roda em background (ver
+app.services.feedback_tickets).
 """
 
+import copy
 import json
-from typing import Dict, Any, Optional
-from openai import OpenAI
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, Set
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
 
 from app.core.config import settings
+from app.services.error_classifier import ErrorClassifier
+from app.services.feedback_cache import create_feedback_cache
 
 
 class AITutor:
@@ -25,8 +45,45 @@ class AITutor:
     """
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+        self.timeout = settings.AI_TUTOR_TIMEOUT
+        self.max_concurrency = max(1, settings.AI_TUTOR_MAX_CONCURRENCY)
+        self.client = None
+        self.async_client = None
+        if settings.OPENAI_API_KEY:
+            self.client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=self.timeout,
+                max_retries=settings.AI_TUTOR_MAX_RETRIES
+            )
+            # Um pool de conexões (keep-alive) para todas as requisições
+            self.async_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=self.timeout,
+                max_retries=settings.AI_TUTOR_MAX_RETRIES,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency,
+                        max_keepalive_connections=self.max_concurrency
+                    ),
+                    timeout=self.timeout
+                )
+            )
         self.model = settings.OPENAI_MODEL
+        self.feedback_cache = create_feedback_cache()
+        self.classifier = ErrorClassifier()
+        # Semáforo do event loop em uso (criado no primeiro uso)
+        self._limiter: Optional[asyncio.Semaphore] = None
+        self._limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Chamadas à IA em andamento (encerradas no shutdown)
+        self._background: Set[asyncio.Task] = set()
+        # Single-flight: uma chamada à IA por chave de cache em andamento;
+        # pedidos iguais simultâneos esperam por ela
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._inflight_sync: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.coalesced = 0
+        self.completions = 0
+        self.failures = 0
     
     def analyze_code(
         self,
@@ -34,7 +91,8 @@ class AITutor:
         execution_result: Dict[str, Any],
         exercise_description: str,
         expected_output: str,
-        attempt_number: int = 1
+        attempt_number: int = 1,
+        exercise_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Analisa o código do aluno e gera feedback inteligente.
@@ -45,6 +103,8 @@ class AITutor:
             exercise_description: Descrição do exercício
             expected_output: Saída esperada
             attempt_number: Número da tentativa (para dicas progressivas)
+            exercise_id: Exercício (chave do cache de feedback; sem ele
+                a IA é sempre consultada)
             
         Returns:
             {
@@ -56,6 +116,11 @@ class AITutor:
             }
         """
         
+        # Erros comuns: regras locais, sem IA
+        classified = self._classify(code, execution_result, expected_output)
+        if classified is not None:
+            return classified
+        
         # Se não tiver API key, usar feedback básico
         if not self.client:
             return self._basic_feedback(execution_result, expected_output)
@@ -70,9 +135,70 @@ class AITutor:
             execution_result,
             exercise_description,
             expected_output,
-            attempt_number
+            attempt_number,
+            exercise_id
+        )
+    
+    async def instant_feedback(
+        self,
+        code: str,
+        execution_result: Dict[str, Any],
+        expected_output: str,
+        attempt_number: int = 1,
+        exercise_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Feedback que não depende de chamar a IA: regras locais, sucesso,
+        feedback básico (sem API key) ou cache. None se a IA é necessária.
+        """
+        classified = self._classify(code, execution_result, expected_output)
+        if classified is not None:
+            return classified
+        
+        if not self.async_client:
+            return self._basic_feedback(execution_result, expected_output)
+        
+        if execution_result.get("passed"):
+            return self._success_feedback(code, execution_result)
+        
+        key = self.feedback_cache.key(exercise_id, execution_result, expected_output, attempt_number)
+        return await self.feedback_cache.get_async(key)
+    
+    async def deferred_analysis(
+        self,
+        code: str,
+        execution_result: Dict[str, Any],
+        exercise_description: str,
+        expected_output: str,
+        attempt_number: int = 1,
+        exercise_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Análise da IA para entrega depois do veredito (ver
+        app.services.feedback_tickets): espera a resposta até
+        AI_TUTOR_TIMEOUT. Chamar depois de instant_feedback() retornar
+        None.
+        """
+        return await self._ai_analysis_async(
+            code,
+            execution_result,
+            exercise_description,
+            expected_output,
+            attempt_number,
+            exercise_id
         )
     
+    def _classify(
+        self,
+        code: str,
+        execution_result: Dict[str, Any],
+        expected_output: str
+    ) -> Optional[Dict[str, Any]]:
+        """Feedback das regras locais para falhas comuns, ou None"""
+        if execution_result.get("passed"):
+            return None
+        return self.classifier.classify(code, execution_result, expected_output)
+    
     def _basic_feedback(
         self,
         execution_result: Dict[str, Any],
@@ -93,9 +219,18 @@ class AITutor:
         expected = expected_output.strip()
         
         if actual != expected:
+            mismatch = execution_result.get("mismatch")
+            failed_case = execution_result.get("failed_case")
+            if failed_case:
+                # Caso de teste oculto: só a posição da divergência
+                hint = f"O caso de teste {failed_case['case']} falhou."
+            else:
+                hint = f"Esperado: '{expected}'\nObtido: '{actual}'"
+            if mismatch:
+                hint += f"\nPrimeira diferença: linha {mismatch['line']}, coluna {mismatch['column']}"
             return {
                 "feedback": "⚠️ Seu código executa, mas a saída não está correta.",
-                "hint": f"Esperado: '{expected}'\nObtido: '{actual}'",
+                "hint": hint,
                 "encouragement": "Você está no caminho certo! Ajuste a lógica.",
                 "severity": "warning",
                 "suggestions": ["Compare sua saída com o esperado", "Revise a lógica"]
@@ -141,15 +276,21 @@ class AITutor:
             "xp_gained": 10 + (5 if not suggestions else 0)  # XP bônus para código limpo
         }
     
-    def _ai_analysis(
+    def _analysis_messages(
         self,
         code: str,
         execution_result: Dict[str, Any],
         exercise_description: str,
         expected_output: str,
         attempt_number: int
-    ) -> Dict[str, Any]:
-        """Análise usando IA (OpenAI)"""
+    ) -> list:
+        """Monta as mensagens enviadas à IA para análise do código"""
+        
+        # Exercício com casos de teste: a entrada do caso que falhou
+        failed_case = execution_result.get("failed_case")
+        case_input = ""
+        if failed_case and failed_case["input_data"]:
+            case_input = f"**Entrada do caso de teste que falhou:**\n{failed_case['input_data']}\n\n"
         
         # Construir prompt para a IA
         prompt = f"""Você é um professor de Python paciente e encorajador. Analise o código do aluno e forneça feedback construtivo.
@@ -157,7 +298,7 @@ class AITutor:
 **Exercício:**
 {exercise_description}
 
-**Saída Esperada:**
+{case_input}**Saída Esperada:**
 {expected_output}
 
 **Código do Aluno:**
@@ -189,33 +330,190 @@ Responda em JSON:
 }}
 """
         
+        return [
+            {"role": "system", "content": "Você é um professor de Python especializado em ensino progressivo para iniciantes."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _parse_analysis(self, content: str) -> Dict[str, Any]:
+        """Extrai o JSON de feedback da resposta da IA"""
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0]
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0]
+        
+        return json.loads(content.strip())
+    
+    def _ai_analysis(
+        self,
+        code: str,
+        execution_result: Dict[str, Any],
+        exercise_description: str,
+        expected_output: str,
+        attempt_number: int,
+        exercise_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Análise usando IA (OpenAI), consultando o cache de feedback antes.
+        
+        Threads com a mesma chave de cache ao mesmo tempo esperam a
+        chamada da primeira em vez de repetir o mesmo prompt.
+        """
+        key = self.feedback_cache.key(exercise_id, execution_result, expected_output, attempt_number)
+        cached = self.feedback_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        with self._inflight_lock:
+            pending = self._inflight_sync.get(key) if key is not None else None
+            if pending is not None:
+                self.coalesced += 1
+            elif key is not None:
+                self._inflight_sync[key] = future = Future()
+        
+        if pending is not None:
+            try:
+                return copy.deepcopy(pending.result(timeout=self.timeout))
+            except Exception:
+                # Falha ou demora da chamada da outra thread
+                return self._basic_feedback(execution_result, expected_output)
+        
+        feedback = None
         try:
+            messages = self._analysis_messages(
+                code, execution_result, exercise_description, expected_output, attempt_number
+            )
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "Você é um professor de Python especializado em ensino progressivo para iniciantes."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 temperature=0.7,
                 max_tokens=500
             )
-            
-            content = response.choices[0].message.content
-            
-            # Extrair JSON da resposta
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            
-            result = json.loads(content.strip())
-            return result
+            feedback = self._parse_analysis(response.choices[0].message.content)
+            self.feedback_cache.set(key, feedback)
+        
+        except Exception as e:
+            print(f"Erro na análise da IA: {e}")
+            # Fallback para feedback básico (não vai para o cache)
+            return self._basic_feedback(execution_result, expected_output)
+        
+        finally:
+            # Resolve o Future mesmo com BaseException (KeyboardInterrupt,
+            # SystemExit): quem espera nunca fica preso
+            if key is not None:
+                with self._inflight_lock:
+                    self._inflight_sync.pop(key, None)
+                if feedback is not None:
+                    future.set_result(copy.deepcopy(feedback))
+                else:
+                    future.set_exception(RuntimeError("Análise da IA falhou"))
+        
+        return feedback
+    
+    async def _ai_analysis_async(
+        self,
+        code: str,
+        execution_result: Dict[str, Any],
+        exercise_description: str,
+        expected_output: str,
+        attempt_number: int,
+        exercise_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Análise usando IA (OpenAI) com o cliente assíncrono (o cache já
+        foi consultado em instant_feedback()). O resultado vai para o
+        cache do próximo aluno com o mesmo erro.
+        
+        Pedidos com a mesma chave de cache enquanto a chamada está em
+        andamento esperam por ela (single-flight): uma turma inteira com o
+        mesmo erro gera uma única chamada à IA.
+        """
+        key = self.feedback_cache.key(exercise_id, execution_result, expected_output, attempt_number)
+        task = self._inflight.get(key) if key is not None else None
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            messages = self._analysis_messages(
+                code, execution_result, exercise_description, expected_output, attempt_number
+            )
+            task = asyncio.ensure_future(self._remote_analysis(key, messages))
+            self._background.add(task)
+            task.add_done_callback(self._finish_background)
+            if key is not None:
+                self._inflight[key] = task
         
+        try:
+            # shield: cancelar um pedido não cancela a chamada compartilhada
+            return copy.deepcopy(await asyncio.shield(task))
         except Exception as e:
             print(f"Erro na análise da IA: {e}")
-            # Fallback para feedback básico
+            # Fallback para feedback básico (não vai para o cache)
             return self._basic_feedback(execution_result, expected_output)
     
+    async def _remote_analysis(self, key: Optional[str], messages: list) -> Dict[str, Any]:
+        """Chamada à IA + cache do resultado"""
+        content = await self._complete_async(messages, temperature=0.7, max_tokens=500)
+        feedback = self._parse_analysis(content)
+        await self.feedback_cache.set_async(key, feedback)
+        return feedback
+    
+    async def _complete_async(self, messages: list, **params: Any) -> str:
+        """
+        Uma completion com prazo total de AI_TUTOR_TIMEOUT (incluindo a
+        espera por uma vaga entre as AI_TUTOR_MAX_CONCURRENCY chamadas
+        simultâneas).
+        """
+        async def limited() -> str:
+            async with self._concurrency_limiter():
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    **params
+                )
+            return response.choices[0].message.content
+        
+        try:
+            content = await asyncio.wait_for(limited(), self.timeout)
+        except Exception:
+            self.failures += 1
+            raise
+        self.completions += 1
+        return content
+    
+    def _concurrency_limiter(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._limiter is None or self._limiter_loop is not loop:
+            self._limiter = asyncio.Semaphore(self.max_concurrency)
+            self._limiter_loop = loop
+        return self._limiter
+    
+    def _finish_background(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        for key in [k for k, t in self._inflight.items() if t is task]:
+            del self._inflight[key]
+        # Erros de análises que já não têm ninguém esperando
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Chamadas à IA, cache de feedback e cobertura das regras locais"""
+        return {
+            "enabled": self.async_client is not None,
+            "completions": self.completions,
+            "failures": self.failures,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._background),
+            "feedback_cache": self.feedback_cache.stats(),
+            "classifier": self.classifier.stats(),
+        }
+    
+    async def aclose(self) -> None:
+        """Encerra o pool de conexões (e análises ainda em andamento)"""
+        for task in list(self._background):
+            task.cancel()
+        if self.async_client is not None:
+            await self.async_client.close()
+    
     def generate_hint(self, exercise_description: str, current_code: str) -> str:
         """
         Gera uma dica para o aluno sem entregar a resposta.
@@ -0,0 +1,123 @@
+"""
+Budget Calibration
+==================
+
+Calibra os limites de tempo e memória de cada exercício a partir da
+solução de referência (Exercise.reference_solution).
+
+A solução roda EXECUTION_BUDGET_RUNS vezes em todos os casos do
+exercício; o limite é EXECUTION_BUDGET_FACTOR x o p95 medido:
+- tempo: p95 do caso mais lento de cada rodada, entre
+  EXECUTION_BUDGET_MIN_TIMEOUT e EXECUTION_BUDGET_MAX_TIMEOUT
+- memória: p95 do pico de RSS acima de um programa vazio, entre
+  EXECUTION_BUDGET_MIN_MEMORY_MB e MAX_MEMORY_MB
+
+Exercícios triviais ficam com limites apertados: um loop infinito em
+"Olá, mundo!" libera o worker em meio segundo, não em EXECUTION_TIMEOUT.
+
+Uso offline (ver calibrate.py na raiz do backend).
+"""
+
+import math
+import statistics
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.executor import CodeExecutor
+
+
+class CalibrationError(Exception):
+    """A solução de referência não pode ser usada para calibrar"""
+
+
+def _p95(samples: List[float]) -> float:
+    """Percentil 95 (nearest-rank)"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+def baseline_rss_kb(executor: CodeExecutor, runs: int = 5) -> Optional[int]:
+    """Pico de RSS de um programa vazio (o custo do próprio worker)"""
+    samples = [executor.execute("pass").get("peak_rss_kb") for _ in range(runs)]
+    samples = [s for s in samples if s is not None]
+    return int(statistics.median(samples)) if samples else None
+
+
+def grading_cases(exercise) -> List[Dict[str, str]]:
+    """Casos usados na correção: os casos de teste ou a saída do exercício"""
+    if exercise.test_cases:
+        return [
+            {"input_data": case.input_data or "", "expected_output": case.expected_output}
+            for case in exercise.test_cases
+        ]
+    return [{"input_data": exercise.input_data or "", "expected_output": exercise.expected_output}]
+
+
+def calibrate(
+    executor: CodeExecutor,
+    exercise,
+    runs: Optional[int] = None,
+    factor: Optional[float] = None,
+    baseline_kb: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Mede a solução de referência e calcula os limites do exercício.
+
+    A solução roda com os limites globais (o limite calibrado ainda não
+    existe); uma rodada de aquecimento não entra nas medições.
+
+    Returns:
+        {"time_budget", "memory_budget_mb", "p95_time", "p95_rss_kb", "runs"}
+        (memory_budget_mb é None se o pico de RSS não pôde ser medido)
+
+    Raises:
+        CalibrationError: sem solução de referência, ou ela não passa
+    """
+    code = exercise.reference_solution
+    if not code or not code.strip():
+        raise CalibrationError("Exercício sem solução de referência")
+    runs = runs or settings.EXECUTION_BUDGET_RUNS
+    factor = factor or settings.EXECUTION_BUDGET_FACTOR
+    cases = grading_cases(exercise)
+
+    times: List[float] = []
+    peaks: List[int] = []
+    for run in range(runs + 1):
+        slowest = 0.0
+        for index, case in enumerate(cases, start=1):
+            result = executor.execute(
+                code,
+                case["input_data"],
+                timeout=settings.EXECUTION_BUDGET_MAX_TIMEOUT,
+                expected_output=case["expected_output"]
+            )
+            if not result.get("passed"):
+                detail = result["error"] or "saída diferente da esperada"
+                raise CalibrationError(f"A solução de referência falha no caso {index}: {detail}")
+            slowest = max(slowest, result["execution_time"])
+            if run and result.get("peak_rss_kb") is not None:
+                peaks.append(result["peak_rss_kb"])
+        if run:
+            times.append(slowest)
+
+    p95_time = _p95(times)
+    time_budget = min(
+        max(factor * p95_time, settings.EXECUTION_BUDGET_MIN_TIMEOUT),
+        settings.EXECUTION_BUDGET_MAX_TIMEOUT
+    )
+
+    memory_budget = None
+    p95_rss = _p95(peaks) if peaks else None
+    if p95_rss is not None and baseline_kb is not None:
+        extra_mb = max(0, p95_rss - baseline_kb) / 1024
+        memory_budget = max(math.ceil(factor * extra_mb), settings.EXECUTION_BUDGET_MIN_MEMORY_MB)
+        if settings.MAX_MEMORY_MB:
+            memory_budget = min(memory_budget, settings.MAX_MEMORY_MB)
+
+    return {
+        "time_budget": round(time_budget, 3),
+        "memory_budget_mb": memory_budget,
+        "p95_time": p95_time,
+        "p95_rss_kb": p95_rss,
+        "runs": runs,
+    }
@@ -0,0 +1,428 @@
+"""
+Code Validator
+==============
+
+Validação estática do código do aluno antes da execução.
+
+Faz uma única passada pela AST usando tabelas de política imutáveis
+e compila a própria árvore já analisada (sem um segundo parse).
+
+Também rejeita loops while que comprovadamente nunca terminam (ver
+find_endless_loop), que ocupariam um worker do sandbox até o timeout.
+"""
+
+import ast
+from types import CodeType
+from typing import Callable, Dict, Iterable, Optional
+
+
+# Nomes bloqueados (funções perigosas e acesso ao interpretador)
+BLOCKED_NAMES = frozenset({
+    'open', 'eval', 'exec', 'compile', '__import__',
+    'getattr', 'setattr', 'delattr', 'globals', 'locals', 'vars',
+    'breakpoint', 'memoryview',
+})
+
+# Dunders que o aluno pode usar como nome
+ALLOWED_DUNDER_NAMES = frozenset({'__name__'})
+
+# Atributos que dão acesso a frames, código ou globals do interpretador
+BLOCKED_ATTRIBUTES = frozenset({
+    'gi_frame', 'gi_code', 'cr_frame', 'cr_code', 'ag_frame', 'ag_code',
+    'f_globals', 'f_locals', 'f_builtins', 'f_back', 'f_code',
+    'tb_frame', 'tb_next', 'co_code', 'func_globals', 'mro',
+})
+
+
+def _is_dunder(name: str) -> bool:
+    return len(name) > 4 and name.startswith('__') and name.endswith('__')
+
+
+# ---------- Loops infinitos ----------
+#
+# A análise é conservadora: um while só é rejeitado quando, uma vez
+# dentro dele, não há como sair. Qualquer construção que possa sair do
+# loop ou lançar uma exceção (break, return, raise, chamadas a funções,
+# índices, atributos, divisões, contas com valores que podem não ser
+# números, variáveis que podem não existir ainda...) faz o loop ser aceito.
+
+# Nós que podem sair do loop (ou encerrar o programa com uma exceção)
+_LEAVING_NODES = (
+    ast.Return, ast.Raise, ast.Yield, ast.YieldFrom, ast.Await,
+    ast.Try, ast.TryStar, ast.With, ast.AsyncWith, ast.Assert,
+    ast.Import, ast.ImportFrom, ast.Delete, ast.Global, ast.Nonlocal,
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+    ast.For, ast.AsyncFor, ast.Match, ast.Subscript, ast.Attribute,
+    ast.Starred, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp,
+)
+
+# Operadores aritméticos que não lançam exceção com números
+_SAFE_BINOPS = (ast.Add, ast.Sub, ast.Mult)
+
+# Comparações que não lançam exceção com quaisquer valores
+_SAFE_COMPARISONS = (ast.Eq, ast.NotEq, ast.Is, ast.IsNot)
+
+# Nós permitidos na condição de um while analisável
+_CONDITION_NODES = (
+    ast.Compare, ast.BoolOp, ast.UnaryOp, ast.Name, ast.Constant,
+    ast.cmpop, ast.boolop, ast.Not, ast.USub, ast.UAdd, ast.Load,
+)
+
+
+def _bound_names(node: ast.AST) -> set:
+    """Nomes atribuídos (ou removidos) em qualquer ponto de node"""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(child.name)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            names.update((a.asname or a.name).split('.')[0] for a in child.names)
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.add(child.name)
+        elif isinstance(child, (ast.MatchAs, ast.MatchStar)) and child.name:
+            names.add(child.name)
+        elif isinstance(child, ast.MatchMapping) and child.rest:
+            names.add(child.rest)
+        elif isinstance(child, (ast.Global, ast.Nonlocal)):
+            names.update(child.names)
+    return names
+
+
+def _base_name(node: ast.expr) -> Optional[str]:
+    """Variável na raiz de x, x[i], x.attr, x[i].attr..."""
+    while isinstance(node, (ast.Subscript, ast.Attribute, ast.Starred)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _mutated_names(node: ast.AST) -> set:
+    """
+    Variáveis cujo valor pode mudar sem uma atribuição a elas: alvos como
+    x[i] = ... ou x.attr = ..., e objetos com métodos chamados
+    (d.update(...)). Argumentos de chamadas não entram: só valores
+    imutáveis são usados na análise (ver _constant_env).
+    """
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Subscript, ast.Attribute)) and not isinstance(child.ctx, ast.Load):
+            names.add(_base_name(child.value))
+        elif isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute):
+            names.add(_base_name(child.func.value))
+    names.discard(None)
+    return names
+
+
+def _is_immutable(value: object) -> bool:
+    """Literal que nenhuma operação altera (números, str, bool, None e tuplas deles)"""
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return value is None or isinstance(value, (bool, int, float, complex, str, bytes))
+
+
+def _condition_names(test: ast.expr) -> Optional[set]:
+    """Variáveis da condição, ou None se ela tem algo além de comparações"""
+    names = set()
+    for node in ast.walk(test):
+        if not isinstance(node, _CONDITION_NODES):
+            return None
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+    return names
+
+
+def _is_number(node: ast.expr, env: Dict[str, object]) -> bool:
+    """True se node é um número conhecido: literal, variável de env ou conta entre eles"""
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (int, float, complex))
+    if isinstance(node, ast.Name):
+        return isinstance(env.get(node.id), (int, float, complex))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _is_number(node.operand, env)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _SAFE_BINOPS):
+        return _is_number(node.left, env) and _is_number(node.right, env)
+    return False
+
+
+def _may_leave(loop: ast.While, defined: set, env: Dict[str, object], print_redefined: bool) -> bool:
+    """
+    True se a execução pode sair do corpo do loop.
+
+    Args:
+        defined: variáveis com certeza atribuídas antes do loop (outras
+            podem lançar NameError)
+        env: valores conhecidos antes do loop (ver _assign_constants)
+        print_redefined: o aluno atribui print em algum ponto
+    """
+    # Valores que o próprio corpo pode trocar não são conhecidos
+    changed = _bound_names(ast.Module(body=loop.body, type_ignores=[]))
+    env = {name: value for name, value in env.items() if name not in changed}
+    # (nó, dentro de um loop aninhado?): o break de um loop aninhado
+    # sai só dele
+    stack = [(node, False) for node in loop.body]
+    while stack:
+        node, nested = stack.pop()
+        if isinstance(node, ast.Break):
+            if not nested:
+                return True
+            continue
+        if isinstance(node, _LEAVING_NODES):
+            return True
+        if isinstance(node, ast.Call):
+            # print(a, b) é a única chamada aceita (não lança nem sai do
+            # loop); com argumentos nomeados (sep=1), *args ou um print
+            # redefinido pelo aluno ela pode lançar
+            if not (
+                isinstance(node.func, ast.Name)
+                and node.func.id == 'print'
+                and not print_redefined
+                and not node.keywords
+                and not any(isinstance(arg, ast.Starred) for arg in node.args)
+            ):
+                return True
+            stack.extend((arg, nested) for arg in node.args)
+            continue
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)) and not isinstance(node.op, ast.Not):
+            # "n: " + n lança TypeError: só contas entre números conhecidos
+            if not _is_number(node, env):
+                return True
+        elif isinstance(node, ast.Compare):
+            # "a" < 1 lança TypeError; == e is nunca lançam
+            safe = all(isinstance(op, _SAFE_COMPARISONS) for op in node.ops)
+            if not safe and not all(_is_number(item, env) for item in [node.left, *node.comparators]):
+                return True
+        elif isinstance(node, (ast.Dict, ast.Set)):
+            # {[1]} ou {[1]: 2} lançam TypeError (chave não hashable)
+            keys = node.keys if isinstance(node, ast.Dict) else node.elts
+            if not all(isinstance(key, ast.Constant) for key in keys):
+                return True
+        elif isinstance(node, ast.FormattedValue) and node.format_spec is not None:
+            # f"{x:d}" lança ValueError se x não for inteiro
+            return True
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            # Variável que pode não existir ainda: NameError
+            if node.id not in defined:
+                return True
+        if isinstance(node, ast.While):
+            stack.append((node.test, nested))
+            stack.extend((child, True) for child in node.body)
+            stack.extend((child, nested) for child in node.orelse)
+        else:
+            stack.extend((child, nested) for child in ast.iter_child_nodes(node))
+    return False
+
+
+def _defined_names(stmt: ast.stmt) -> set:
+    """
+    Nomes que stmt com certeza atribui ao terminar: alvos de atribuições,
+    imports e definições. Comandos compostos (if, for, try...) podem não
+    executar a atribuição e não contam.
+    """
+    if isinstance(stmt, ast.Assign):
+        targets = stmt.targets
+    elif isinstance(stmt, (ast.AugAssign, ast.AnnAssign)):
+        targets = [stmt.target] if getattr(stmt, 'value', None) is not None else []
+    elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return {(a.asname or a.name).split('.')[0] for a in stmt.names}
+    elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {stmt.name}
+    else:
+        return set()
+    names = set()
+    for target in targets:
+        for node in ast.walk(target):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                names.add(node.id)
+    return names
+
+
+def _assign_constants(env: Dict[str, object], stmt: ast.stmt, unstable: set) -> None:
+    """
+    Atualiza env, os valores das variáveis após stmt (só atribuições de
+    literais imutáveis, como x = 0); qualquer outra atribuição torna a
+    variável desconhecida. Listas e dicionários ficam de fora: d = {}
+    seguido de d['a'] = 1 muda o valor sem atribuir a d.
+    """
+    if isinstance(stmt, ast.Assign) and all(isinstance(t, ast.Name) for t in stmt.targets):
+        try:
+            value = ast.literal_eval(stmt.value)
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            pass
+        else:
+            for target in stmt.targets:
+                if _is_immutable(value) and target.id not in unstable:
+                    env[target.id] = value
+                else:
+                    env.pop(target.id, None)
+            return
+    for name in _bound_names(stmt):
+        env.pop(name, None)
+
+
+def _always_true(test: ast.expr, env: Dict[str, object]) -> bool:
+    """Avalia a condição (só comparações de literais) com os valores de env"""
+    try:
+        expression = compile(ast.Expression(test), "<loop>", "eval")
+        return bool(eval(expression, {"__builtins__": {}}, dict(env)))
+    except Exception:
+        return False
+
+
+def find_endless_loop(tree: ast.Module) -> Optional[tuple[ast.While, set]]:
+    """
+    Procura um while no nível do módulo que nunca termina.
+
+    O loop é rejeitado quando
+    - a condição só compara variáveis e literais (while True, while x < 10)
+    - ela é verdadeira na chegada ao loop (valores vindos de x = literal)
+    - o corpo não altera nenhuma dessas variáveis
+    - e não há como sair do corpo (ver _may_leave)
+
+    Só os loops do nível do módulo são analisados: os de dentro de
+    funções ou ifs podem nem ser alcançados.
+
+    Returns:
+        (nó do loop, variáveis da condição) ou None
+    """
+    print_redefined = 'print' in _bound_names(tree)
+    # Variáveis que funções ou métodos podem alterar por baixo
+    unstable = _mutated_names(tree)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            unstable.update(node.names)
+
+    # Estado na chegada a cada comando, atualizado comando a comando
+    env: Dict[str, object] = {}
+    defined: set = set()
+    for stmt in tree.body:
+        if isinstance(stmt, ast.While):
+            names = _condition_names(stmt.test)
+            if (
+                names is not None
+                and not names & unstable
+                and not names & _bound_names(ast.Module(body=stmt.body, type_ignores=[]))
+                and names <= env.keys()
+                and not _may_leave(stmt, defined, env, print_redefined)
+                and _always_true(stmt.test, env)
+            ):
+                return stmt, names
+        _assign_constants(env, stmt, unstable)
+        if isinstance(stmt, ast.Delete):
+            defined -= _bound_names(stmt)
+        else:
+            defined |= _defined_names(stmt)
+    return None
+
+
+class CodeValidator:
+    """
+    Valida e compila código Python.
+
+    Uso:
+        validator = CodeValidator(allowed_imports={"math"})
+        code_obj, error = validator.validate("print(1)")
+    """
+
+    def __init__(self, allowed_imports: Iterable[str]):
+        self.allowed_imports = frozenset(allowed_imports)
+        self._handlers: Dict[type, Callable[[ast.AST], Optional[str]]] = {
+            ast.Import: self._check_import,
+            ast.ImportFrom: self._check_import_from,
+            ast.Name: self._check_name,
+            ast.Attribute: self._check_attribute,
+            ast.MatchClass: self._check_match_class,
+        }
+
+    def validate(self, code: str) -> tuple[Optional[CodeType], Optional[str]]:
+        """
+        Valida o código e compila a árvore.
+
+        Returns:
+            (code object, mensagem_erro)
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            return None, f"Erro de sintaxe na linha {e.lineno}: {e.msg}"
+        except (ValueError, RecursionError, MemoryError):
+            return None, "Código inválido ou aninhado demais"
+
+        error = self.check(tree) or self.check_loops(tree)
+        if error:
+            return None, error
+
+        try:
+            return compile(tree, "<string>", "exec"), None
+        except (SyntaxError, ValueError, RecursionError) as e:
+            return None, f"Erro de compilação: {e}"
+
+    def check(self, tree: ast.AST) -> Optional[str]:
+        """Percorre a árvore uma única vez, despachando por tipo de nó"""
+        handlers = self._handlers
+        for node in ast.walk(tree):
+            handler = handlers.get(type(node))
+            if handler is not None:
+                error = handler(node)
+                if error:
+                    return error
+        return None
+
+    def check_loops(self, tree: ast.Module) -> Optional[str]:
+        """Rejeita loops que nunca terminam, com uma explicação para o aluno"""
+        found = find_endless_loop(tree)
+        if found is None:
+            return None
+        loop, names = found
+        if not names:
+            return (
+                f"Loop infinito na linha {loop.lineno}: a condição do while é sempre "
+                "verdadeira e o loop não tem break. Use break para sair do loop "
+                "quando a tarefa terminar."
+            )
+        if len(names) == 1:
+            name = next(iter(names))
+            return (
+                f"Loop infinito na linha {loop.lineno}: a condição do while usa {name}, "
+                f"que nunca muda dentro do loop. Atualize {name} no corpo do loop "
+                f"(por exemplo, {name} += 1) ou use break."
+            )
+        listed = ", ".join(sorted(names))
+        return (
+            f"Loop infinito na linha {loop.lineno}: a condição do while usa {listed}, "
+            "que nunca mudam dentro do loop. Atualize essas variáveis no corpo do "
+            "loop ou use break."
+        )
+
+    def _check_import(self, node: ast.Import) -> Optional[str]:
+        for alias in node.names:
+            if alias.name.split('.')[0] not in self.allowed_imports:
+                return f"Import não permitido: {alias.name}"
+        return None
+
+    def _check_import_from(self, node: ast.ImportFrom) -> Optional[str]:
+        if node.level:
+            return "Import relativo não permitido"
+        if node.module and node.module.split('.')[0] not in self.allowed_imports:
+            return f"Import não permitido: {node.module}"
+        return None
+
+    def _check_name(self, node: ast.Name) -> Optional[str]:
+        name = node.id
+        if name in BLOCKED_NAMES:
+            return f"Função não permitida: {name}"
+        if _is_dunder(name) and name not in ALLOWED_DUNDER_NAMES:
+            return f"Nome não permitido: {name}"
+        return None
+
+    def _check_attribute(self, node: ast.Attribute) -> Optional[str]:
+        attr = node.attr
+        if _is_dunder(attr) or attr in BLOCKED_ATTRIBUTES:
+            return f"Acesso ao atributo não permitido: {attr}"
+        return None
+
+    def _check_match_class(self, node: ast.MatchClass) -> Optional[str]:
+        for attr in node.kwd_attrs:
+            if _is_dunder(attr) or attr in BLOCKED_ATTRIBUTES:
+                return f"Acesso ao atributo não permitido: {attr}"
+        return None
@@ -0,0 +1,432 @@
+"""
+Error Classifier
+================
+
+Classificador local (regras) dos erros mais comuns de iniciantes, usado
+pela IA tutora antes de chamar a OpenAI:
+
+- SyntaxError/IndentationError: aspas ou parênteses não fechados,
+  dois-pontos faltando, indentação, texto sem aspas
+- NameError: print/input com maiúscula, nome digitado errado, texto
+  sem aspas, variável usada antes de ser criada
+- Erros de tipo/valor típicos de input() sem conversão
+- Limites do sandbox (tempo, saída, memória) e validação
+- Saída quase certa: espaços, maiúsculas, acentos, pontuação, linhas a
+  mais ou a menos
+
+O feedback sai em português, sem nenhuma chamada de rede; só a cauda
+longa vai para a IA. stats() mostra a cobertura (fração das falhas
+resolvidas aqui, ou seja, de chamadas à IA economizadas).
+"""
+
+import re
+import ast
+import difflib
+import string
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.feedback_cache import _strip_accents
+from app.services.sandbox import SAFE_BUILTINS
+
+
+# Nomes que o aluno pode chamar sem definir
+BUILTIN_NAMES = frozenset(SAFE_BUILTINS) | {'input'}
+
+_SYNTAX = re.compile(r"^Erro de sintaxe na linha (\d+): (.*)$", re.S)
+_NAME_ERROR = re.compile(r"^NameError: name '(\w+)' is not defined")
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = str.maketrans("", "", string.punctuation + "¡¿…")
+
+Feedback = Dict[str, Any]
+
+
+def _feedback(
+    feedback: str,
+    hint: str,
+    suggestions: List[str],
+    severity: str = "error",
+    encouragement: str = "Esse é um erro muito comum, você está quase lá!"
+) -> Feedback:
+    return {
+        "feedback": feedback,
+        "hint": hint,
+        "encouragement": encouragement,
+        "severity": severity,
+        "suggestions": suggestions,
+    }
+
+
+def _source_line(code: str, lineno: int) -> str:
+    lines = code.splitlines()
+    return lines[lineno - 1].strip() if 0 < lineno <= len(lines) else ""
+
+
+def _bare_text_in_print(line: str) -> bool:
+    """print(Olá mundo): palavras soltas, sem aspas, dentro de print()"""
+    match = re.search(r"\bprint\s*\((.*)\)?", line)
+    if not match or '"' in match.group(1) or "'" in match.group(1):
+        return False
+    return bool(re.search(r"[^\W\d]\w*\s+[^\W\d]\w*", match.group(1)))
+
+
+class ErrorClassifier:
+    """
+    Regras locais para as falhas comuns.
+
+    Uso:
+        feedback = classifier.classify(code, execution_result, expected_output)
+        if feedback is None:
+            ...  # cauda longa: IA
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rules: Counter = Counter()
+        self.unclassified = 0
+
+    def classify(
+        self,
+        code: str,
+        execution_result: Dict[str, Any],
+        expected_output: str
+    ) -> Optional[Feedback]:
+        """Feedback da regra que reconheceu a falha, ou None"""
+        error = (execution_result.get("error") or "").strip()
+        if error:
+            found = self._classify_error(code, error)
+        elif execution_result.get("status") == "success":
+            found = self._classify_output(execution_result, expected_output or "")
+        else:
+            found = None
+
+        with self._lock:
+            if found is None:
+                self.unclassified += 1
+                return None
+            rule, feedback = found
+            self.rules[rule] += 1
+        return feedback
+
+    def stats(self) -> Dict[str, Any]:
+        """Cobertura: falhas resolvidas pelas regras (sem IA) por regra"""
+        with self._lock:
+            classified = sum(self.rules.values())
+            total = classified + self.unclassified
+            return {
+                "classified": classified,
+                "unclassified": self.unclassified,
+                "coverage": round(classified / total, 3) if total else 0.0,
+                "rules": dict(self.rules.most_common()),
+            }
+
+    # ---------- Erros ----------
+
+    def _classify_error(self, code: str, error: str) -> Optional[Tuple[str, Feedback]]:
+        syntax = _SYNTAX.match(error)
+        if syntax:
+            return self._syntax(code, int(syntax.group(1)), syntax.group(2))
+        name_error = _NAME_ERROR.match(error)
+        if name_error:
+            return self._name_error(code, name_error.group(1))
+        for prefix, rule in _ERROR_RULES:
+            if error.startswith(prefix) or prefix in error:
+                return rule(error)
+        return None
+
+    def _syntax(self, code: str, lineno: int, message: str) -> Tuple[str, Feedback]:
+        line = _source_line(code, lineno)
+        where = f"na linha {lineno}" + (f": {line}" if line else "")
+        lowered = message.lower()
+
+        if "unterminated string" in lowered or "eol while scanning" in lowered:
+            return "unclosed_quote", _feedback(
+                f"❌ Faltou fechar as aspas {where}",
+                "Todo texto começa e termina com o mesmo tipo de aspas: \"assim\" ou 'assim'.",
+                ["Confira se cada aspa aberta foi fechada"]
+            )
+        if "was never closed" in lowered or "unexpected eof" in lowered:
+            return "unclosed_bracket", _feedback(
+                f"❌ Parêntese (ou colchete) aberto e não fechado {where}",
+                "Conte os ( e os ): cada um que abre precisa de um que fecha.",
+                ["Confira o fim da linha indicada"]
+            )
+        if "unmatched" in lowered or "does not match opening" in lowered:
+            return "unmatched_bracket", _feedback(
+                f"❌ Há um parêntese (ou colchete) fechando sem ter sido aberto {where}",
+                "Confira se os parênteses estão em pares e do mesmo tipo: ( ), [ ], { }.",
+                ["Remova o fechamento a mais ou abra o que faltou"]
+            )
+        if "expected ':'" in lowered:
+            return "missing_colon", _feedback(
+                f"❌ Faltaram os dois-pontos (:) no fim da linha {lineno}",
+                "Linhas com if, elif, else, for, while e def terminam com ':'.",
+                [f"Adicione ':' ao final de: {line}" if line else "Adicione ':' ao final da linha"]
+            )
+        if "indent" in lowered or "tabs and spaces" in lowered:
+            return "indentation", self._indentation(lineno, line, lowered)
+        if "maybe you meant '=='" in lowered or "cannot assign to" in lowered and line.startswith(("if", "elif", "while")):
+            return "assign_in_condition", _feedback(
+                f"❌ Atribuição (=) usada no lugar de comparação {where}",
+                "Para comparar use ==; um único = guarda um valor em uma variável.",
+                ["Troque = por == na condição"]
+            )
+        if _bare_text_in_print(line):
+            return "missing_quotes", _feedback(
+                f"❌ Parece que há texto sem aspas {where}",
+                "Textos precisam estar entre aspas, por exemplo: print(\"Olá, mundo!\").",
+                ["Coloque o texto entre aspas"]
+            )
+        return "syntax", _feedback(
+            f"❌ Erro de sintaxe {where}",
+            "O Python não entendeu essa linha. Confira aspas, parênteses, vírgulas e dois-pontos.",
+            ["Compare a linha com os exemplos da lição", "Olhe também a linha anterior"]
+        )
+
+    @staticmethod
+    def _indentation(lineno: int, line: str, message: str) -> Feedback:
+        if "expected an indented block" in message:
+            detail = (
+                f"A linha {lineno} deveria estar recuada (4 espaços) porque vem "
+                "depois de uma linha terminada em ':'."
+            )
+        elif "unexpected indent" in message:
+            detail = f"A linha {lineno} tem espaços no começo sem precisar; alinhe-a com as anteriores."
+        elif "unindent" in message:
+            detail = f"O recuo da linha {lineno} não bate com nenhum bloco anterior; use múltiplos de 4 espaços."
+        else:
+            detail = "Não misture tabs e espaços: use sempre 4 espaços por nível."
+        return _feedback(
+            f"❌ Erro de indentação na linha {lineno}",
+            detail,
+            ["Use 4 espaços por nível de recuo", "Não misture tabs e espaços"]
+        )
+
+    def _name_error(self, code: str, name: str) -> Tuple[str, Feedback]:
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            tree = None
+        lineno = None
+        defined: set = set()
+        in_print = False
+        if tree is not None:
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name):
+                    if isinstance(node.ctx, ast.Store):
+                        defined.add(node.id)
+                    elif node.id == name and lineno is None:
+                        lineno = node.lineno
+                elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    defined.add(node.name)
+                    defined.update(a.arg for a in node.args.args)
+                elif (
+                    isinstance(node, ast.Call)
+                    and isinstance(node.func, ast.Name)
+                    and node.func.id == 'print'
+                    and any(isinstance(a, ast.Name) and a.id == name for a in node.args)
+                ):
+                    in_print = True
+        where = f" (linha {lineno})" if lineno else ""
+
+        if name.lower() in BUILTIN_NAMES and name != name.lower():
+            return "builtin_case", _feedback(
+                f"❌ '{name}' não existe{where}: o Python diferencia maiúsculas de minúsculas",
+                f"Escreva {name.lower()} com letras minúsculas.",
+                [f"Troque {name} por {name.lower()}"]
+            )
+        close = difflib.get_close_matches(name, sorted(BUILTIN_NAMES), n=1, cutoff=0.75)
+        if close:
+            return "builtin_typo", _feedback(
+                f"❌ '{name}' não existe{where}. Você quis dizer {close[0]}?",
+                f"Confira a grafia: o nome certo é {close[0]}.",
+                [f"Troque {name} por {close[0]}"]
+            )
+        close = difflib.get_close_matches(name, sorted(defined - {name}), n=1, cutoff=0.75)
+        if close:
+            return "variable_typo", _feedback(
+                f"❌ A variável '{name}' não existe{where}. Você quis dizer '{close[0]}'?",
+                "O nome precisa ser escrito exatamente igual em todos os lugares, inclusive maiúsculas.",
+                [f"Troque {name} por {close[0]}"]
+            )
+        if in_print:
+            return "missing_quotes", _feedback(
+                f"❌ '{name}' foi lido como nome de variável{where}",
+                f"Se é um texto, coloque entre aspas: print(\"{name}\").",
+                ["Textos precisam estar entre aspas"]
+            )
+        return "undefined_name", _feedback(
+            f"❌ A variável '{name}' é usada{where} antes de receber um valor",
+            f"Crie a variável antes de usá-la, por exemplo: {name} = ...",
+            ["Confira a ordem das linhas", "Confira se o nome está escrito igual"]
+        )
+
+    # ---------- Saída ----------
+
+    def _classify_output(
+        self,
+        execution_result: Dict[str, Any],
+        expected_output: str
+    ) -> Optional[Tuple[str, Feedback]]:
+        mismatch = execution_result.get("mismatch") or {}
+        if execution_result.get("test_results") and "expected" not in mismatch:
+            # Casos de teste ocultos: não há o que comparar aqui
+            return None
+        output = (execution_result.get("output") or "").strip()
+        if not output:
+            return "output_empty", _feedback(
+                "⚠️ Seu programa não mostrou nada na tela",
+                "Use print() para exibir o resultado.",
+                ["Confira se o print está no lugar certo (e não dentro de um if que não roda)"],
+                severity="warning",
+                encouragement="O código roda; falta só mostrar o resultado!"
+            )
+
+        if "expected" in mismatch:
+            line = mismatch.get("line")
+            expected, actual = mismatch["expected"], mismatch["actual"]
+        else:
+            line = None
+            expected, actual = expected_output.strip(), output
+        where = f" na linha {line} da saída" if line else ""
+
+        return self._compare(expected, actual, where)
+
+    @staticmethod
+    def _compare(expected: str, actual: str, where: str) -> Optional[Tuple[str, Feedback]]:
+        def found(rule: str, feedback: str, hint: str, suggestion: str) -> Tuple[str, Feedback]:
+            return rule, _feedback(
+                feedback, hint, [suggestion],
+                severity="warning",
+                encouragement="Quase lá! A lógica está certa, falta um detalhe."
+            )
+
+        if not expected and actual:
+            return found(
+                "output_extra", f"⚠️ Seu programa mostra mais coisas do que o esperado{where}",
+                "Remova os prints extras (mensagens, testes, variáveis).",
+                "Mostre apenas o que o enunciado pede"
+            )
+        if expected and not actual:
+            return found(
+                "output_missing", f"⚠️ Está faltando parte da saída{where}",
+                f"Era esperado: {expected}", "Confira se todos os prints pedidos foram feitos"
+            )
+        if actual.rstrip() == expected.rstrip():
+            return found(
+                "output_trailing_space", f"⚠️ Há espaços sobrando no fim{where}",
+                "O print com vírgulas coloca espaços entre os valores; confira o fim da linha.",
+                "Use sep='' ou f-strings para controlar os espaços"
+            )
+        if _WHITESPACE.sub("", actual) == _WHITESPACE.sub("", expected):
+            return found(
+                "output_whitespace", f"⚠️ Os espaços não batem com o esperado{where}",
+                f"Esperado: '{expected}'\nObtido: '{actual}'",
+                "Confira espaços entre as palavras e valores"
+            )
+        if actual.lower() == expected.lower():
+            return found(
+                "output_case", f"⚠️ Diferença de maiúsculas/minúsculas{where}",
+                f"Esperado: '{expected}'\nObtido: '{actual}'",
+                "O texto precisa ser idêntico, inclusive maiúsculas"
+            )
+        if _strip_accents(actual).lower() == _strip_accents(expected).lower():
+            return found(
+                "output_accents", f"⚠️ Diferença de acentos{where}",
+                f"Esperado: '{expected}'\nObtido: '{actual}'",
+                "Confira os acentos (á, ã, ç...)"
+            )
+        if (
+            _WHITESPACE.sub(" ", actual.translate(_PUNCTUATION)).strip().lower()
+            == _WHITESPACE.sub(" ", expected.translate(_PUNCTUATION)).strip().lower()
+        ):
+            return found(
+                "output_punctuation", f"⚠️ A pontuação não bate com o esperado{where}",
+                f"Esperado: '{expected}'\nObtido: '{actual}'",
+                "Confira vírgulas, pontos e exclamações"
+            )
+        if expected.startswith(actual):
+            return found(
+                "output_incomplete", f"⚠️ A saída está incompleta{where}",
+                f"Esperado: '{expected}'\nObtido: '{actual}'",
+                "Confira se falta algum texto ou valor"
+            )
+        return None
+
+
+def _fixed_rule(rule: str, feedback: str, hint: str, suggestions: List[str]) -> Callable[[str], Tuple[str, Feedback]]:
+    """Feedback fixo da regra, qualquer que seja a mensagem de erro"""
+    return lambda error: (rule, _feedback(feedback, hint, suggestions))
+
+
+def _echo_rule(rule: str, hint: str, suggestions: List[str]) -> Callable[[str], Tuple[str, Feedback]]:
+    """Mensagens do validador já são explicativas: elas viram o feedback"""
+    return lambda error: (rule, _feedback(f"❌ {error}", hint, suggestions))
+
+
+# (trecho da mensagem de erro, regra) para os erros sem tratamento especial
+_ERROR_RULES: List[Tuple[str, Callable[[str], Tuple[str, Feedback]]]] = [
+    ("Loop infinito", _echo_rule(
+        "endless_loop", "Todo while precisa de um jeito de a condição ficar falsa.",
+        ["Atualize a variável da condição dentro do loop", "Ou use break"]
+    )),
+    ("Import não permitido", _echo_rule(
+        "blocked_import", "Neste ambiente só alguns módulos podem ser importados.",
+        ["Resolva o exercício sem esse módulo"]
+    )),
+    ("não permitid", _echo_rule(
+        "blocked_name", "Por segurança, algumas funções não estão disponíveis aqui.",
+        ["Resolva o exercício sem essa função"]
+    )),
+    ("Tempo limite excedido", _fixed_rule(
+        "timeout", "⏱️ Seu programa demorou demais e foi interrompido",
+        "Provavelmente há um loop que nunca termina: confira se a condição do while muda.",
+        ["Confira a condição de parada dos loops", "Teste com valores pequenos"]
+    )),
+    ("Limite de execução excedido", _fixed_rule(
+        "timeout", "⏱️ Seu programa executou instruções demais e foi interrompido",
+        "Provavelmente há um loop que nunca termina: confira se a condição do while muda.",
+        ["Confira a condição de parada dos loops"]
+    )),
+    ("Limite de saída excedido", _fixed_rule(
+        "output_limit", "📄 Seu programa imprimiu texto demais",
+        "Um print dentro de um loop que não termina produz saída sem fim.",
+        ["Confira a condição de parada do loop que imprime"]
+    )),
+    ("Limite de memória excedido", _fixed_rule(
+        "memory_limit", "💾 Seu programa usou memória demais",
+        "Listas ou textos crescendo sem parar (ex.: append em um loop infinito) esgotam a memória.",
+        ["Confira se alguma lista cresce dentro de um loop que não termina"]
+    )),
+    ("can only concatenate str", _fixed_rule(
+        "str_number_concat", "❌ Não dá para juntar texto e número com +",
+        "Converta o número com str(numero) ou use uma f-string: f\"Total: {numero}\".",
+        ["Use str() ou f-string"]
+    )),
+    ("unsupported operand type(s) for +: 'int' and 'str'", _fixed_rule(
+        "str_number_concat", "❌ Não dá para somar número e texto",
+        "input() sempre devolve texto: converta com int(input()) ou float(input()).",
+        ["Converta a entrada antes de fazer contas"]
+    )),
+    ("not supported between instances of 'str' and", _fixed_rule(
+        "input_not_converted", "❌ Comparação entre texto e número",
+        "input() sempre devolve texto: use int(input()) para comparar com números.",
+        ["Converta a entrada com int() ou float()"]
+    )),
+    ("invalid literal for int()", _fixed_rule(
+        "invalid_int", "❌ int() recebeu um texto que não é um número inteiro",
+        "Confira o que está sendo convertido; para números com vírgula use float().",
+        ["Leia a entrada com calma: ela é mesmo um número inteiro?"]
+    )),
+    ("ZeroDivisionError", _fixed_rule(
+        "zero_division", "❌ Divisão por zero",
+        "Antes de dividir, confira se o divisor pode ser zero (por exemplo, com um if).",
+        ["Trate o caso em que o divisor é 0"]
+    )),
+    ("index out of range", _fixed_rule(
+        "index_range", "❌ Posição fora da lista (ou do texto)",
+        "Os índices começam em 0 e vão até len(lista) - 1.",
+        ["Confira os limites do range() usado no loop"]
+    )),
+]
@@ -4,17 +4,27 @@ Python Code Executor Service
 
 Executa código Python de forma segura em um ambiente sandbox.
 Implementa timeout, limite de memória e restrições de imports.
+A execução acontece em um pool de processos (app.services.sandbox).
 """
 
-import sys
-import io
-import signal
-import ast
-import traceback
-from typing import Dict, Any, Optional
-from contextlib import redirect_stdout, redirect_stderr
+import copy
+import json
+import marshal
+import asyncio
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional
 
 from app.core.config import settings
+from app.core.cache import LRUCache
+from app.services.sandbox import SandboxPool
+from app.services.code_validator import CodeValidator
+
+
+# Campos de uso de recursos de um resultado (colunas de Submission)
+RESOURCE_FIELDS = ("cpu_user", "cpu_system", "peak_rss_kb", "stdout_bytes", "queue_time")
 
 
 class ExecutionError(Exception):
@@ -22,84 +32,224 @@ class ExecutionError(Exception):
     pass
 
 
+class StreamCancelled(ExecutionError):
+    """O cliente do streaming desconectou antes do fim da execução"""
+    pass
+
+
 class CodeExecutor:
     """
     Executor seguro de código Python.
     
     Segurança:
-    - Timeout configurável
+    - Timeout configurável (kill do worker)
     - Sem acesso a sistema de arquivos
     - Imports restritos
     - Captura de stdout/stderr
+    - Execução fora do processo da API (pool de workers)
     """
     
+    _TIMEOUT_MSG = "⏱️ Tempo limite excedido ({timeout:g}s)"
+    _CRASH_MSG = "💥 A execução foi interrompida (limite de recursos do sandbox)"
+    # Erros de limite (tempo, linhas, memória, saída, crash): não vão para o cache
+    _LIMIT_PREFIXES = ("⏱️", "💾", "📄", "💥")
+    
     def __init__(self):
         self.timeout = settings.EXECUTION_TIMEOUT
         self.allowed_imports = set(settings.ALLOWED_IMPORTS.split(","))
+        self.validator = CodeValidator(self.allowed_imports)
+        # Cache de código validado e compilado: (política, hash) -> (bytecode, erro)
+        self._policy = tuple(sorted(self.allowed_imports))
+        self.code_cache = LRUCache(maxsize=settings.CODE_CACHE_SIZE)
+        # Modo determinístico: random com semente fixa e relógio congelado
+        self.seed = settings.EXECUTION_SEED if settings.EXECUTION_DETERMINISTIC else None
+        # Resultados de correção (só no modo determinístico)
+        self.result_cache = LRUCache(maxsize=settings.RESULT_CACHE_SIZE)
+        self.pool = SandboxPool(
+            size=settings.SANDBOX_POOL_SIZE,
+            max_jobs_per_worker=settings.SANDBOX_MAX_JOBS_PER_WORKER,
+            allowed_imports=self.allowed_imports,
+            memory_mb=settings.MAX_MEMORY_MB,
+            max_output=settings.MAX_OUTPUT_CHARS,
+            fork_per_job=settings.SANDBOX_FORK_PER_JOB,
+            line_budget=settings.EXECUTION_LINE_BUDGET
+        )
+        # Threads que aguardam os workers (uma por worker é suficiente)
+        self._dispatch_threads = ThreadPoolExecutor(
+            max_workers=self.pool.size,
+            thread_name_prefix="sandbox-dispatch"
+        )
     
-    def _validate_code(self, code: str) -> tuple[bool, Optional[str]]:
+    def _compile(self, code: str) -> tuple[Optional[bytes], Optional[str]]:
         """
-        Valida o código antes de executar.
+        Valida e compila o código, consultando o cache antes.
         
-        Verifica:
+        Verifica (ver app.services.code_validator):
         - Sintaxe Python válida
         - Imports não permitidos
-        - Operações perigosas
+        - Funções e atributos perigosos
+        - Loops while que nunca terminam
+        
+        Um acerto no cache evita tanto o parse quanto a validação.
         
         Returns:
-            (válido, mensagem_erro)
+            (bytecode serializado com marshal, mensagem_erro)
         """
-        try:
-            tree = ast.parse(code)
-        except SyntaxError as e:
-            return False, f"Erro de sintaxe na linha {e.lineno}: {e.msg}"
-        
-        # Verificar imports
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    if alias.name.split('.')[0] not in self.allowed_imports:
-                        return False, f"Import não permitido: {alias.name}"
-            
-            elif isinstance(node, ast.ImportFrom):
-                if node.module and node.module.split('.')[0] not in self.allowed_imports:
-                    return False, f"Import não permitido: {node.module}"
-            
-            # Bloquear operações perigosas
-            elif isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    dangerous_funcs = {'open', 'eval', 'exec', 'compile', '__import__'}
-                    if node.func.id in dangerous_funcs:
-                        return False, f"Função não permitida: {node.func.id}"
+        key = (self._policy, hashlib.sha256(code.encode()).digest())
+        cached = self.code_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        code_obj, error_msg = self.validator.validate(code)
+        if code_obj is not None:
+            compiled = (marshal.dumps(code_obj), None)
+        else:
+            compiled = (None, error_msg)
         
-        return True, None
+        self.code_cache.set(key, compiled)
+        return compiled
     
-    def _timeout_handler(self, signum, frame):
-        """Handler para timeout de execução"""
-        raise TimeoutError("Tempo limite de execução excedido")
+    def _result_key(
+        self,
+        code: str,
+        cases: List[Dict[str, str]],
+        fail_fast: bool,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Optional[tuple]:
+        """
+        Chave do cache de resultados: hash do código + versão do exercício.
+        
+        A versão é a impressão digital dos dados de correção (entradas,
+        saídas esperadas, fail_fast, limites), então alterar
+        expected_output ou recalibrar os limites invalida as entradas
+        antigas automaticamente. Sem modo determinístico a saída pode
+        variar entre execuções e nada é cacheado.
+        """
+        if self.seed is None:
+            return None
+        version = json.dumps(
+            [
+                cases, fail_fast, self.seed,
+                timeout or self.timeout,
+                self.pool.memory_mb if memory_mb is None else memory_mb,
+                self.pool.line_budget
+            ],
+            sort_keys=True
+        )
+        return (
+            self._policy,
+            hashlib.sha256(code.encode()).digest(),
+            hashlib.sha256(version.encode()).digest()
+        )
     
-    def execute(self, code: str, input_data: str = "") -> Dict[str, Any]:
+    def _cached_result(self, key: Optional[tuple]) -> Optional[Dict[str, Any]]:
         """
-        Executa código Python de forma segura.
+        Resultado em cache (cópia, com "cached": True). Os campos de uso de
+        recursos ficam None: nada rodou no sandbox desta vez.
+        """
+        if key is None:
+            return None
+        cached = self.result_cache.get(key)
+        if cached is None:
+            return None
+        result = copy.deepcopy(cached)
+        result.update(dict.fromkeys(RESOURCE_FIELDS), cached=True)
+        return result
+    
+    def _store_result(
+        self,
+        key: Optional[tuple],
+        result: Dict[str, Any],
+        cases: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Guarda o resultado, a menos que algum caso (cases: resultados do
+        pool, ou o próprio resultado) tenha parado em um limite: timeout,
+        crash e falta de recursos dependem da carga da máquina.
+        """
+        if key is None:
+            return
+        for case in cases or [result]:
+            if case.get("status") in ("timeout", "crash"):
+                return
+            if (case.get("error") or "").startswith(self._LIMIT_PREFIXES):
+                return
+        self.result_cache.set(key, copy.deepcopy(result))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas do executor (para dimensionamento)"""
+        return {
+            "pool_size": self.pool.size,
+            "deterministic": self.seed is not None,
+            "code_cache": self.code_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+        }
+    
+    @staticmethod
+    def budget(exercise) -> Dict[str, Any]:
+        """
+        Limites de correção do exercício, calibrados pela solução de
+        referência (ver calibrate.py); None = padrão global.
+        
+        Uso:
+            result = await executor.run_tests(code, cases, **executor.budget(exercise))
+        """
+        return {"timeout": exercise.time_budget, "memory_mb": exercise.memory_budget_mb}
+    
+    @staticmethod
+    def expected_output(exercise, result: Dict[str, Any]) -> str:
+        """
+        Saída esperada com que o resultado deve ser comparado no feedback:
+        a do caso de teste que falhou, ou a do exercício.
+        """
+        failed_case = result.get("failed_case")
+        return failed_case["expected_output"] if failed_case else exercise.expected_output
+    
+    def start(self) -> None:
+        """Inicia o pool de workers do sandbox"""
+        self.pool.start()
+    
+    def shutdown(self) -> None:
+        """Encerra o pool de workers do sandbox"""
+        self.pool.shutdown()
+    
+    def execute(
+        self,
+        code: str,
+        input_data: str = "",
+        timeout: Optional[float] = None,
+        expected_output: Optional[str] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa código Python de forma segura em um worker do pool.
         
         Args:
             code: Código Python para executar
             input_data: Dados de entrada (simulando stdin)
+            timeout: Tempo limite (padrão: EXECUTION_TIMEOUT)
+            expected_output: Se informado, a saída é corrigida no worker
+                durante a execução, que para na primeira divergência
+                (campos "passed" e, se falhou, "mismatch")
+            memory_mb: Limite de memória (padrão: MAX_MEMORY_MB)
             
         Returns:
             {
                 "output": str,           # Saída do programa
                 "error": str,            # Mensagens de erro
                 "status": str,           # "success" ou "error"
-                "execution_time": float  # Tempo de execução
+                "execution_time": float, # Tempo de execução no worker (sem fila)
+                "cpu_user": float,       # CPU em modo usuário (s)
+                "cpu_system": float,     # CPU em modo sistema (s)
+                "peak_rss_kb": int,      # Pico de memória residente
+                "stdout_bytes": int,     # Bytes escritos em stdout
+                "queue_time": float      # Espera por um worker livre (s)
             }
         """
-        import time
-        start_time = time.time()
-        
-        # Validar código
-        is_valid, error_msg = self._validate_code(code)
-        if not is_valid:
+        # Validar e compilar código
+        bytecode, error_msg = self._compile(code)
+        if error_msg:
             return {
                 "output": "",
                 "error": error_msg,
@@ -107,103 +257,235 @@ class CodeExecutor:
                 "execution_time": 0
             }
         
-        # Capturar stdout e stderr
-        stdout = io.StringIO()
-        stderr = io.StringIO()
+        timeout = timeout or self.timeout
+        case = self.pool.run_cases(
+            bytecode,
+            [{"input_data": input_data, "expected_output": expected_output}],
+            timeout=timeout,
+            seed=self.seed,
+            memory_mb=memory_mb
+        )[0]
+        self._describe_failure(case, timeout)
         
-        try:
-            # Configurar timeout (apenas em Unix)
-            if hasattr(signal, 'SIGALRM'):
-                signal.signal(signal.SIGALRM, self._timeout_handler)
-                signal.alarm(self.timeout)
-            
-            # Criar namespace isolado
-            namespace = {
-                '__builtins__': {
-                    'print': print,
-                    'len': len,
-                    'range': range,
-                    'str': str,
-                    'int': int,
-                    'float': float,
-                    'bool': bool,
-                    'list': list,
-                    'dict': dict,
-                    'tuple': tuple,
-                    'set': set,
-                    'abs': abs,
-                    'max': max,
-                    'min': min,
-                    'sum': sum,
-                    'sorted': sorted,
-                    'enumerate': enumerate,
-                    'zip': zip,
-                    'map': map,
-                    'filter': filter,
-                    'type': type,
-                    'isinstance': isinstance,
-                    'input': lambda: input_data,
-                }
-            }
-            
-            # Executar código com redirecionamento
-            with redirect_stdout(stdout), redirect_stderr(stderr):
-                exec(code, namespace)
-            
-            # Cancelar timeout
-            if hasattr(signal, 'SIGALRM'):
-                signal.alarm(0)
-            
-            execution_time = time.time() - start_time
-            
+        result = {
+            "output": case["output"],
+            "error": case["error"],
+            "status": "success" if case["status"] == "success" else "error",
+            "execution_time": round(case["time"], 3),
+            **self._resources([case])
+        }
+        if expected_output is not None:
+            result["passed"] = bool(case.get("passed"))
+            result["mismatch"] = case.get("mismatch")
+        return result
+    
+    def _describe_failure(self, case: Dict[str, Any], timeout: float) -> None:
+        """Mensagem de erro para casos finalizados pelo pool"""
+        if case["status"] == "timeout":
+            case["error"] = self._TIMEOUT_MSG.format(timeout=timeout)
+        elif case["status"] == "crash":
+            case["error"] = self._CRASH_MSG
+    
+    @staticmethod
+    def _resources(cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Uso de recursos dos casos executados: CPU somada, pico de RSS,
+        bytes em stdout e tempo na fila. Casos finalizados por timeout ou
+        crash não têm medição (None).
+        """
+        measured = [c for c in cases if c.get("cpu_user") is not None]
+        queue_time = cases[0].get("queue_time") if cases else None
+        if not measured:
             return {
-                "output": stdout.getvalue(),
-                "error": stderr.getvalue(),
-                "status": "success",
-                "execution_time": round(execution_time, 3)
+                "cpu_user": None,
+                "cpu_system": None,
+                "peak_rss_kb": None,
+                "stdout_bytes": None,
+                "queue_time": queue_time
             }
+        return {
+            "cpu_user": round(sum(c["cpu_user"] for c in measured), 4),
+            "cpu_system": round(sum(c["cpu_system"] for c in measured), 4),
+            "peak_rss_kb": max(c["peak_rss_kb"] for c in measured),
+            "stdout_bytes": sum(c["stdout_bytes"] for c in measured),
+            "queue_time": queue_time
+        }
+    
+    def execute_stream(
+        self,
+        code: str,
+        input_data: str = "",
+        expected_output: Optional[str] = None,
+        on_output: Optional[Callable[[str, str], None]] = None,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa o código enviando stdout/stderr para on_output durante a
+        execução. A saída não é acumulada no processo da API.
         
-        except TimeoutError:
-            if hasattr(signal, 'SIGALRM'):
-                signal.alarm(0)
-            return {
-                "output": stdout.getvalue(),
-                "error": f"⏱️ Tempo limite excedido ({self.timeout}s)",
-                "status": "error",
-                "execution_time": self.timeout
-            }
+        Returns:
+            Veredito final: {"error", "status", "execution_time", "passed",
+            "mismatch"} ("passed" só quando expected_output é informado;
+            "mismatch" com a primeira divergência, se houver) + uso de
+            recursos como em execute()
+        """
+        bytecode, error_msg = self._compile(code)
+        if error_msg:
+            return {"error": error_msg, "status": "error", "execution_time": 0, "passed": False}
         
-        except Exception as e:
-            if hasattr(signal, 'SIGALRM'):
-                signal.alarm(0)
-            
-            error_trace = traceback.format_exc()
-            execution_time = time.time() - start_time
+        timeout = timeout or self.timeout
+        case = self.pool.run_cases(
+            bytecode,
+            [{"input_data": input_data, "expected_output": expected_output}],
+            timeout=timeout,
+            seed=self.seed,
+            on_output=on_output,
+            memory_mb=memory_mb
+        )[0]
+        self._describe_failure(case, timeout)
+        
+        return {
+            "error": case["error"],
+            "status": "success" if case["status"] == "success" else "error",
+            "execution_time": round(case["time"], 3),
+            "passed": case.get("passed") if expected_output is not None else None,
+            "mismatch": case.get("mismatch"),
+            **self._resources([case])
+        }
+    
+    def run_test_cases(
+        self,
+        code: str,
+        cases: List[Dict[str, str]],
+        fail_fast: bool = False,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa todos os casos de teste de um exercício em uma única
+        ida ao worker do sandbox.
+        
+        Args:
+            code: Código Python
+            cases: [{"input_data": str, "expected_output": str}, ...]
+            fail_fast: Parar no primeiro caso que falhar
+            timeout, memory_mb: Limites por caso (ver budget())
             
+        Returns:
+            Mesmo formato de test_code() + "test_results": lista com
+            {"case", "passed", "status", "time", "mismatch"} por caso
+            (entradas e saídas esperadas não são expostas: os casos são
+            ocultos; "mismatch" traz só a posição da primeira divergência)
+        """
+        cases = [
+            {"input_data": c["input_data"], "expected_output": c["expected_output"]}
+            for c in cases
+        ]
+        key = self._result_key(code, cases, fail_fast, timeout, memory_mb)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        return self._run_test_cases(code, cases, fail_fast, key, timeout, memory_mb)
+    
+    def _run_test_cases(
+        self,
+        code: str,
+        cases: List[Dict[str, str]],
+        fail_fast: bool,
+        key: Optional[tuple],
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        bytecode, error_msg = self._compile(code)
+        if error_msg:
             return {
-                "output": stdout.getvalue(),
-                "error": f"{type(e).__name__}: {str(e)}",
+                "output": "",
+                "error": error_msg,
                 "status": "error",
-                "execution_time": round(execution_time, 3)
+                "execution_time": 0,
+                "passed": False,
+                "test_results": []
             }
+        
+        timeout = timeout or self.timeout
+        results = self.pool.run_cases(
+            bytecode,
+            cases,
+            timeout=timeout,
+            fail_fast=fail_fast,
+            seed=self.seed,
+            memory_mb=memory_mb
+        )
+        
+        test_results = []
+        for index, case in enumerate(results, start=1):
+            self._describe_failure(case, timeout)
+            test_results.append({
+                "case": index,
+                "passed": case["passed"],
+                "status": "success" if case["status"] == "success" else "error",
+                "time": case["time"],
+                "mismatch": self._position(case.get("mismatch"))
+            })
+        
+        passed_count = sum(1 for r in test_results if r["passed"])
+        failed = next((c for c in results if not c["passed"]), None)
+        failed_index = results.index(failed) if failed else None
+        shown = failed or results[0]
+        error = shown["error"]
+        if failed and not error:
+            error = f"Caso de teste {failed_index + 1} falhou: saída diferente da esperada"
+            mismatch = failed.get("mismatch")
+            if mismatch:
+                error += f" (linha {mismatch['line']}, coluna {mismatch['column']})"
+        
+        result = {
+            "output": shown["output"],
+            "error": error,
+            "status": "success" if shown["status"] == "success" else "error",
+            "execution_time": round(sum(c["time"] for c in results), 3),
+            "passed": passed_count == len(cases),
+            "test_results": test_results,
+            "mismatch": self._position(failed.get("mismatch") if failed else None),
+            # Uso interno (feedback da IA); não sai nas respostas da API
+            "failed_case": {
+                "case": failed_index + 1,
+                "input_data": cases[failed_index].get("input_data", ""),
+                "expected_output": cases[failed_index]["expected_output"],
+            } if failed else None,
+            **self._resources(results)
+        }
+        self._store_result(key, result, results)
+        return result
+    
+    @staticmethod
+    def _position(mismatch: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """Só linha/coluna da divergência (o texto esperado de casos ocultos não sai)"""
+        if not mismatch:
+            return None
+        return {"line": mismatch["line"], "column": mismatch["column"]}
     
-    def test_code(self, code: str, expected_output: str) -> Dict[str, Any]:
+    def grade(self, result: Dict[str, Any], expected_output: str) -> Dict[str, Any]:
         """
-        Executa e testa se o código produz a saída esperada.
+        Compara a saída de uma execução com a saída esperada.
+        
+        Se a execução já foi corrigida no worker (execute() com
+        expected_output), vale o veredito de lá; a saída, nesse caso,
+        vai só até a primeira divergência.
         
         Args:
-            code: Código Python
+            result: Resultado de execute()
             expected_output: Saída esperada
             
         Returns:
             Resultado da execução + campo "passed" (bool)
         """
-        result = self.execute(code)
-        
         if result["status"] == "success":
             actual_output = result["output"].strip()
             expected_output = expected_output.strip()
-            result["passed"] = actual_output == expected_output
+            if "passed" not in result:
+                result["passed"] = actual_output == expected_output
             result["expected"] = expected_output
             result["actual"] = actual_output
         else:
@@ -212,6 +494,211 @@ class CodeExecutor:
             result["actual"] = ""
         
         return result
+    
+    def test_code(
+        self,
+        code: str,
+        expected_output: str,
+        input_data: str = "",
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa e testa se o código produz a saída esperada.
+        
+        No modo determinístico, reenvios do mesmo código para o mesmo
+        exercício vêm do cache de resultados (campo "cached": True).
+        
+        Args:
+            code: Código Python
+            expected_output: Saída esperada
+            input_data: Dados de entrada (simulando stdin)
+            timeout, memory_mb: Limites do exercício (ver budget())
+            
+        Returns:
+            Resultado da execução + campo "passed" (bool)
+        """
+        key = self._grade_key(code, input_data, expected_output, timeout, memory_mb)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        return self._test_code(code, expected_output, input_data, key, timeout, memory_mb)
+    
+    def _test_code(
+        self,
+        code: str,
+        expected_output: str,
+        input_data: str,
+        key: Optional[tuple],
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        result = self.grade(
+            self.execute(
+                code, input_data, timeout, expected_output=expected_output, memory_mb=memory_mb
+            ),
+            expected_output
+        )
+        self._store_result(key, result)
+        return result
+    
+    def _grade_key(
+        self,
+        code: str,
+        input_data: str,
+        expected_output: str,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Optional[tuple]:
+        return self._result_key(
+            code,
+            [{"input_data": input_data, "expected_output": expected_output}],
+            False,
+            timeout,
+            memory_mb
+        )
+    
+    async def run(
+        self,
+        code: str,
+        input_data: str = "",
+        expected_output: Optional[str] = None,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Versão assíncrona de execute()/test_code().
+        
+        Na correção (com expected_output), `timeout` e `memory_mb` são os
+        limites do exercício (ver budget()) e fazem parte da chave do cache.
+        
+        A espera pelo worker acontece em threads próprias do executor,
+        sem bloquear o event loop nem o threadpool padrão do FastAPI.
+        Acertos no cache de resultados respondem direto no event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if expected_output is None:
+            return await loop.run_in_executor(
+                self._dispatch_threads,
+                functools.partial(self.execute, code, input_data, timeout, memory_mb=memory_mb)
+            )
+        
+        key = self._grade_key(code, input_data, expected_output, timeout, memory_mb)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        return await loop.run_in_executor(
+            self._dispatch_threads,
+            functools.partial(
+                self._test_code, code, expected_output, input_data, key, timeout, memory_mb
+            )
+        )
+    
+    async def run_tests(
+        self,
+        code: str,
+        cases: List[Dict[str, str]],
+        fail_fast: bool = False,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Versão assíncrona de run_test_cases()"""
+        cases = [
+            {"input_data": c["input_data"], "expected_output": c["expected_output"]}
+            for c in cases
+        ]
+        key = self._result_key(code, cases, fail_fast, timeout, memory_mb)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._dispatch_threads,
+            functools.partial(
+                self._run_test_cases, code, cases, fail_fast, key, timeout, memory_mb
+            )
+        )
+    
+    async def stream(
+        self,
+        code: str,
+        input_data: str = "",
+        expected_output: Optional[str] = None,
+        timeout: Optional[float] = None,
+        memory_mb: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Executa o código e produz a saída enquanto ela é gerada.
+        
+        Yields:
+            {"type": "stdout" | "stderr", "data": str} para cada trecho e,
+            por último, {"type": "result", ...} com o veredito
+        
+        A fila é limitada: se o consumidor for lento, o worker fica
+        bloqueado no envio; se a fila não andar dentro do tempo limite, ou
+        se o consumidor desistir, a execução é interrompida. Use com
+        contextlib.aclosing() para que a interrupção seja imediata.
+        """
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        cancelled = threading.Event()
+        
+        def on_output(stream_name: str, data: str) -> None:
+            if cancelled.is_set():
+                raise StreamCancelled()
+            put = asyncio.run_coroutine_threadsafe(
+                queue.put({"type": stream_name, "data": data}), loop
+            )
+            try:
+                put.result(timeout=timeout)
+            except FutureTimeout:
+                put.cancel()
+                raise StreamCancelled()
+        
+        future = loop.run_in_executor(
+            self._dispatch_threads,
+            functools.partial(
+                self.execute_stream, code, input_data, expected_output, on_output, timeout,
+                memory_mb
+            )
+        )
+        
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, future}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                break
+            
+            while not queue.empty():
+                yield queue.get_nowait()
+            
+            yield {"type": "result", **(await future)}
+        finally:
+            if not future.done():
+                cancelled.set()
+                # O worker termina com StreamCancelled sem ninguém esperar por ele
+                future.add_done_callback(lambda done: done.cancelled() or done.exception())
+                while not queue.empty():
+                    queue.get_nowait()
+    
+    async def prepare(self, code: str) -> Optional[str]:
+        """
+        Valida e compila o código (aquecendo o cache) sem bloquear o
+        event loop.
+        
+        Returns:
+            Mensagem de erro de validação, ou None
+        """
+        loop = asyncio.get_running_loop()
+        _, error_msg = await loop.run_in_executor(None, self._compile, code)
+        return error_msg
 
 
 # Instância global
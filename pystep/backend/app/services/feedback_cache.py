@@ -0,0 +1,215 @@
+"""
+Feedback Cache
+==============
+
+Cache do feedback da IA por exercício e "assinatura" da falha: centenas
+de alunos cometem o mesmo erro no mesmo exercício (NameError: name
+'Print' is not defined) e a resposta da IA serve para todos.
+
+Assinatura = tipo do erro + modelo da mensagem (números e literais
+trocados por marcadores) + classe da diferença de saída + faixa da
+tentativa (a primeira tentativa recebe uma dica mais genérica).
+
+Dois níveis:
+- LRU em processo com TTL (FEEDBACK_CACHE_SIZE, FEEDBACK_CACHE_TTL)
+- Redis opcional (FEEDBACK_CACHE_BACKEND=redis), compartilhado entre os
+  nós da API; um acerto no Redis também aquece o LRU local
+"""
+
+import re
+import copy
+import json
+import asyncio
+import hashlib
+import unicodedata
+from typing import Any, Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+# Literais entre aspas que não são um nome (nomes fazem parte do erro)
+_LITERAL = re.compile(r"'(?![A-Za-z_]\w*')[^']*'|\"[^\"]*\"")
+_SPACES = re.compile(r"\s+")
+
+
+def message_template(error: str) -> str:
+    """Mensagem de erro sem as partes que variam entre alunos"""
+    first_line = error.strip().splitlines()[0] if error.strip() else ""
+    template = _LITERAL.sub("'…'", first_line)
+    template = _NUMBER.sub("N", template)
+    return _SPACES.sub(" ", template)[:200]
+
+
+def output_diff_class(actual: str, expected: str) -> str:
+    """
+    Classe da diferença entre a saída obtida e a esperada: empty,
+    whitespace, case, accents, incomplete (falta o final), extra (sobra
+    texto depois do esperado) ou
+    other:<hash da saída> (saídas erradas diferentes não se misturam).
+    """
+    actual = actual.strip()
+    expected = expected.strip()
+    if not actual:
+        return "empty"
+    if _SPACES.sub("", actual) == _SPACES.sub("", expected):
+        return "whitespace"
+    if actual.lower() == expected.lower():
+        return "case"
+    if _strip_accents(actual).lower() == _strip_accents(expected).lower():
+        return "accents"
+    if expected.startswith(actual):
+        return "incomplete"
+    if actual.startswith(expected):
+        return "extra"
+    digest = hashlib.sha256(_SPACES.sub(" ", actual).encode()).hexdigest()[:16]
+    return f"other:{digest}"
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def failure_signature(
+    execution_result: Dict[str, Any],
+    expected_output: str,
+    attempt_number: int = 1
+) -> str:
+    """Assinatura normalizada da falha (ver módulo)"""
+    attempt = "first" if attempt_number <= 1 else "retry"
+    error = execution_result.get("error") or ""
+    failed_case = execution_result.get("failed_case")
+    if failed_case and execution_result.get("status") == "success":
+        # Caso de teste com saída errada: a diferença é com a saída do caso
+        diff = output_diff_class(execution_result.get("output") or "", failed_case["expected_output"])
+        return f"output|case{failed_case['case']}|{diff}|{attempt}"
+    if execution_result.get("status") == "error" or error:
+        template = message_template(error)
+        error_type = template.split(":", 1)[0].strip() if ":" in template else "error"
+        return f"error|{error_type}|{template}|{attempt}"
+    diff = output_diff_class(execution_result.get("output") or "", expected_output or "")
+    return f"output|{diff}|{attempt}"
+
+
+class FeedbackCache:
+    """
+    Cache em dois níveis do feedback da IA.
+
+    Uso:
+        key = feedback_cache.key(exercise_id, execution_result, expected_output, attempt)
+        feedback = feedback_cache.get(key)
+        if feedback is None:
+            feedback = ...  # IA
+            feedback_cache.set(key, feedback)
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl: float = 86400,
+        redis_url: Optional[str] = None,
+        prefix: str = "pystep:feedback:"
+    ):
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.prefix = prefix
+        self.redis = None
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    @staticmethod
+    def key(
+        exercise_id: Optional[int],
+        execution_result: Dict[str, Any],
+        expected_output: str,
+        attempt_number: int = 1
+    ) -> Optional[str]:
+        """Chave exercício + assinatura, ou None (sem exercício não há cache)"""
+        if exercise_id is None:
+            return None
+        signature = failure_signature(execution_result, expected_output, attempt_number)
+        return f"{exercise_id}|{signature}"
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Feedback em cache (cópia) ou None"""
+        if key is None:
+            return None
+        feedback = self.local.get(key)
+        if feedback is None and self.redis is not None:
+            feedback = self._get_shared(key)
+            if feedback is not None:
+                self.local.set(key, feedback)
+        return copy.deepcopy(feedback) if feedback is not None else None
+
+    def set(self, key: Optional[str], feedback: Dict[str, Any]) -> None:
+        if key is None:
+            return
+        self.local.set(key, copy.deepcopy(feedback))
+        if self.redis is not None:
+            self._set_shared(key, feedback)
+
+    async def get_async(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Como get(), com a ida ao Redis fora do event loop"""
+        if key is None:
+            return None
+        feedback = self.local.get(key)
+        if feedback is not None:
+            return copy.deepcopy(feedback)
+        if self.redis is None:
+            return None
+        loop = asyncio.get_running_loop()
+        feedback = await loop.run_in_executor(None, self._get_shared, key)
+        if feedback is not None:
+            self.local.set(key, feedback)
+            return copy.deepcopy(feedback)
+        return None
+
+    async def set_async(self, key: Optional[str], feedback: Dict[str, Any]) -> None:
+        if key is None:
+            return
+        self.local.set(key, copy.deepcopy(feedback))
+        if self.redis is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._set_shared, key, feedback)
+
+    # O Redis é só uma otimização: falhas nele não afetam o feedback
+
+    def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self.redis.get(self.prefix + key)
+        except Exception:
+            self.shared_errors += 1
+            return None
+        if raw is None:
+            return None
+        self.shared_hits += 1
+        return json.loads(raw)
+
+    def _set_shared(self, key: str, feedback: Dict[str, Any]) -> None:
+        try:
+            self.redis.set(self.prefix + key, json.dumps(feedback), ex=int(self.ttl) or None)
+        except Exception:
+            self.shared_errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.local.stats(),
+            "backend": "redis" if self.redis is not None else "memory",
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+        }
+
+
+def create_feedback_cache() -> FeedbackCache:
+    """Cache conforme FEEDBACK_CACHE_BACKEND ("memory" ou "redis")"""
+    return FeedbackCache(
+        maxsize=settings.FEEDBACK_CACHE_SIZE,
+        ttl=settings.FEEDBACK_CACHE_TTL,
+        redis_url=settings.REDIS_URL if settings.FEEDBACK_CACHE_BACKEND == "redis" else None
+    )
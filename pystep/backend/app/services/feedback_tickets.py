@@ -0,0 +1,245 @@
+"""
+Feedback Tickets
+================
+
+Feedback da IA entregue depois do veredito: POST /api/execute responde
+assim que o sandbox termina, com um ticket; a análise roda em background
+e o cliente busca o resultado em GET /api/execute/feedback/{ticket}
+(com `wait` para long polling).
+
+A análise roda no processo que emitiu o ticket. O estado do ticket fica
+disponível por FEEDBACK_TICKET_TTL segundos depois de pronto:
+- em memória (FEEDBACK_CACHE_BACKEND=memory): só o processo que emitiu o
+  ticket o conhece; com vários workers da API (uvicorn --workers N, ou
+  vários nós) o GET pode cair em outro processo e responder 404
+- no Redis (FEEDBACK_CACHE_BACKEND=redis, usa REDIS_URL): qualquer
+  processo responde; a espera de um ticket de outro processo é feita
+  consultando o Redis periodicamente
+"""
+
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+# Intervalo das consultas ao Redis ao esperar um ticket de outro processo
+SHARED_POLL_INTERVAL = 0.25
+
+
+class FeedbackTicket:
+    """Estado de uma análise em background"""
+
+    def __init__(self):
+        self.ticket_id = uuid.uuid4().hex
+        self.status = PENDING
+        self.feedback: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.ready = asyncio.Event()
+
+    def view(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "ticket_id": self.ticket_id,
+            "status": self.status,
+            "feedback": self.feedback,
+            "error": self.error,
+            "elapsed": round(end - self.created_at, 3),
+        }
+
+    def record(self) -> Dict[str, Any]:
+        """Estado gravado no Redis (view() sem o tempo decorrido)"""
+        return {
+            "ticket_id": self.ticket_id,
+            "status": self.status,
+            "feedback": self.feedback,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _view_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    end = record["finished_at"] or time.time()
+    return {
+        "ticket_id": record["ticket_id"],
+        "status": record["status"],
+        "feedback": record["feedback"],
+        "error": record["error"],
+        "elapsed": round(end - record["created_at"], 3),
+    }
+
+
+class FeedbackTickets:
+    """
+    Emite tickets e roda as análises no event loop da API.
+
+    Uso:
+        ticket = feedback_tickets.issue(ai_tutor.deferred_analysis(...), on_ready=salvar)
+        ...
+        view = await feedback_tickets.wait(ticket.ticket_id, timeout=10)
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        maxsize: int = 10000,
+        redis_url: Optional[str] = None,
+        prefix: str = "pystep:feedback-ticket:"
+    ):
+        self.ttl = ttl
+        # Tickets prontos expiram; pendentes ficam até terminar
+        self.tickets = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._pending: Dict[str, FeedbackTicket] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.prefix = prefix
+        self.redis = None
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.issued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.shared_errors = 0
+
+    def issue(
+        self,
+        analysis: Awaitable[Dict[str, Any]],
+        on_ready: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> FeedbackTicket:
+        """Agenda a análise e retorna o ticket (on_ready recebe o feedback)"""
+        ticket = FeedbackTicket()
+        self._pending[ticket.ticket_id] = ticket
+        self.issued += 1
+        task = asyncio.ensure_future(self._run(ticket, analysis, on_ready))
+        self._tasks[ticket.ticket_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(ticket.ticket_id, None))
+        return ticket
+
+    async def _run(
+        self,
+        ticket: FeedbackTicket,
+        analysis: Awaitable[Dict[str, Any]],
+        on_ready: Optional[Callable[[Dict[str, Any]], Awaitable[None]]]
+    ) -> None:
+        # Outros processos já enxergam o ticket como pendente
+        await self._publish(ticket)
+        try:
+            ticket.feedback = await analysis
+            ticket.status = READY
+            self.delivered += 1
+        except Exception as e:
+            ticket.status = FAILED
+            ticket.error = "Não foi possível gerar o feedback"
+            self.failed += 1
+            print(f"Erro no feedback em background: {e}")
+        finally:
+            if ticket.status == PENDING:  # cancelada no shutdown
+                ticket.status = FAILED
+            ticket.finished_at = time.time()
+            self.tickets.set(ticket.ticket_id, ticket)
+            self._pending.pop(ticket.ticket_id, None)
+            ticket.ready.set()
+
+        await self._publish(ticket)
+        if on_ready is not None and ticket.feedback is not None:
+            try:
+                await on_ready(ticket.feedback)
+            except Exception as e:
+                print(f"Erro ao salvar o feedback: {e}")
+
+    def get(self, ticket_id: str) -> Optional[FeedbackTicket]:
+        """Ticket deste processo, pendente ou pronto (None se desconhecido ou expirado)"""
+        return self._pending.get(ticket_id) or self.tickets.get(ticket_id)
+
+    async def wait(self, ticket_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        view() do ticket, aguardando até timeout a análise terminar; None
+        se o ticket é desconhecido ou expirou.
+        """
+        ticket = self.get(ticket_id)
+        if ticket is not None:
+            if ticket.status == PENDING and timeout > 0:
+                try:
+                    await asyncio.wait_for(ticket.ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return ticket.view()
+
+        # Ticket de outro processo: só pelo Redis
+        deadline = time.monotonic() + timeout
+        while True:
+            record = await self._fetch(ticket_id)
+            if record is None:
+                return None
+            remaining = deadline - time.monotonic()
+            if record["status"] != PENDING or remaining <= 0:
+                return _view_record(record)
+            await asyncio.sleep(min(SHARED_POLL_INTERVAL, remaining))
+
+    # O Redis só espelha o estado: falhas nele não afetam a análise
+
+    async def _publish(self, ticket: FeedbackTicket) -> None:
+        if self.redis is None:
+            return
+        # Pendentes expiram também, caso o processo morra no meio
+        ttl = int(self.ttl + settings.AI_TUTOR_TIMEOUT * 2)
+        payload = json.dumps(ticket.record())
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                None, lambda: self.redis.set(self.prefix + ticket.ticket_id, payload, ex=ttl)
+            )
+        except Exception:
+            self.shared_errors += 1
+
+    async def _fetch(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        if self.redis is None:
+            return None
+        loop = asyncio.get_running_loop()
+        try:
+            raw = await loop.run_in_executor(None, self.redis.get, self.prefix + ticket_id)
+        except Exception:
+            self.shared_errors += 1
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.redis is not None else "memory",
+            "pending": len(self._pending),
+            "issued": self.issued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "shared_errors": self.shared_errors,
+        }
+
+    async def aclose(self) -> None:
+        """Cancela as análises em andamento (shutdown)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def create_feedback_tickets() -> FeedbackTickets:
+    """Tickets no backend do cache de feedback (FEEDBACK_CACHE_BACKEND)"""
+    return FeedbackTickets(
+        ttl=settings.FEEDBACK_TICKET_TTL,
+        redis_url=settings.REDIS_URL if settings.FEEDBACK_CACHE_BACKEND == "redis" else None
+    )
+
+
+# Instância global
+feedback_tickets = create_feedback_tickets()
@@ -0,0 +1,336 @@
+"""
+Execution Job Queue
+===================
+
+Fila persistente de execuções: a API enfileira, workers de sandbox
+(no próprio processo ou em `python worker.py`) consomem.
+
+Backends:
+- MemoryJobQueue: um único nó, não sobrevive a um restart
+- RedisJobQueue: protocolo Redis (redis-server local ou gerenciado);
+  jobs pendentes sobrevivem a restarts da API e dos workers
+
+Ciclo de vida de um job: queued -> running -> done | failed.
+Um job "running" cujo worker morreu volta para a fila depois de
+JOB_LEASE_SECONDS (requeue_stale).
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Interface comum dos backends"""
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """Adiciona um job e retorna seu ID"""
+        raise NotImplementedError
+
+    def claim(self, timeout: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Retira o próximo job (bloqueia até timeout): (job_id, payload) ou None"""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """{"job_id", "status", "result", "error"} ou None se desconhecido/expirado"""
+        raise NotImplementedError
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Como get(), mas aguarda até timeout o job terminar"""
+        raise NotImplementedError
+
+    def touch(self, job_id: str) -> None:
+        """Renova o lease de um job em execução (heartbeat do worker)"""
+        raise NotImplementedError
+
+    def requeue_stale(self, lease: float) -> int:
+        """Devolve à fila jobs "running" sem heartbeat há mais de `lease` segundos"""
+        raise NotImplementedError
+
+    def pending(self) -> int:
+        """Jobs aguardando um worker"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+def _view(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
+
+class MemoryJobQueue(JobQueue):
+    """Fila em memória, thread-safe (um único nó)"""
+
+    def __init__(self, result_ttl: int = 3600):
+        self.result_ttl = result_ttl
+        self._pending: Deque[str] = deque()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            self._expire()
+            self._jobs[job_id] = {"status": QUEUED, "payload": payload, "updated_at": time.time()}
+            self._pending.append(job_id)
+            self._cond.notify_all()
+        return job_id
+
+    def claim(self, timeout: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            job_id = self._pending.popleft()
+            job = self._jobs[job_id]
+            job["status"] = RUNNING
+            job["updated_at"] = time.time()
+            return job_id, job["payload"]
+
+    def _finish(self, job_id: str, **fields: Any) -> None:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields, updated_at=time.time())
+            job.pop("payload", None)
+            self._cond.notify_all()
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._finish(job_id, status=DONE, result=result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._finish(job_id, status=FAILED, error=error)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return _view(job_id, job) if job else None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if job["status"] in (DONE, FAILED) or remaining <= 0:
+                    return _view(job_id, job)
+                self._cond.wait(remaining)
+
+    def touch(self, job_id: str) -> None:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] == RUNNING:
+                job["updated_at"] = time.time()
+
+    def requeue_stale(self, lease: float) -> int:
+        cutoff = time.time() - lease
+        with self._cond:
+            stale = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] == RUNNING and job["updated_at"] < cutoff
+            ]
+            for job_id in stale:
+                self._jobs[job_id]["status"] = QUEUED
+                self._pending.append(job_id)
+            if stale:
+                self._cond.notify_all()
+        return len(stale)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in (DONE, FAILED) and job["updated_at"] < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job["status"] == RUNNING)
+            return {"backend": "memory", "pending": len(self._pending), "running": running}
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Fila no Redis.
+
+    Chaves (prefixo padrão "pystep:jobs"):
+        {prefix}:pending      lista de IDs aguardando (LPUSH / BRPOPLPUSH)
+        {prefix}:processing   lista de IDs em execução
+        {prefix}:job:{id}     hash com status, payload, result, error
+        {prefix}:done:{id}    canal pub/sub avisado ao terminar o job
+    """
+
+    def __init__(self, url: str, prefix: str = "pystep:jobs", result_ttl: int = 3600):
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.result_ttl = result_ttl
+        self._pending_key = f"{prefix}:pending"
+        self._processing_key = f"{prefix}:processing"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _done_channel(self, job_id: str) -> str:
+        return f"{self.prefix}:done:{job_id}"
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "status": QUEUED,
+            "payload": json.dumps(payload),
+            "updated_at": time.time(),
+        })
+        pipe.lpush(self._pending_key, job_id)
+        pipe.execute()
+        return job_id
+
+    def claim(self, timeout: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # BRPOPLPUSH só aceita segundos inteiros (0 = bloquear para sempre)
+        job_id = self.redis.brpoplpush(
+            self._pending_key, self._processing_key, timeout=max(1, int(timeout))
+        )
+        if job_id is None:
+            return None
+        key = self._job_key(job_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={"status": RUNNING, "updated_at": time.time()})
+        pipe.hget(key, "payload")
+        _, payload = pipe.execute()
+        if payload is None:
+            # Hash expirado ou removido: descartar
+            self.redis.lrem(self._processing_key, 1, job_id)
+            return None
+        return job_id, json.loads(payload)
+
+    def _finish(self, job_id: str, fields: Dict[str, Any]) -> None:
+        key = self._job_key(job_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={**fields, "updated_at": time.time()})
+        pipe.hdel(key, "payload")
+        pipe.expire(key, self.result_ttl)
+        pipe.lrem(self._processing_key, 1, job_id)
+        pipe.publish(self._done_channel(job_id), fields["status"])
+        pipe.execute()
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._finish(job_id, {"status": DONE, "result": json.dumps(result)})
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._finish(job_id, {"status": FAILED, "error": error})
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        if "result" in job:
+            job["result"] = json.loads(job["result"])
+        return _view(job_id, job)
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            # Inscrever antes de consultar: o aviso não se perde entre os dois
+            pubsub.subscribe(self._done_channel(job_id))
+            deadline = time.monotonic() + timeout
+            while True:
+                job = self.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in (DONE, FAILED) or remaining <= 0:
+                    return job
+                pubsub.get_message(timeout=remaining)
+        finally:
+            pubsub.close()
+
+    def touch(self, job_id: str) -> None:
+        key = self._job_key(job_id)
+        # Só jobs ainda em execução (um hash expirado não é recriado)
+        if self.redis.hget(key, "status") == RUNNING:
+            self.redis.hset(key, "updated_at", time.time())
+
+    def requeue_stale(self, lease: float) -> int:
+        cutoff = time.time() - lease
+        requeued = 0
+        for job_id in self.redis.lrange(self._processing_key, 0, -1):
+            updated_at = self.redis.hget(self._job_key(job_id), "updated_at")
+            if updated_at is not None and float(updated_at) >= cutoff:
+                continue
+            # LREM decide quem devolve o job quando vários workers tentam
+            if not self.redis.lrem(self._processing_key, 1, job_id):
+                continue
+            if updated_at is not None:
+                pipe = self.redis.pipeline()
+                pipe.hset(self._job_key(job_id), mapping={"status": QUEUED, "updated_at": time.time()})
+                pipe.rpush(self._pending_key, job_id)
+                pipe.execute()
+                requeued += 1
+        return requeued
+
+    def pending(self) -> int:
+        return self.redis.llen(self._pending_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "pending": self.redis.llen(self._pending_key),
+            "running": self.redis.llen(self._processing_key),
+        }
+
+
+def create_job_queue() -> JobQueue:
+    """Backend conforme JOB_QUEUE_BACKEND ("memory" ou "redis")"""
+    if settings.JOB_QUEUE_BACKEND == "redis":
+        return RedisJobQueue(settings.REDIS_URL, result_ttl=settings.JOB_RESULT_TTL)
+    if settings.JOB_QUEUE_BACKEND == "memory":
+        return MemoryJobQueue(result_ttl=settings.JOB_RESULT_TTL)
+    raise ValueError(f"JOB_QUEUE_BACKEND inválido: {settings.JOB_QUEUE_BACKEND}")
+
+
+# Instância global
+job_queue = create_job_queue()
+
+# Threads para long polling (ficam bloqueadas até o job terminar)
+_wait_threads = ThreadPoolExecutor(max_workers=64, thread_name_prefix="job-wait")
+
+
+async def wait_for_job(job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """job_queue.wait() sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_wait_threads, job_queue.wait, job_id, timeout)
@@ -0,0 +1,392 @@
+"""
+Job Worker
+==========
+
+Consome a fila de execuções (app.services.job_queue): executa o código
+no sandbox, corrige e salva a submissão, com o mesmo resultado do POST
+/api/execute. Como lá, o job termina com o veredito: o feedback que
+precisa da IA sai depois, por um feedback_ticket (ver
+app.services.feedback_tickets), e a thread consumidora não fica presa
+esperando a IA. Em `python worker.py`, os tickets só chegam à API com
+FEEDBACK_CACHE_BACKEND=redis; sem ele o feedback fica só na submissão.
+
+Roda dentro da API (JOB_QUEUE_LOCAL_CONSUMERS > 0) ou em processos
+separados com `python worker.py`. Dentro da API, cada execução reserva
+um slot na fila batch do ExecutionScheduler, como as requisições: o
+pool do sandbox é um só e as reservas/limites por usuário continuam
+valendo.
+
+Enquanto um job roda, o worker renova o lease dele (JobQueue.touch); se
+ainda assim ele voltar à fila (worker morto), o reprocessamento não
+duplica a submissão (Submission.job_id é único).
+"""
+
+import time
+import asyncio
+import threading
+import traceback
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import Exercise, Submission
+from app.services.executor import CodeExecutor, RESOURCE_FIELDS
+from app.services.ai_tutor import ai_tutor
+from app.services.feedback_tickets import feedback_tickets
+from app.services.job_queue import JobQueue
+from app.services.scheduler import ExecutionScheduler, SchedulerBusy, BATCH
+
+
+def _save_job_feedback(job_id: str, feedback: Dict[str, Any]) -> None:
+    """Grava na submissão do job o feedback que ficou pronto em background"""
+    db = SessionLocal()
+    try:
+        db.query(Submission).filter(Submission.job_id == job_id).update(
+            {Submission.feedback: str(feedback)}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def process_job(
+    executor: CodeExecutor,
+    payload: Dict[str, Any],
+    loop: asyncio.AbstractEventLoop,
+    job_id: Optional[str] = None,
+    slot: Optional[Callable[[str], ContextManager]] = None
+) -> Dict[str, Any]:
+    """
+    Processa um job {"code", "exercise_id", "input_data", "mode", "user_id"}.
+
+    Args:
+        loop: event loop em que rodam o feedback da IA e os tickets
+        job_id: ID do job (a submissão é gravada uma única vez por job)
+        slot: slot(chave) envolve a execução no sandbox (ver JobWorker)
+
+    Returns:
+        Campos de CodeExecutionResponse
+
+    Raises:
+        LookupError: exercício não encontrado
+    """
+    code = payload["code"]
+    user_id = payload.get("user_id")
+    slot = slot or (lambda key: nullcontext())
+    key = f"user:{user_id}" if user_id is not None else f"job:{job_id}"
+    db = SessionLocal()
+    try:
+        exercise = (
+            db.query(Exercise)
+            .options(selectinload(Exercise.test_cases))
+            .filter(Exercise.id == payload["exercise_id"])
+            .first()
+        )
+        if not exercise:
+            raise LookupError("Exercício não encontrado")
+        input_data = payload.get("input_data") or exercise.input_data or ""
+
+        if payload.get("mode") == "run":
+            with slot(key):
+                result = executor.execute(code, input_data, timeout=settings.RUN_TIMEOUT)
+            return {
+                "output": result["output"],
+                "error": result["error"],
+                "status": result["status"],
+                "execution_time": result["execution_time"],
+                **{field: result.get(field) for field in RESOURCE_FIELDS}
+            }
+
+        with slot(key):
+            if exercise.test_cases:
+                result = executor.run_test_cases(
+                    code,
+                    [
+                        {"input_data": case.input_data or "", "expected_output": case.expected_output}
+                        for case in exercise.test_cases
+                    ],
+                    fail_fast=exercise.fail_fast,
+                    **executor.budget(exercise)
+                )
+            else:
+                result = executor.test_code(
+                    code, exercise.expected_output, input_data, **executor.budget(exercise)
+                )
+
+        # Job reprocessado (lease expirado): a submissão já existe
+        existing = None
+        if job_id is not None:
+            existing = db.query(Submission).filter(Submission.job_id == job_id).first()
+
+        attempt_number = 1
+        if existing is not None:
+            attempt_number = existing.attempt_number
+        elif user_id is not None:
+            attempt_number = db.query(Submission).filter(
+                Submission.user_id == user_id,
+                Submission.exercise_id == exercise.id
+            ).count() + 1
+
+        # Feedback sem IA; se não houver, a IA roda depois do job
+        expected_output = executor.expected_output(exercise, result)
+        ai_feedback = asyncio.run_coroutine_threadsafe(
+            ai_tutor.instant_feedback(
+                code,
+                result,
+                expected_output,
+                attempt_number=attempt_number,
+                exercise_id=exercise.id
+            ),
+            loop
+        ).result()
+
+        if user_id is not None and existing is None:
+            db.add(Submission(
+                user_id=user_id,
+                exercise_id=exercise.id,
+                code=code,
+                output=result["output"],
+                error=result["error"],
+                status=result["status"],
+                passed=bool(result.get("passed")),
+                execution_time=result["execution_time"],
+                feedback=str(ai_feedback) if ai_feedback is not None else None,
+                attempt_number=attempt_number,
+                job_id=job_id,
+                **{field: result.get(field) for field in RESOURCE_FIELDS}
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Outro worker gravou o mesmo job ao mesmo tempo
+                db.rollback()
+
+        feedback_ticket = None
+        if ai_feedback is None:
+            saved = user_id is not None and job_id is not None
+
+            async def on_ready(feedback: Dict[str, Any]) -> None:
+                if saved:
+                    await loop.run_in_executor(None, _save_job_feedback, job_id, feedback)
+
+            async def issue() -> str:
+                return feedback_tickets.issue(
+                    ai_tutor.deferred_analysis(
+                        code=code,
+                        execution_result=result,
+                        exercise_description=exercise.descricao,
+                        expected_output=expected_output,
+                        attempt_number=attempt_number,
+                        exercise_id=exercise.id
+                    ),
+                    on_ready=on_ready
+                ).ticket_id
+
+            feedback_ticket = asyncio.run_coroutine_threadsafe(issue(), loop).result()
+
+        return {
+            "output": result["output"],
+            "error": result["error"],
+            "status": result["status"],
+            "execution_time": result["execution_time"],
+            "passed": result.get("passed"),
+            "expected": result.get("expected"),
+            "actual": result.get("actual"),
+            "feedback": ai_feedback,
+            "feedback_ticket": feedback_ticket,
+            "xp_gained": ai_feedback.get("xp_gained", 0) if ai_feedback and result.get("passed") else 0,
+            "test_results": result.get("test_results"),
+            "mismatch": result.get("mismatch"),
+            **{field: result.get(field) for field in RESOURCE_FIELDS}
+        }
+    finally:
+        db.close()
+
+
+class JobWorker:
+    """
+    Threads consumidoras da fila.
+
+    Uso:
+        worker = JobWorker(job_queue, executor, concurrency=4)
+        worker.start()
+        ...
+        worker.stop()
+
+    Dentro da API, passe o scheduler e o event loop dela: as execuções
+    reservam slots na fila batch e o feedback da IA roda no loop da API
+    (JobWorker(..., scheduler=scheduler, loop=asyncio.get_running_loop())).
+    Sem loop, o worker cria o seu em uma thread. stop() bloqueia até os
+    jobs em andamento terminarem; chame-o fora do event loop.
+    """
+
+    # Espera máxima por um job antes de checar stop() e jobs órfãos
+    POLL_SECONDS = 2
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        executor: CodeExecutor,
+        concurrency: int = 1,
+        scheduler: Optional[ExecutionScheduler] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ):
+        self.queue = queue
+        self.executor = executor
+        self.concurrency = concurrency
+        self.scheduler = scheduler
+        self.loop = loop
+        # Loop próprio (fora da API): criado em start(), fechado em stop()
+        self._loop_thread: Optional[threading.Thread] = None
+        self.processed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # Jobs em andamento (renovados pelo heartbeat)
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+
+    def start(self) -> None:
+        self._stop.clear()
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=self.loop.run_forever,
+                name="job-feedback",
+                daemon=True
+            )
+            self._loop_thread.start()
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        for index in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._loop,
+                name=f"job-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Para de consumir; jobs em andamento terminam antes. Com loop
+        próprio, análises da IA ainda pendentes são canceladas.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._loop_thread is not None:
+            asyncio.run_coroutine_threadsafe(self._close_loop(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loop_thread.join()
+            self.loop.close()
+            self.loop = None
+            self._loop_thread = None
+
+    async def _close_loop(self) -> None:
+        """Encerra o que roda no loop próprio (como o shutdown da API)"""
+        await feedback_tickets.aclose()
+        await ai_tutor.aclose()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def _loop(self) -> None:
+        next_requeue = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_requeue:
+                    self.queue.requeue_stale(settings.JOB_LEASE_SECONDS)
+                    next_requeue = time.monotonic() + settings.JOB_LEASE_SECONDS / 4
+                claimed = self.queue.claim(timeout=self.POLL_SECONDS)
+            except Exception:
+                # Backend indisponível (ex.: Redis reiniciando): tentar de novo
+                traceback.print_exc()
+                self._stop.wait(self.POLL_SECONDS)
+                continue
+            if claimed is None:
+                continue
+            try:
+                self._handle(*claimed)
+            except Exception:
+                # Resultado não gravado: o job volta à fila após o lease
+                traceback.print_exc()
+
+    def _heartbeat(self) -> None:
+        """Renova o lease dos jobs em andamento a cada JOB_LEASE_SECONDS / 4"""
+        interval = settings.JOB_LEASE_SECONDS / 4
+        while not self._stop.wait(interval):
+            with self._running_lock:
+                running = list(self._running)
+            for job_id in running:
+                try:
+                    self.queue.touch(job_id)
+                except Exception:
+                    traceback.print_exc()
+
+    @contextmanager
+    def _slot(self, key: str) -> Iterator[None]:
+        """Slot da fila batch do scheduler da API (reservado no event loop dela)"""
+        if self.scheduler is None:
+            yield
+            return
+
+        async def hold(acquired: Future) -> None:
+            try:
+                async with self.scheduler.slot(key, BATCH, rate_limited=False):
+                    release = asyncio.Event()
+                    acquired.set_result(release)
+                    await release.wait()
+            except BaseException as e:
+                if not acquired.done():
+                    acquired.set_exception(e)
+                raise
+
+        while True:
+            acquired: Future = Future()
+            asyncio.run_coroutine_threadsafe(hold(acquired), self.loop)
+            try:
+                release = acquired.result()
+                break
+            except SchedulerBusy as e:
+                # Fila batch cheia: o job espera (não é recusado como uma requisição)
+                time.sleep(e.retry_after)
+        try:
+            yield
+        finally:
+            self.loop.call_soon_threadsafe(release.set)
+
+    def _handle(self, job_id: str, payload: Dict[str, Any]) -> None:
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            result = process_job(self.executor, payload, self.loop, job_id=job_id, slot=self._slot)
+        except LookupError as e:
+            self.failed += 1
+            self.queue.fail(job_id, str(e))
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self.failed += 1
+            self.queue.fail(job_id, f"Erro interno ao processar o job: {type(e).__name__}")
+            return
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+        self.processed += 1
+        self.queue.complete(job_id, result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
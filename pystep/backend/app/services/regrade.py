@@ -0,0 +1,284 @@
+"""
+Regrade Service
+===============
+
+Recorreção das submissões de um exercício depois que a correção muda
+(expected_output, entradas ou casos de teste corrigidos).
+
+- As submissões são lidas do banco em lotes (paginação por id), sem
+  carregar tudo na memória
+- A correção roda em paralelo no pool do sandbox, pela fila batch do
+  scheduler: o slot reservado ao botão Executar e o round-robin entre
+  usuários continuam valendo, então a recorreção não trava o tráfego ao vivo
+- Códigos repetidos são corrigidos uma vez só (cache de resultados do
+  CodeExecutor)
+- Os vereditos são gravados em lotes; o progresso fica em RegradeJob
+"""
+
+import time
+import uuid
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import selectinload
+
+from app.core.database import SessionLocal, run_db
+from app.models import Exercise, Submission
+from app.services.executor import CodeExecutor, executor
+from app.services.scheduler import ExecutionScheduler, SchedulerBusy, scheduler, BATCH
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RegradeJob:
+    """Estado e progresso de uma recorreção"""
+
+    def __init__(self, exercise_id: int):
+        self.job_id = uuid.uuid4().hex
+        self.exercise_id = exercise_id
+        self.status = QUEUED
+        self.total = 0
+        self.processed = 0
+        self.changed = 0  # Submissões cujo "passed" mudou
+        self.errors = 0  # Submissões que não puderam ser corrigidas
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def view(self) -> Dict[str, Any]:
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.job_id,
+            "exercise_id": self.exercise_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "changed": self.changed,
+            "errors": self.errors,
+            "error": self.error,
+            "elapsed": round(elapsed, 3),
+            "rate": round(self.processed / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def _load_exercise(exercise_id: int) -> Optional[Dict[str, Any]]:
+    """Dados de correção do exercício (desanexados da sessão)"""
+    db = SessionLocal()
+    try:
+        exercise = (
+            db.query(Exercise)
+            .options(selectinload(Exercise.test_cases))
+            .filter(Exercise.id == exercise_id)
+            .first()
+        )
+        if not exercise:
+            return None
+        return {
+            "input_data": exercise.input_data or "",
+            "expected_output": exercise.expected_output,
+            "fail_fast": exercise.fail_fast,
+            "budget": executor.budget(exercise),
+            "cases": [
+                {"input_data": case.input_data or "", "expected_output": case.expected_output}
+                for case in exercise.test_cases
+            ],
+        }
+    finally:
+        db.close()
+
+
+def _count_submissions(exercise_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Submission).filter(Submission.exercise_id == exercise_id).count()
+    finally:
+        db.close()
+
+
+def _fetch_batch(exercise_id: int, after_id: int, limit: int) -> List[Tuple[int, str, bool]]:
+    """Próximo lote de submissões (id, code, passed) com id > after_id"""
+    db = SessionLocal()
+    try:
+        return [
+            tuple(row) for row in
+            db.query(Submission.id, Submission.code, Submission.passed)
+            .filter(Submission.exercise_id == exercise_id, Submission.id > after_id)
+            .order_by(Submission.id)
+            .limit(limit)
+            .all()
+        ]
+    finally:
+        db.close()
+
+
+def _save_verdicts(verdicts: List[Dict[str, Any]]) -> None:
+    """Grava {"id", "passed"} em lote (UPDATE por chave primária)"""
+    db = SessionLocal()
+    try:
+        db.execute(update(Submission), verdicts)
+        db.commit()
+    finally:
+        db.close()
+
+
+class RegradeService:
+    """
+    Executa recorreções em background no event loop da API (ou de um
+    script, ver regrade.py).
+
+    Uso:
+        job = regrade_service.start(exercise_id)
+        ...
+        regrade_service.get(job.job_id).view()
+    """
+
+    # Recorreções terminadas mantidas para consulta
+    MAX_FINISHED = 100
+
+    def __init__(
+        self,
+        executor: CodeExecutor,
+        scheduler: ExecutionScheduler,
+        batch_size: int = 200,
+        concurrency: Optional[int] = None
+    ):
+        self.executor = executor
+        self.scheduler = scheduler
+        self.batch_size = batch_size
+        # Uma correção por slot da fila batch
+        self.concurrency = concurrency or scheduler.batch_capacity
+        self.jobs: Dict[str, RegradeJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, exercise_id: int) -> RegradeJob:
+        """Agenda a recorreção de um exercício e retorna o job"""
+        job = RegradeJob(exercise_id)
+        self._forget_finished()
+        self.jobs[job.job_id] = job
+        task = asyncio.create_task(self.run(job))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    def get(self, job_id: str) -> Optional[RegradeJob]:
+        return self.jobs.get(job_id)
+
+    def _forget_finished(self) -> None:
+        finished = [j for j in self.jobs.values() if j.status in (DONE, FAILED)]
+        for job in finished[:max(0, len(finished) - self.MAX_FINISHED + 1)]:
+            del self.jobs[job.job_id]
+
+    async def run(
+        self,
+        job: RegradeJob,
+        on_progress: Optional[Callable[[RegradeJob], None]] = None
+    ) -> RegradeJob:
+        """
+        Recorrige todas as submissões do exercício.
+
+        Um leitor pagina as submissões para uma fila limitada; `concurrency`
+        corretores consomem a fila, cada um com um slot batch do scheduler;
+        os vereditos são gravados a cada `batch_size` submissões (e
+        on_progress é chamado).
+        """
+        job.status = RUNNING
+        job.started_at = time.monotonic()
+        try:
+            grading = await run_db(_load_exercise, job.exercise_id)
+            if grading is None:
+                raise LookupError("Exercício não encontrado")
+            job.total = await run_db(_count_submissions, job.exercise_id)
+
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+            verdicts: List[Dict[str, Any]] = []
+            flush_lock = asyncio.Lock()
+
+            async def flush(force: bool = False) -> None:
+                async with flush_lock:
+                    if not verdicts or (len(verdicts) < self.batch_size and not force):
+                        return
+                    pending = verdicts[:]
+                    verdicts.clear()
+                    await run_db(_save_verdicts, pending)
+                if on_progress and not force:
+                    on_progress(job)
+
+            async def read() -> None:
+                after_id = 0
+                while True:
+                    rows = await run_db(_fetch_batch, job.exercise_id, after_id, self.batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        await queue.put(row)
+                    after_id = rows[-1][0]
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+            async def grade(index: int) -> None:
+                # Chave própria por corretor: o limite por chave do
+                # scheduler é de um slot por vez
+                key = f"regrade:{job.job_id}:{index}"
+                while True:
+                    row = await queue.get()
+                    if row is None:
+                        return
+                    submission_id, code, old_passed = row
+                    try:
+                        passed = await self._grade_in_slot(key, code, grading)
+                    except Exception:
+                        job.errors += 1
+                        job.processed += 1
+                        continue
+                    job.processed += 1
+                    if passed != bool(old_passed):
+                        job.changed += 1
+                        verdicts.append({"id": submission_id, "passed": passed})
+                    if job.processed % self.batch_size == 0:
+                        await flush()
+
+            await asyncio.gather(read(), *(grade(i) for i in range(self.concurrency)))
+            await flush(force=True)
+            job.status = DONE
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e) if isinstance(e, LookupError) else f"Erro interno: {type(e).__name__}"
+        finally:
+            job.finished_at = time.monotonic()
+        if on_progress:
+            on_progress(job)
+        return job
+
+    async def _grade_in_slot(self, key: str, code: str, grading: Dict[str, Any]) -> bool:
+        """Corrige em um slot batch; com a fila cheia (tráfego ao vivo), espera e tenta de novo"""
+        while True:
+            try:
+                async with self.scheduler.slot(key, BATCH, rate_limited=False):
+                    return await self._grade(code, grading)
+            except SchedulerBusy as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def _grade(self, code: str, grading: Dict[str, Any]) -> bool:
+        """Mesma correção do POST /api/execute/ (modo submit)"""
+        if grading["cases"]:
+            result = await self.executor.run_tests(
+                code, cases=grading["cases"], fail_fast=grading["fail_fast"], **grading["budget"]
+            )
+        else:
+            result = await self.executor.run(
+                code,
+                input_data=grading["input_data"],
+                expected_output=grading["expected_output"],
+                **grading["budget"]
+            )
+        return bool(result.get("passed"))
+
+
+# Instância global
+regrade_service = RegradeService(executor, scheduler)
@@ -0,0 +1,1011 @@
+"""
+Sandbox Process Pool
+====================
+
+Pool de processos pré-criados (fork) que executam o código dos alunos
+fora do processo da API.
+
+- Cada worker recebe jobs por um Pipe e devolve um resultado por caso de teste
+- Cada worker é um fork-server: importa os módulos permitidos e monta os
+  builtins uma vez, e cada job roda em um filho novo (fork, copy-on-write)
+  descartado no fim, sem estado compartilhado entre submissões
+- Workers são reciclados após N execuções
+- Timeout é aplicado pelo processo pai com kill (SIGKILL) do worker e do filho
+- Modo determinístico: `random` com semente fixa e relógio congelado
+- Saída limitada (truncada com aviso) e rlimits de memória/CPU por execução
+- Contabilidade de recursos por caso: CPU user/sys, pico de RSS, bytes em stdout
+- Correção incremental: stdout é comparado com a saída esperada enquanto é
+  produzido, e a execução para na primeira divergência
+- Orçamento de linhas (opcional): limite determinístico, que não depende
+  da carga da máquina, contado em linhas executadas do código do aluno
+"""
+
+import gc
+import io
+import dis
+import os
+import sys
+import time
+import types
+import random
+import signal
+import marshal
+import builtins
+import datetime
+import importlib
+import threading
+import multiprocessing as mp
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class SandboxTimeout(TimeoutError):
+    """O código excedeu o tempo limite e o worker foi finalizado"""
+    pass
+
+
+class SandboxCrash(Exception):
+    """O worker morreu durante a execução (ex.: falta de memória)"""
+    pass
+
+
+class OutputLimitExceeded(Exception):
+    """O programa escreveu mais que o limite de saída permitido"""
+    pass
+
+
+class OutputMismatch(BaseException):
+    """
+    A saída divergiu da esperada: a execução é interrompida.
+
+    Herda de BaseException para não ser capturada por `except Exception`
+    no código do aluno.
+    """
+    pass
+
+
+class LineBudgetExceeded(BaseException):
+    """
+    O código executou mais linhas que o orçamento.
+
+    Herda de BaseException pelo mesmo motivo de OutputMismatch.
+    """
+    pass
+
+
+TRUNCATION_MARKER = "\n... [saída truncada]\n"
+
+
+# Instante usado pelo relógio congelado do modo determinístico
+FROZEN_NOW = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+
+class _FrozenDatetime(datetime.datetime):
+    """datetime com now()/today()/utcnow() fixos em FROZEN_NOW"""
+
+    @classmethod
+    def now(cls, tz=None):
+        frozen = cls.combine(FROZEN_NOW.date(), FROZEN_NOW.time())
+        if tz is None:
+            return frozen
+        return frozen.replace(tzinfo=datetime.timezone.utc).astimezone(tz)
+
+    @classmethod
+    def today(cls):
+        return cls.now()
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now()
+
+    def __repr__(self):
+        return "datetime." + super().__repr__()
+
+
+class _FrozenDate(datetime.date):
+    """date com today() fixo em FROZEN_NOW"""
+
+    @classmethod
+    def today(cls):
+        return cls(FROZEN_NOW.year, FROZEN_NOW.month, FROZEN_NOW.day)
+
+    def __repr__(self):
+        return "datetime." + super().__repr__()
+
+
+_FrozenDatetime.__name__ = _FrozenDatetime.__qualname__ = "datetime"
+_FrozenDate.__name__ = _FrozenDate.__qualname__ = "date"
+
+
+def _frozen_datetime_module() -> types.ModuleType:
+    """Cópia do módulo datetime com o relógio congelado"""
+    module = types.ModuleType("datetime")
+    module.__dict__.update(
+        (name, value) for name, value in vars(datetime).items()
+        if not name.startswith("__")
+    )
+    module.datetime = _FrozenDatetime
+    module.date = _FrozenDate
+    return module
+
+
+def _make_importer(allowed_imports: Iterable[str], overrides: Dict[str, Any]) -> Callable:
+    """Cria o __import__ restrito aos módulos permitidos"""
+    allowed = frozenset(allowed_imports)
+
+    def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name.split('.')[0] not in allowed:
+            raise ImportError(f"Import não permitido: {name}")
+        if name in overrides:
+            return overrides[name]
+        return builtins.__import__(name, globals, locals, fromlist, level)
+
+    return _safe_import
+
+
+# Builtins disponíveis ao aluno (input e __import__ são definidos por execução)
+SAFE_BUILTINS = types.MappingProxyType({
+    'print': print,
+    'len': len,
+    'range': range,
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'list': list,
+    'dict': dict,
+    'tuple': tuple,
+    'set': set,
+    'abs': abs,
+    'max': max,
+    'min': min,
+    'sum': sum,
+    'sorted': sorted,
+    'enumerate': enumerate,
+    'zip': zip,
+    'map': map,
+    'filter': filter,
+    'type': type,
+    'isinstance': isinstance,
+})
+
+
+def _build_namespace(input_data: str, importer: Callable) -> Dict[str, Any]:
+    """Cria o namespace isolado com os builtins permitidos"""
+    return {
+        '__builtins__': {
+            **SAFE_BUILTINS,
+            'input': lambda: input_data,
+            '__import__': importer,
+        }
+    }
+
+
+class _OutputBudget:
+    """Limite de caracteres compartilhado entre stdout e stderr de um caso"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.remaining = limit
+        self.exceeded = False
+
+
+class _OutputMatcher:
+    """
+    Compara a saída com a esperada à medida que ela é escrita.
+
+    Equivale a `saida.strip() == esperada.strip()` no fim da execução,
+    mas detecta a divergência no primeiro caractere errado: depois do
+    espaço em branco inicial, a saída tem que seguir a esperada caractere
+    a caractere e, depois dela, só pode haver espaço em branco.
+    """
+
+    # Tamanho máximo das linhas mostradas no veredito
+    PREVIEW_CHARS = 200
+
+    def __init__(self, expected: str):
+        self.expected = expected.strip()
+        self.started = False  # Espaço em branco inicial já consumido
+        self.pos = 0  # Caracteres da saída esperada já conferidos
+        self.line = 1
+        self.column = 1
+        self._current_line = ""
+        self.mismatch: Optional[Dict[str, Any]] = None
+
+    def feed(self, text: str) -> bool:
+        """Confere um trecho da saída; False na primeira divergência"""
+        if self.mismatch is not None:
+            return False
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return True
+            self.started = True
+
+        expected = self.expected
+        if self.pos < len(expected):
+            chunk = text[:len(expected) - self.pos]
+            if not expected.startswith(chunk, self.pos):
+                k = next(
+                    k for k, (got, want) in enumerate(zip(chunk, expected[self.pos:]))
+                    if got != want
+                )
+                self._advance(chunk[:k])
+                self._fail(text[k:])
+                return False
+            self._advance(chunk)
+            self.pos += len(chunk)
+            text = text[len(chunk):]
+
+        if text and not text.isspace():
+            # Passou do fim da saída esperada
+            k = len(text) - len(text.lstrip())
+            self._advance(text[:k])
+            self._fail(text[k:])
+            return False
+        self._advance(text)
+        return True
+
+    def finish(self) -> bool:
+        """Veredito no fim da execução (saída incompleta também é divergência)"""
+        if self.mismatch is None and self.pos < len(self.expected):
+            self._fail("")
+        return self.mismatch is None
+
+    def _advance(self, text: str) -> None:
+        newlines = text.count("\n")
+        if newlines:
+            self.line += newlines
+            tail = text[text.rfind("\n") + 1:]
+            self.column = len(tail) + 1
+            self._current_line = tail[:self.PREVIEW_CHARS]
+        else:
+            self.column += len(text)
+            if len(self._current_line) < self.PREVIEW_CHARS:
+                self._current_line = (self._current_line + text)[:self.PREVIEW_CHARS]
+
+    def _fail(self, rest: str) -> None:
+        expected_lines = self.expected.split("\n")
+        expected_line = expected_lines[self.line - 1] if self.line <= len(expected_lines) else ""
+        actual_line = self._current_line + rest.split("\n", 1)[0]
+        self.mismatch = {
+            "line": self.line,
+            "column": self.column,
+            "expected": expected_line[:self.PREVIEW_CHARS],
+            "actual": actual_line[:self.PREVIEW_CHARS],
+        }
+
+
+class _CappedWriter(io.TextIOBase):
+    """
+    stdout/stderr do sandbox: ao atingir o limite, grava o trecho que
+    cabe + TRUNCATION_MARKER e levanta OutputLimitExceeded (e continua
+    levantando nas próximas escritas).
+
+    Sem conn, acumula a saída (limitada) em memória. Com conn (modo
+    streaming), envia a saída ao processo pai linha a linha (ou a cada
+    4 KB) em vez de acumular tudo.
+
+    Com um matcher, cada escrita é conferida com a saída esperada e a
+    primeira divergência levanta OutputMismatch.
+    """
+
+    CHUNK_SIZE = 4096
+
+    def __init__(
+        self,
+        budget: _OutputBudget,
+        matcher: Optional[_OutputMatcher] = None,
+        conn=None,
+        stream: str = "stdout"
+    ):
+        self.budget = budget
+        self.matcher = matcher
+        self.bytes_written = 0
+        self.conn = conn
+        self.stream = stream
+        self._captured = io.StringIO() if conn is None else None
+        self._pending: List[str] = []
+        self._size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        budget = self.budget
+        size = len(text)
+        if size <= budget.remaining:
+            budget.remaining -= size
+            self.bytes_written += len(text.encode("utf-8", "replace"))
+            self._emit(text)
+            if self.matcher is not None and not self.matcher.feed(text):
+                raise OutputMismatch()
+            return size
+
+        if not budget.exceeded:
+            self.bytes_written += len(text[:budget.remaining].encode("utf-8", "replace"))
+            self._emit(text[:budget.remaining] + TRUNCATION_MARKER)
+            budget.remaining = 0
+            budget.exceeded = True
+        raise OutputLimitExceeded(f"Limite de saída excedido ({budget.limit} caracteres)")
+
+    def _emit(self, text: str) -> None:
+        if self.conn is None:
+            self._captured.write(text)
+            return
+        self._pending.append(text)
+        self._size += len(text)
+        if "\n" in text or self._size >= self.CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.conn.send({"stream": self.stream, "data": "".join(self._pending)})
+            self._pending = []
+            self._size = 0
+
+    def getvalue(self) -> str:
+        """Saída acumulada (vazia no modo streaming: ela já foi enviada)"""
+        return self._captured.getvalue() if self._captured is not None else ""
+
+
+def _virtual_memory_bytes() -> int:
+    """Memória virtual atual do processo (0 se não for possível medir)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _reset_peak_rss() -> bool:
+    """Zera o pico de RSS do processo (Linux: /proc/self/clear_refs)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb(reset_ok: bool) -> int:
+    """
+    Pico de RSS desde o último reset (VmHWM). Sem reset disponível,
+    cai no ru_maxrss, que é o pico de toda a vida do worker.
+    """
+    if reset_ok:
+        try:
+            with open("/proc/self/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            pass
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _code_objects(code: types.CodeType) -> Iterator[types.CodeType]:
+    """O código do módulo e os aninhados (funções, classes, lambdas, comprehensions)"""
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _code_objects(const)
+
+
+def _tight_loops(code: types.CodeType) -> frozenset:
+    """Offsets dos saltos para trás que voltam à mesma linha (loops de uma linha)"""
+    instructions = list(dis.get_instructions(code))
+    lines = {inst.offset: inst.positions.lineno for inst in instructions}
+    return frozenset(
+        inst.offset for inst in instructions
+        if "JUMP_BACKWARD" in inst.opname and lines.get(inst.argval) == inst.positions.lineno
+    )
+
+
+class _LineBudget:
+    """
+    Conta as linhas executadas do código do aluno e interrompe a execução
+    (LineBudgetExceeded) ao passar de `limit`. Cada volta de um loop
+    escrito em uma só linha (ex.: `while True: pass`, que não gera
+    eventos de linha) também conta.
+
+    Ao contrário do tempo limite, o veredito não depende da carga da
+    máquina: o mesmo código com a mesma entrada sempre executa o mesmo
+    número de linhas. Só o código do aluno é contado (bibliotecas não).
+
+    Usa sys.monitoring (Python 3.12+), que instrumenta apenas os code
+    objects do aluno. Nas versões anteriores usa sys.settrace, mais caro
+    e desligado pelo próprio CPython quando o tracer levanta exceção: um
+    `except:` do aluno que siga em loop depois disso cai no tempo limite
+    comum, mas `exceeded` continua valendo como veredito.
+    """
+
+    TOOL_NAME = "pystep-line-budget"
+
+    def __init__(self, code_obj: types.CodeType, limit: int):
+        self.limit = limit
+        self.count = 0
+        self.exceeded = False
+        self._codes = frozenset(_code_objects(code_obj))
+        self._loops = {code: _tight_loops(code) for code in self._codes}
+        self._loops = {code: loops for code, loops in self._loops.items() if loops}
+        self._monitoring = getattr(sys, "monitoring", None)
+
+    def __enter__(self) -> "_LineBudget":
+        monitoring = self._monitoring
+        if monitoring is not None:
+            tool = monitoring.PROFILER_ID
+            monitoring.use_tool_id(tool, self.TOOL_NAME)
+            events = monitoring.events
+            monitoring.register_callback(tool, events.LINE, self._on_line)
+            monitoring.register_callback(tool, events.JUMP, self._on_jump)
+            for code in self._codes:
+                monitoring.set_local_events(
+                    tool, code, events.LINE | events.JUMP if code in self._loops else events.LINE
+                )
+        else:
+            sys.settrace(self._trace)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        monitoring = self._monitoring
+        if monitoring is not None:
+            tool = monitoring.PROFILER_ID
+            for code in self._codes:
+                monitoring.set_local_events(tool, code, monitoring.events.NO_EVENTS)
+            monitoring.register_callback(tool, monitoring.events.LINE, None)
+            monitoring.register_callback(tool, monitoring.events.JUMP, None)
+            monitoring.free_tool_id(tool)
+        else:
+            sys.settrace(None)
+
+    def _tick(self) -> None:
+        self.count += 1
+        if self.count > self.limit:
+            self.exceeded = True
+            raise LineBudgetExceeded()
+
+    def _on_line(self, code, line_number) -> None:
+        self._tick()
+
+    def _on_jump(self, code, instruction_offset, destination_offset):
+        if instruction_offset not in self._loops[code]:
+            return self._monitoring.DISABLE  # Não volta a ser chamado neste salto
+        self._tick()
+
+    def _trace(self, frame, event, arg):
+        # Chamado a cada novo frame: só os do aluno recebem o tracer de linhas
+        code = frame.f_code
+        if code not in self._codes:
+            return None
+        if code in self._loops:
+            frame.f_trace_opcodes = True
+        return self._trace_lines
+
+    def _trace_lines(self, frame, event, arg):
+        if event == "line":
+            self._tick()
+        elif event == "opcode" and frame.f_lasti in self._loops[frame.f_code]:
+            self._tick()
+        return self._trace_lines
+
+
+def _apply_limits(memory_mb: int, cpu_seconds: float) -> Callable[[], None]:
+    """
+    Aplica rlimits de memória (RLIMIT_AS) e CPU (RLIMIT_CPU) para uma
+    execução e devolve a função que restaura os limites anteriores.
+
+    Os limites são relativos ao uso atual do worker: RLIMIT_AS é o
+    tamanho atual + memory_mb e RLIMIT_CPU é o tempo de CPU já gasto +
+    cpu_seconds (o worker é reutilizado entre execuções).
+    """
+    if resource is None:
+        return lambda: None
+
+    saved = []
+
+    def _set(kind, limit):
+        soft, hard = resource.getrlimit(kind)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(kind, (limit, hard))
+        saved.append((kind, (soft, hard)))
+
+    current = _virtual_memory_bytes()
+    if memory_mb and current:
+        _set(resource.RLIMIT_AS, current + memory_mb * 1024 * 1024)
+
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _set(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1)
+
+    def restore():
+        for kind, limits in reversed(saved):
+            resource.setrlimit(kind, limits)
+
+    return restore
+
+
+def _run_case(
+    code_obj,
+    input_data: str,
+    importer: Callable,
+    limits: Dict[str, Any],
+    stream_conn=None,
+    matcher: Optional[_OutputMatcher] = None
+) -> Dict[str, Any]:
+    """
+    Executa o código uma vez, com um namespace novo.
+
+    Com stream_conn, a saída é enviada ao pai durante a execução.
+    Com matcher, stdout é conferido durante a execução, que termina
+    (com status "success") na primeira divergência. Com
+    limits["line_budget"], a execução é limitada em linhas (_LineBudget).
+    O resultado inclui o uso de recursos do caso: cpu_user/cpu_system
+    (segundos), peak_rss_kb, stdout_bytes e, com orçamento, lines.
+    """
+    budget = _OutputBudget(limits["max_output"])
+    stdout = _CappedWriter(budget, matcher, conn=stream_conn, stream="stdout")
+    stderr = _CappedWriter(budget, conn=stream_conn, stream="stderr")
+    namespace = _build_namespace(input_data, importer)
+    line_budget = _LineBudget(code_obj, limits["line_budget"]) if limits.get("line_budget") else None
+    reset_ok = _reset_peak_rss()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+    start = time.perf_counter()
+
+    restore_limits = _apply_limits(limits["memory_mb"], limits["cpu_seconds"])
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            if line_budget is None:
+                exec(code_obj, namespace)
+            else:
+                with line_budget:
+                    exec(code_obj, namespace)
+    except BaseException as e:
+        error = e
+    else:
+        error = None
+    finally:
+        restore_limits()
+    elapsed = round(time.perf_counter() - start, 4)
+
+    if usage_before is not None:
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_user = round(usage_after.ru_utime - usage_before.ru_utime, 4)
+        cpu_system = round(usage_after.ru_stime - usage_before.ru_stime, 4)
+    else:
+        cpu_user = cpu_system = 0.0
+
+    if matcher is not None and matcher.mismatch is not None:
+        # Resposta errada, não erro de execução: o veredito vem do matcher.
+        # Erros levantados depois da divergência (ex.: em um except do
+        # aluno durante a interrupção) não contam
+        error_msg = None
+    elif line_budget is not None and line_budget.exceeded:
+        error_msg = f"⏱️ Limite de execução excedido ({line_budget.limit} linhas executadas)"
+    elif budget.exceeded:
+        error_msg = f"📄 Limite de saída excedido ({budget.limit} caracteres)"
+    elif isinstance(error, MemoryError):
+        error_msg = f"💾 Limite de memória excedido ({limits['memory_mb']} MB)"
+    elif error is not None:
+        error_msg = f"{type(error).__name__}: {str(error)}"
+    else:
+        error_msg = None
+
+    try:
+        stdout.flush()
+        stderr.flush()
+    except (OutputLimitExceeded, OutputMismatch):
+        pass
+    del namespace, error
+
+    return {
+        "output": stdout.getvalue(),
+        "error": error_msg if error_msg is not None else stderr.getvalue(),
+        "status": "error" if error_msg is not None else "success",
+        "time": elapsed,
+        "cpu_user": cpu_user,
+        "cpu_system": cpu_system,
+        "peak_rss_kb": _peak_rss_kb(reset_ok),
+        "stdout_bytes": stdout.bytes_written,
+        # Linhas executadas (só com orçamento de linhas)
+        "lines": line_budget.count if line_budget is not None else None,
+    }
+
+
+def _run_job(conn, job: Dict[str, Any], allowed_imports: Iterable[str]) -> None:
+    """
+    Executa todos os casos de um job, enviando um resultado por caso.
+
+    Um None no Pipe indica o fim do job. Com fail_fast, para no
+    primeiro caso que não passou. Se o job tiver "seed", cada caso roda
+    em modo determinístico (random com a semente, relógio congelado).
+    Com "stream", a saída vai em mensagens {"stream", "data"} durante a
+    execução e não é repetida no resultado do caso.
+
+    Casos com expected_output são corrigidos durante a execução
+    (_OutputMatcher); se não passarem, o resultado traz "mismatch" com
+    a linha/coluna da primeira divergência.
+    """
+    code_obj = marshal.loads(job["bytecode"])
+    seed = job.get("seed")
+    overrides = {"datetime": _frozen_datetime_module()} if seed is not None else {}
+    importer = _make_importer(allowed_imports, overrides)
+    stream_conn = conn if job.get("stream") else None
+
+    for case in job["cases"]:
+        if seed is not None:
+            random.seed(seed)
+        expected = case.get("expected_output")
+        matcher = _OutputMatcher(expected) if expected is not None else None
+        result = _run_case(
+            code_obj,
+            case.get("input_data", ""),
+            importer,
+            job["limits"],
+            stream_conn=stream_conn,
+            matcher=matcher
+        )
+        if matcher is not None:
+            result["passed"] = result["status"] == "success" and matcher.finish()
+            if result["status"] == "success" and not result["passed"]:
+                result["mismatch"] = matcher.mismatch
+        if stream_conn is not None:
+            result["output"] = ""
+            if result["status"] == "success":
+                result["error"] = ""
+        conn.send(result)
+        if job["fail_fast"] and result.get("passed") is False:
+            break
+    conn.send(None)
+
+
+def _preload(allowed_imports: Iterable[str]) -> None:
+    """
+    Importa os módulos permitidos e congela o heap do fork-server: os
+    filhos herdam tudo pronto, e o GC dos filhos não toca (e portanto
+    não copia) as páginas herdadas.
+    """
+    for name in allowed_imports:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    _frozen_datetime_module()
+    gc.collect()
+    gc.freeze()
+
+
+# Código de saída do filho que recebeu o pedido de encerramento
+_EXIT_SHUTDOWN = 3
+
+
+def _child_main(conn, allowed_imports: Iterable[str], started_fd: int) -> None:
+    """
+    Filho pré-criado: espera um job no Pipe, roda e termina.
+
+    Avisa o fork-server (started_fd) ao pegar um job, para que uma
+    morte durante a execução seja reportada ao processo da API.
+    """
+    try:
+        job = conn.recv()
+    except (EOFError, OSError):
+        os._exit(_EXIT_SHUTDOWN)
+    if job is None:
+        os._exit(_EXIT_SHUTDOWN)
+    os.write(started_fd, b"1")
+    os.close(started_fd)
+    _run_job(conn, job, allowed_imports)
+    os._exit(0)
+
+
+def _fork_server(conn, allowed_imports: Iterable[str]) -> None:
+    """
+    Mantém sempre um filho pronto (o fork acontece enquanto o worker está
+    ocioso), então o custo do fork fica fora do caminho da execução.
+
+    O filho fala direto com o processo da API pelo Pipe herdado. Se ele
+    morrer no meio de um job (ex.: SIGXCPU), o fork-server avisa com
+    {"crashed": True}.
+    """
+    _preload(allowed_imports)
+    while True:
+        started_r, started_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(started_r)
+            try:
+                _child_main(conn, allowed_imports, started_w)
+            finally:
+                os._exit(1)
+
+        os.close(started_w)
+        _, status = os.waitpid(pid, 0)
+        started = os.read(started_r, 1)
+        os.close(started_r)
+        if os.WIFEXITED(status) and os.WEXITSTATUS(status) == _EXIT_SHUTDOWN:
+            break
+        if status != 0 and started:
+            conn.send({"crashed": True})
+
+
+def _worker_main(conn, parent_conn, allowed_imports: Iterable[str], fork_per_job: bool) -> None:
+    """Loop principal do worker: recebe jobs até receber None"""
+    # A ponta do pai vem junto no fork: sem fechá-la, o worker (e o filho
+    # pré-criado) nunca recebe EOF se o processo da API morrer
+    parent_conn.close()
+    # Ctrl+C no terminal é tratado pelo processo da API
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Grupo de processos próprio: o kill do timeout leva junto o filho
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    if fork_per_job and hasattr(os, "fork"):
+        _fork_server(conn, allowed_imports)
+        conn.close()
+        return
+
+    # Sem fork por job: o mesmo processo roda os jobs em sequência
+    _preload(allowed_imports)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        _run_job(conn, job, allowed_imports)
+
+    conn.close()
+
+
+class _Worker:
+    """Processo worker e a ponta do Pipe usada pelo processo pai"""
+
+    def __init__(self, ctx, allowed_imports: Iterable[str], fork_per_job: bool = True):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.conn, tuple(allowed_imports), fork_per_job),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    def kill(self) -> None:
+        """Finaliza o worker (e o filho do job em andamento) imediatamente"""
+        if self.process.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (AttributeError, OSError):
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        """Pede para o worker encerrar; força o kill se não responder"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+
+class SandboxPool:
+    """
+    Pool de workers pré-criados para execução de código.
+
+    Uso:
+        pool = SandboxPool(size=4, max_jobs_per_worker=100, memory_mb=128)
+        bytecode = marshal.dumps(compile("print(1)", "<string>", "exec"))
+        result = pool.run(bytecode, timeout=2)
+    """
+
+    def __init__(
+        self,
+        size: int = 0,
+        max_jobs_per_worker: int = 100,
+        allowed_imports: Iterable[str] = (),
+        memory_mb: int = 0,
+        max_output: int = 65536,
+        fork_per_job: bool = True,
+        line_budget: int = 0
+    ):
+        self.size = size or os.cpu_count() or 1
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.allowed_imports = frozenset(allowed_imports)
+        self.memory_mb = memory_mb  # 0 = sem limite
+        self.max_output = max_output
+        # Um processo novo por job: nada do job anterior (ex.: módulos
+        # alterados pelo aluno) chega ao próximo
+        self.fork_per_job = fork_per_job
+        # Linhas executadas por caso (0 = só o tempo limite)
+        self.line_budget = line_budget
+        start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        self._ctx = mp.get_context(start_method)
+        self._idle: List[_Worker] = []
+        self._workers: List[_Worker] = []
+        self._cond = threading.Condition()
+        self._started = False
+
+    def start(self) -> None:
+        """Cria os workers (idempotente)"""
+        with self._cond:
+            if self._started:
+                return
+            for _ in range(self.size):
+                worker = _Worker(self._ctx, self.allowed_imports, self.fork_per_job)
+                self._workers.append(worker)
+                self._idle.append(worker)
+            self._started = True
+
+    def shutdown(self) -> None:
+        """Encerra todos os workers"""
+        with self._cond:
+            workers, self._workers, self._idle = self._workers, [], []
+            self._started = False
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+
+    def _acquire(self) -> _Worker:
+        with self._cond:
+            if not self._started:
+                self.start()
+            while not self._idle:
+                self._cond.wait()
+            return self._idle.pop()
+
+    def _release(self, worker: _Worker, healthy: bool = True) -> None:
+        recycle = not healthy or worker.jobs_done >= self.max_jobs_per_worker
+        if recycle:
+            if healthy:
+                worker.stop()
+            else:
+                worker.kill()
+
+        with self._cond:
+            if worker not in self._workers:
+                # Pool encerrado durante a execução
+                if not recycle:
+                    worker.stop()
+                return
+            if recycle:
+                self._workers.remove(worker)
+                worker = _Worker(self._ctx, self.allowed_imports, self.fork_per_job)
+                self._workers.append(worker)
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def run_cases(
+        self,
+        bytecode: bytes,
+        cases: List[Dict[str, Any]],
+        timeout: Optional[float] = None,
+        fail_fast: bool = False,
+        seed: Optional[int] = None,
+        on_output: Optional[Callable[[str, str], None]] = None,
+        line_budget: Optional[int] = None,
+        memory_mb: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Executa vários casos de teste em uma única ida ao worker.
+
+        Args:
+            bytecode: Código compilado (marshal)
+            cases: [{"input_data": str, "expected_output": str | None}, ...]
+            timeout: Tempo limite por caso (segundos)
+            fail_fast: Parar no primeiro caso que falhar
+            seed: Semente do modo determinístico (None = desligado)
+            on_output: Callback (stream, texto) para receber stdout/stderr
+                durante a execução. Se ele levantar exceção, o worker é
+                finalizado e a exceção propagada.
+            line_budget: Linhas executadas por caso (padrão: o do pool;
+                0 = sem limite). O tempo limite continua valendo.
+            memory_mb: Limite de memória por caso (padrão: o do pool)
+
+        Returns:
+            Um resultado por caso executado. Um caso que excede o tempo
+            tem status "timeout" (o worker é finalizado e os casos
+            seguintes não rodam); se o worker morrer, status "crash".
+            O primeiro resultado traz "queue_time": o tempo esperando um
+            worker livre.
+        """
+        queued_at = time.monotonic()
+        worker = self._acquire()
+        queue_time = round(time.monotonic() - queued_at, 4)
+        results: List[Dict[str, Any]] = []
+        healthy = True
+        sent_at = time.monotonic()
+        try:
+            worker.conn.send({
+                "bytecode": bytecode,
+                "cases": cases,
+                "fail_fast": fail_fast,
+                "seed": seed,
+                "stream": on_output is not None,
+                "limits": {
+                    "memory_mb": self.memory_mb if memory_mb is None else memory_mb,
+                    "cpu_seconds": timeout or 0,
+                    "max_output": self.max_output,
+                    "line_budget": self.line_budget if line_budget is None else line_budget
+                }
+            })
+            deadline = None if timeout is None else sent_at + timeout
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                # Com saída contínua o poll nunca expira: checar o prazo antes
+                if remaining is not None and remaining <= 0 or not worker.conn.poll(remaining):
+                    results.append(self._failed_case("timeout", timeout or 0))
+                    healthy = False
+                    break
+                message = worker.conn.recv()
+                if message is None:
+                    break
+                if "stream" in message:
+                    on_output(message["stream"], message["data"])
+                    continue
+                if message.get("crashed"):
+                    # O filho do job morreu; o fork-server continua saudável
+                    results.append(self._failed_case("crash", round(time.monotonic() - sent_at, 4)))
+                    break
+                results.append(message)
+                if timeout is not None:
+                    deadline = time.monotonic() + timeout
+        except (EOFError, OSError):
+            results.append(self._failed_case("crash", round(time.monotonic() - sent_at, 4)))
+            healthy = False
+        except BaseException:
+            self._release(worker, healthy=False)
+            raise
+
+        if healthy:
+            worker.jobs_done += 1
+        self._release(worker, healthy=healthy)
+        results[0]["queue_time"] = queue_time
+        return results
+
+    @staticmethod
+    def _failed_case(status: str, elapsed: float) -> Dict[str, Any]:
+        return {
+            "output": "",
+            "error": "",
+            "status": status,
+            "time": elapsed,
+            "passed": False,
+            # Worker finalizado: uso de recursos desconhecido
+            "cpu_user": None,
+            "cpu_system": None,
+            "peak_rss_kb": None,
+            "stdout_bytes": None,
+        }
+
+    def run(
+        self,
+        bytecode: bytes,
+        input_data: str = "",
+        timeout: Optional[float] = None,
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa o código compilado em um worker livre (bloqueia até haver um).
+
+        Raises:
+            SandboxTimeout: tempo limite excedido (worker finalizado)
+            SandboxCrash: worker morreu durante a execução
+        """
+        result = self.run_cases(bytecode, [{"input_data": input_data}], timeout=timeout, seed=seed)[0]
+        if result["status"] == "timeout":
+            raise SandboxTimeout("Tempo limite de execução excedido")
+        if result["status"] == "crash":
+            raise SandboxCrash("Worker finalizado inesperadamente")
+        return result
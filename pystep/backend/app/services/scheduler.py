@@ -0,0 +1,320 @@
+"""
+Execution Scheduler
+===================
+
+Controle de admissão na frente do CodeExecutor.
+
+- Limite de requisições por usuário (RATE_LIMIT_REQUESTS / RATE_LIMIT_WINDOW)
+- Limite de execuções simultâneas por usuário
+- Duas classes de execução com filas e pesos próprios:
+  "interactive" (botão Executar: latência baixa, timeout curto) e
+  "batch" (submissões corrigidas e recorreções em massa: vazão)
+- Filas limitadas, atendidas em round-robin entre usuários
+- Rejeição imediata (SchedulerBusy -> HTTP 429 + Retry-After) quando
+  saturado, em vez de deixar a latência crescer sem limite
+"""
+
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.executor import executor
+
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class SchedulerBusy(Exception):
+    """Execução recusada; o cliente deve tentar de novo após retry_after segundos"""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Lane:
+    """Fila de uma classe de execução"""
+
+    def __init__(self, name: str, weight: int, queue_size: int):
+        self.name = name
+        self.weight = max(1, weight)
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        # Ordem das chaves = ordem do round-robin entre usuários
+        self.waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Crédito do round-robin ponderado entre as filas
+        self.credit = 0
+        # Média móvel do tempo de uso de um slot (estimativa do Retry-After)
+        self.service_time = 1.0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "running": self.active,
+            "queued": self.queued,
+            "queue_size": self.queue_size,
+            "users_waiting": len(self.waiting),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "avg_service_time": round(self.service_time, 3),
+        }
+
+
+class ExecutionScheduler:
+    """
+    Distribui os slots de execução (um por worker do sandbox) entre
+    as filas e, dentro de cada fila, entre os usuários.
+
+    Uso:
+        async with scheduler.slot(user_key, INTERACTIVE):
+            result = await executor.run(code, timeout=RUN_TIMEOUT)
+
+    Slots livres vão para as filas em round-robin ponderado. A fila batch
+    nunca ocupa os `interactive_reserved` últimos slots, então uma
+    recorreção em massa não aumenta a espera do botão Executar.
+
+    Todo o estado é acessado apenas pelo event loop (sem locks).
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        queue_size: int = 64,
+        max_running_per_user: int = 1,
+        max_queued_per_user: int = 3,
+        rate_limit_requests: int = 100,
+        rate_limit_window: int = 60,
+        interactive_queue_size: int = 32,
+        interactive_weight: int = 4,
+        batch_weight: int = 1,
+        interactive_reserved: int = 1
+    ):
+        self.capacity = max(1, capacity)
+        self.max_running_per_user = max(1, max_running_per_user)
+        self.max_queued_per_user = max_queued_per_user
+        self.rate_limit_requests = rate_limit_requests
+        self.rate_limit_window = rate_limit_window
+        # Com um único slot não há o que reservar: vale só o peso
+        self.batch_capacity = max(1, self.capacity - max(0, interactive_reserved))
+
+        self.lanes: Dict[str, _Lane] = {
+            INTERACTIVE: _Lane(INTERACTIVE, interactive_weight, interactive_queue_size),
+            BATCH: _Lane(BATCH, batch_weight, queue_size),
+        }
+        self._active = 0
+        self._running: Dict[Tuple[str, str], int] = {}
+        self._requests: Dict[str, Deque[float]] = {}
+        self.rejected_rate_limit = 0
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        key: str,
+        lane: str = BATCH,
+        rate_limited: bool = True
+    ) -> AsyncIterator[None]:
+        """
+        Reserva um slot de execução para o usuário `key` na fila `lane`.
+
+        Trabalho interno (ex.: recorreção em massa) usa rate_limited=False:
+        continua sujeito às filas e aos limites por chave, mas não ao
+        limite de requisições por janela.
+
+        Raises:
+            SchedulerBusy: limite de requisições excedido ou fila cheia
+        """
+        queue = self.lanes[lane]
+        waiter = self._admit(key, queue, rate_limited)
+        if waiter is not None:
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.cancelled():
+                    self._dequeue(key, queue, waiter)
+                else:
+                    # Slot concedido junto com o cancelamento
+                    self._release(key, queue, None)
+                raise
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(key, queue, time.monotonic() - started)
+
+    def _can_run(self, key: str, lane: _Lane) -> bool:
+        if self._running.get((lane.name, key), 0) >= self.max_running_per_user:
+            return False
+        return lane.name != BATCH or lane.active < self.batch_capacity
+
+    def _admit(self, key: str, lane: _Lane, rate_limited: bool = True) -> Optional[asyncio.Future]:
+        """Admite a requisição: None se pode rodar já, ou um Future da fila"""
+        if rate_limited:
+            self._check_rate(key)
+
+        # Slots livres após um _dispatch() significam que quem está na fila
+        # esbarrou no limite por usuário (ou da fila batch)
+        if self._active < self.capacity and self._can_run(key, lane):
+            self._grant(key, lane)
+            self._record_request(key, lane, rate_limited)
+            return None
+
+        waiting = lane.waiting.get(key)
+        user_queued = len(waiting) if waiting else 0
+        if lane.queued >= lane.queue_size:
+            lane.rejected_queue_full += 1
+            raise SchedulerBusy(
+                "Servidor ocupado, tente novamente em instantes",
+                self._retry_after(lane, lane.queued + 1, self.capacity)
+            )
+        if user_queued >= self.max_queued_per_user:
+            lane.rejected_queue_full += 1
+            raise SchedulerBusy(
+                "Muitas execuções pendentes, aguarde as anteriores terminarem",
+                self._retry_after(lane, user_queued + 1, self.max_running_per_user)
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        if waiting is None:
+            waiting = lane.waiting[key] = deque()
+        waiting.append(waiter)
+        lane.queued += 1
+        self._record_request(key, lane, rate_limited)
+        return waiter
+
+    def _check_rate(self, key: str) -> None:
+        if self.rate_limit_requests <= 0:
+            return
+        now = time.monotonic()
+        window = self._requests.get(key)
+        if window is None:
+            if len(self._requests) > 4096:
+                self._prune_windows(now)
+            return
+        while window and window[0] <= now - self.rate_limit_window:
+            window.popleft()
+        if len(window) >= self.rate_limit_requests:
+            self.rejected_rate_limit += 1
+            raise SchedulerBusy(
+                "Limite de execuções excedido, aguarde um pouco",
+                max(1, math.ceil(window[0] + self.rate_limit_window - now))
+            )
+
+    def _prune_windows(self, now: float) -> None:
+        """Remove usuários sem requisições na janela atual"""
+        cutoff = now - self.rate_limit_window
+        for key in [k for k, w in self._requests.items() if not w or w[-1] <= cutoff]:
+            del self._requests[key]
+
+    def _record_request(self, key: str, lane: _Lane, rate_limited: bool = True) -> None:
+        lane.admitted += 1
+        if rate_limited and self.rate_limit_requests > 0:
+            self._requests.setdefault(key, deque()).append(time.monotonic())
+
+    def _grant(self, key: str, lane: _Lane) -> None:
+        self._active += 1
+        lane.active += 1
+        slot = (lane.name, key)
+        self._running[slot] = self._running.get(slot, 0) + 1
+
+    def _dequeue(self, key: str, lane: _Lane, waiter: asyncio.Future) -> None:
+        waiting = lane.waiting.get(key)
+        if waiting is None:
+            return
+        try:
+            waiting.remove(waiter)
+        except ValueError:
+            return
+        lane.queued -= 1
+        if not waiting:
+            del lane.waiting[key]
+
+    def _release(self, key: str, lane: _Lane, elapsed: Optional[float]) -> None:
+        self._active -= 1
+        lane.active -= 1
+        slot = (lane.name, key)
+        running = self._running[slot] - 1
+        if running:
+            self._running[slot] = running
+        else:
+            del self._running[slot]
+        if elapsed is not None:
+            lane.service_time = 0.8 * lane.service_time + 0.2 * elapsed
+        self._dispatch()
+
+    def _next_user(self, lane: _Lane) -> Optional[str]:
+        """Primeiro usuário da fila (ordem round-robin) que pode rodar agora"""
+        for key in lane.waiting:
+            if self._can_run(key, lane):
+                return key
+        return None
+
+    def _dispatch(self) -> None:
+        """
+        Concede slots livres: round-robin ponderado entre as filas
+        (smooth weighted round-robin) e round-robin entre usuários.
+        """
+        while self._active < self.capacity:
+            ready = []
+            for lane in self.lanes.values():
+                key = self._next_user(lane)
+                if key is not None:
+                    ready.append((lane, key))
+            if not ready:
+                return
+
+            total = sum(lane.weight for lane, _ in ready)
+            for lane, _ in ready:
+                lane.credit += lane.weight
+            lane, key = max(ready, key=lambda item: item[0].credit)
+            lane.credit -= total
+
+            waiting = lane.waiting[key]
+            waiter = waiting.popleft()
+            lane.queued -= 1
+            if waiting:
+                lane.waiting.move_to_end(key)
+            else:
+                del lane.waiting[key]
+
+            if waiter.done():
+                continue  # Cancelado; a tarefa ainda não tratou o CancelledError
+            self._grant(key, lane)
+            waiter.set_result(None)
+
+    def _retry_after(self, lane: _Lane, ahead: int, slots: int) -> int:
+        return max(1, math.ceil(lane.service_time * ahead / slots))
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de admissão"""
+        return {
+            "capacity": self.capacity,
+            "batch_capacity": self.batch_capacity,
+            "running": self._active,
+            "rejected_rate_limit": self.rejected_rate_limit,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+
+# Instância global
+scheduler = ExecutionScheduler(
+    capacity=executor.pool.size,
+    queue_size=settings.SCHEDULER_QUEUE_SIZE,
+    max_running_per_user=settings.SCHEDULER_MAX_RUNNING_PER_USER,
+    max_queued_per_user=settings.SCHEDULER_MAX_QUEUED_PER_USER,
+    rate_limit_requests=settings.RATE_LIMIT_REQUESTS,
+    rate_limit_window=settings.RATE_LIMIT_WINDOW,
+    interactive_queue_size=settings.SCHEDULER_INTERACTIVE_QUEUE_SIZE,
+    interactive_weight=settings.SCHEDULER_INTERACTIVE_WEIGHT,
+    batch_weight=settings.SCHEDULER_BATCH_WEIGHT,
+    interactive_reserved=settings.SCHEDULER_INTERACTIVE_RESERVED
+)
@@ -0,0 +1,496 @@
+"""
+Executor Benchmark
+==================
+
+Micro-benchmark do sandbox de execução com os exercícios do currículo.
+
+Programas medidos:
+- Exercícios de seed_db.py, seed_lessons.py e popular_exercicios.py
+  (extraídos por AST, sem executar os scripts nem tocar no banco). Como
+  os seeds não trazem gabarito, a solução de referência é a dica, quando
+  ela é código que passa, ou um print da saída esperada
+- Cargas de trabalho realistas (laços, strings, ordenação, json)
+- Programas patológicos: loop infinito, saída enorme, recursão
+  profunda, estouro de memória
+
+Métricas (percentis p50/p90/p99/max, em ms):
+- validation: validação + compilação + marshal (sem cache)
+- dispatch: ida e volta ao worker menos o tempo de execução (fila,
+  Pipe, fork-server)
+- execution: tempo de execução dentro do worker
+- startup / teardown (p50/p95/p99/max, por execução): no backend fork,
+  cada execução roda em um filho novo do fork-server; startup vai do
+  fork até o filho estar pronto para receber o job, teardown da saída
+  do filho até o fork-server colhê-lo (waitpid). Medido em um
+  fork-server de teste com o mesmo preload do sandbox (_preload), fora
+  do pool, para não misturar com as execuções. No backend reuse não há
+  filho por execução e as amostras ficam vazias
+- pool_startup_ms / pool_teardown_ms (um valor por pool): criar o pool
+  até todos os workers responderem / encerrar o pool
+- throughput: execuções por segundo, total e por worker
+
+Uso (na pasta backend):
+    python -m benchmarks.executor_bench
+    python -m benchmarks.executor_bench --backend reuse --output reuse.json
+    python -m benchmarks.executor_bench --iterations 200 --skip-pathological
+
+O resultado é um JSON (stdout ou --output) para comparar backends e
+versões ao longo do tempo.
+"""
+
+import os
+import ast
+import json
+import time
+import marshal
+import argparse
+import platform
+import threading
+import multiprocessing as mp
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.services.sandbox import SandboxPool, _preload
+from app.services.code_validator import CodeValidator
+from benchmarks.stats import percentiles
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SEED_FILES = ("seed_db.py", "seed_lessons.py", "popular_exercicios.py")
+
+# Nomes dos campos nos seeds (popular_exercicios.py usa nomes em português)
+_FIELD_ALIASES = {
+    "titulo": "titulo",
+    "expected_output": "expected_output",
+    "saida_esperada": "expected_output",
+    "input_data": "input_data",
+    "entrada_exemplo": "input_data",
+    "dica": "dica",
+}
+
+WORKLOADS = [
+    {
+        "name": "fizzbuzz",
+        "code": (
+            "for i in range(1, 101):\n"
+            "    if i % 15 == 0:\n"
+            "        print('FizzBuzz')\n"
+            "    elif i % 3 == 0:\n"
+            "        print('Fizz')\n"
+            "    elif i % 5 == 0:\n"
+            "        print('Buzz')\n"
+            "    else:\n"
+            "        print(i)\n"
+        ),
+    },
+    {
+        "name": "primes_sieve",
+        "code": (
+            "n = 20000\n"
+            "crivo = [True] * (n + 1)\n"
+            "for i in range(2, int(n ** 0.5) + 1):\n"
+            "    if crivo[i]:\n"
+            "        for j in range(i * i, n + 1, i):\n"
+            "            crivo[j] = False\n"
+            "print(sum(1 for i in range(2, n + 1) if crivo[i]))\n"
+        ),
+    },
+    {
+        "name": "fibonacci_recursive",
+        "code": (
+            "def fib(n):\n"
+            "    return n if n < 2 else fib(n - 1) + fib(n - 2)\n"
+            "print(fib(20))\n"
+        ),
+    },
+    {
+        "name": "strings",
+        "code": (
+            "texto = 'o rato roeu a roupa do rei de roma ' * 200\n"
+            "palavras = texto.split()\n"
+            "contagem = {}\n"
+            "for p in palavras:\n"
+            "    contagem[p] = contagem.get(p, 0) + 1\n"
+            "print(sorted(contagem.items(), key=lambda kv: (-kv[1], kv[0]))[:3])\n"
+            "print(texto.upper().count('R'))\n"
+        ),
+    },
+    {
+        "name": "sort_json",
+        "code": (
+            "import json\n"
+            "import random\n"
+            "dados = [{'id': i, 'nota': random.randint(0, 100)} for i in range(2000)]\n"
+            "dados = sorted(dados, key=lambda d: (d['nota'], d['id']))\n"
+            "print(len(json.dumps(dados)))\n"
+        ),
+    },
+]
+
+PATHOLOGICAL = [
+    # Rejeitado na validação (loop infinito comprovado)
+    {"name": "infinite_loop", "code": "while True:\n    pass\n"},
+    # A validação não prova que estes não terminam: vão até o timeout
+    {"name": "counter_loop", "code": "n = 1\nwhile n > 0:\n    n = n + 1\n"},
+    {"name": "huge_output", "code": "for i in range(10 ** 9):\n    print('x' * 1000)\n"},
+    {"name": "deep_recursion", "code": "def f(n):\n    return f(n + 1)\nf(0)\n"},
+    {"name": "memory_hog", "code": "dados = []\nwhile True:\n    dados.append(' ' * 10 ** 6)\n"},
+]
+
+
+def _literal(node: ast.AST) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _fields(pairs: Iterator) -> Optional[Dict[str, str]]:
+    """Campos de um exercício a partir de pares (nome, nó); None se não for um"""
+    exercise = {}
+    for name, value in pairs:
+        field = _FIELD_ALIASES.get(name)
+        if field is None:
+            continue
+        value = _literal(value)
+        if isinstance(value, str):
+            exercise[field] = value
+    if "expected_output" not in exercise:
+        return None
+    exercise.setdefault("input_data", "")
+    return exercise
+
+
+def load_seed_exercises(backend_dir: Path = BACKEND_DIR) -> List[Dict[str, str]]:
+    """
+    Exercícios definidos nos scripts de seed.
+
+    Reconhece chamadas Exercise(...) com argumentos literais e dicionários
+    literais com a saída esperada (formato de seed_lessons.py e
+    popular_exercicios.py).
+    """
+    exercises = []
+    for filename in SEED_FILES:
+        path = backend_dir / filename
+        if not path.exists():
+            continue
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=filename)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call) and getattr(node.func, "id", None) == "Exercise":
+                exercise = _fields((kw.arg, kw.value) for kw in node.keywords)
+            elif isinstance(node, ast.Dict):
+                exercise = _fields(
+                    (_literal(key), value) for key, value in zip(node.keys, node.values)
+                    if key is not None
+                )
+            else:
+                exercise = None
+            if exercise is not None:
+                exercise["source"] = filename
+                exercises.append(exercise)
+    return exercises
+
+
+def _hint_code(hint: Optional[str]) -> Optional[str]:
+    """A dica como código ("Use print(5 + 3)" -> "print(5 + 3)"), se parecer código"""
+    if not hint:
+        return None
+    code = hint.strip()
+    if code.startswith("Use "):
+        code = code[len("Use "):]
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return None
+    return code
+
+
+class ExecutorBenchmark:
+    """Roda os programas em um SandboxPool configurado como o CodeExecutor"""
+
+    def __init__(
+        self,
+        workers: int,
+        fork_per_job: bool,
+        timeout: float,
+        line_budget: int = 0,
+        seed: Optional[int] = None
+    ):
+        self.allowed_imports = set(settings.ALLOWED_IMPORTS.split(","))
+        self.validator = CodeValidator(self.allowed_imports)
+        self.timeout = timeout
+        self.seed = seed
+        self.pool = SandboxPool(
+            size=workers,
+            max_jobs_per_worker=settings.SANDBOX_MAX_JOBS_PER_WORKER,
+            allowed_imports=self.allowed_imports,
+            memory_mb=settings.MAX_MEMORY_MB,
+            max_output=settings.MAX_OUTPUT_CHARS,
+            fork_per_job=fork_per_job,
+            line_budget=line_budget
+        )
+        self.samples: Dict[str, List[float]] = {"validation": [], "dispatch": [], "execution": []}
+
+    def start(self) -> float:
+        """Cria o pool e espera todos os workers responderem; retorna a duração"""
+        started = time.perf_counter()
+        self.pool.start()
+        warmup = marshal.dumps(compile("pass", "<string>", "exec"))
+        threads = [
+            threading.Thread(target=self.pool.run_cases, args=(warmup, [{"input_data": ""}], 30))
+            for _ in range(self.pool.size)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def shutdown(self) -> float:
+        started = time.perf_counter()
+        self.pool.shutdown()
+        return time.perf_counter() - started
+
+    def compile(self, code: str) -> Optional[bytes]:
+        """Validação sem cache (como um código novo no CodeExecutor)"""
+        started = time.perf_counter()
+        code_obj, _ = self.validator.validate(code)
+        bytecode = marshal.dumps(code_obj) if code_obj is not None else None
+        self.samples["validation"].append(time.perf_counter() - started)
+        return bytecode
+
+    def run(self, bytecode: bytes, input_data: str, expected_output: Optional[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        case = self.pool.run_cases(
+            bytecode,
+            [{"input_data": input_data, "expected_output": expected_output}],
+            timeout=self.timeout,
+            seed=self.seed
+        )[0]
+        wall = time.perf_counter() - started
+        self.samples["execution"].append(case["time"])
+        self.samples["dispatch"].append(max(0.0, wall - case["time"]))
+        return case
+
+    def measure(self, program: Dict[str, Any], iterations: int) -> Dict[str, Any]:
+        """Valida e executa um programa `iterations` vezes"""
+        statuses: Dict[str, int] = {}
+        passed = 0
+        for _ in range(iterations):
+            bytecode = self.compile(program["code"])
+            if bytecode is None:
+                statuses["invalid"] = statuses.get("invalid", 0) + 1
+                continue
+            case = self.run(bytecode, program.get("input_data", ""), program.get("expected_output"))
+            statuses[case["status"]] = statuses.get(case["status"], 0) + 1
+            passed += bool(case.get("passed"))
+        summary = {"name": program["name"], "kind": program["kind"], "statuses": statuses}
+        if program.get("expected_output") is not None:
+            summary["passed"] = passed
+        return summary
+
+    def throughput(self, programs: List[Dict[str, Any]], seconds: float) -> Dict[str, float]:
+        """Execuções/s com um cliente por worker, rodando os programas em ciclo"""
+        compiled = [
+            (self.compile(p["code"]), p.get("input_data", ""), p.get("expected_output"))
+            for p in programs
+        ]
+        compiled = [item for item in compiled if item[0] is not None]
+        counts = [0] * self.pool.size
+        deadline = time.perf_counter() + seconds
+
+        def client(index: int) -> None:
+            position = index
+            while time.perf_counter() < deadline:
+                bytecode, input_data, expected = compiled[position % len(compiled)]
+                self.pool.run_cases(
+                    bytecode,
+                    [{"input_data": input_data, "expected_output": expected}],
+                    timeout=self.timeout,
+                    seed=self.seed
+                )
+                counts[index] += 1
+                position += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(self.pool.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        total = sum(counts) / elapsed
+        return {
+            "executions": sum(counts),
+            "seconds": round(elapsed, 3),
+            "executions_per_sec": round(total, 2),
+            "executions_per_sec_per_worker": round(total / self.pool.size, 2),
+        }
+
+
+def _lifecycle_server(conn, allowed_imports: List[str], iterations: int) -> None:
+    """
+    Fork-server de teste: o mesmo preload e o mesmo ciclo fork -> filho
+    pronto -> saída -> waitpid do sandbox, com os tempos medidos pelo
+    próprio servidor (um único relógio).
+    """
+    _preload(allowed_imports)
+    startup: List[float] = []
+    teardown: List[float] = []
+    for _ in range(iterations):
+        ready_r, ready_w = os.pipe()
+        go_r, go_w = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            # Pronto: o filho do sandbox bloquearia aqui em conn.recv()
+            os.write(ready_w, b"1")
+            os.read(go_r, 1)
+            os.write(ready_w, b"2")
+            os._exit(0)
+        os.read(ready_r, 1)
+        startup.append(time.perf_counter() - forked)
+        os.write(go_w, b"1")
+        os.read(ready_r, 1)
+        exiting = time.perf_counter()
+        os.waitpid(pid, 0)
+        teardown.append(time.perf_counter() - exiting)
+        for fd in (ready_r, ready_w, go_r, go_w):
+            os.close(fd)
+    conn.send({"startup": startup, "teardown": teardown})
+    conn.close()
+
+
+def child_lifecycle(allowed_imports: List[str], iterations: int) -> Dict[str, List[float]]:
+    """Amostras (s) de startup e teardown do filho de cada execução"""
+    ctx = mp.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_lifecycle_server, args=(child_conn, allowed_imports, iterations))
+    process.start()
+    child_conn.close()
+    samples = parent_conn.recv()
+    process.join()
+    return samples
+
+
+def reference_programs(bench: ExecutorBenchmark, exercises: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Exercícios com a solução de referência (dica que passa ou print da saída)"""
+    programs = []
+    for index, exercise in enumerate(exercises, start=1):
+        program = {
+            "name": f"{exercise['source']}#{index} {exercise.get('titulo', '')}".strip(),
+            "kind": "exercise",
+            "input_data": exercise["input_data"],
+            "expected_output": exercise["expected_output"],
+            "code": f"print({exercise['expected_output']!r})\n",
+            "solution": "expected_output",
+        }
+        hint = _hint_code(exercise.get("dica"))
+        bytecode = bench.compile(hint) if hint else None
+        if bytecode is not None:
+            case = bench.run(bytecode, exercise["input_data"], exercise["expected_output"])
+            if case.get("passed"):
+                program["code"] = hint
+                program["solution"] = "hint"
+        programs.append(program)
+    # A escolha das soluções não entra nas medições
+    for samples in bench.samples.values():
+        samples.clear()
+    return programs
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark do executor de código")
+    parser.add_argument("--backend", choices=("fork", "reuse"), default="fork",
+                        help="fork: processo novo por job; reuse: workers reaproveitados")
+    parser.add_argument("--workers", type=int, default=settings.SANDBOX_POOL_SIZE or os.cpu_count() or 1)
+    parser.add_argument("--iterations", type=int, default=50, help="Execuções por programa")
+    parser.add_argument("--pathological-iterations", type=int, default=3)
+    parser.add_argument("--skip-pathological", action="store_true")
+    parser.add_argument("--timeout", type=float, default=settings.EXECUTION_TIMEOUT)
+    parser.add_argument("--line-budget", type=int, default=settings.EXECUTION_LINE_BUDGET)
+    parser.add_argument("--throughput-seconds", type=float, default=5)
+    parser.add_argument("--lifecycle-iterations", type=int, default=200,
+                        help="Filhos criados para medir startup/teardown por execução")
+    parser.add_argument("--output", help="Arquivo JSON (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    bench = ExecutorBenchmark(
+        workers=args.workers,
+        fork_per_job=args.backend == "fork",
+        timeout=args.timeout,
+        line_budget=args.line_budget,
+        seed=settings.EXECUTION_SEED if settings.EXECUTION_DETERMINISTIC else None
+    )
+    pool_startup = bench.start()
+    try:
+        exercises = load_seed_exercises()
+        programs = reference_programs(bench, exercises)
+        programs += [{**w, "kind": "workload"} for w in WORKLOADS]
+
+        results = [bench.measure(p, args.iterations) for p in programs]
+        phases = {name: percentiles(samples) for name, samples in bench.samples.items()}
+
+        pathological = []
+        if not args.skip_pathological:
+            for program in PATHOLOGICAL:
+                started = time.perf_counter()
+                summary = bench.measure({**program, "kind": "pathological"}, args.pathological_iterations)
+                summary["mean_wall_ms"] = round(
+                    (time.perf_counter() - started) / args.pathological_iterations * 1000, 3
+                )
+                pathological.append(summary)
+
+        throughput = bench.throughput(programs, args.throughput_seconds)
+    finally:
+        pool_teardown = bench.shutdown()
+
+    lifecycle = {"startup": [], "teardown": []}
+    if bench.pool.fork_per_job and hasattr(os, "fork"):
+        lifecycle = child_lifecycle(sorted(bench.allowed_imports), args.lifecycle_iterations)
+    phases["startup"] = percentiles(lifecycle["startup"], points=(50, 95, 99))
+    phases["teardown"] = percentiles(lifecycle["teardown"], points=(50, 95, 99))
+
+    report = {
+        "benchmark": "executor",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "backend": args.backend,
+            "workers": bench.pool.size,
+            "iterations": args.iterations,
+            "timeout": args.timeout,
+            "line_budget": args.line_budget,
+            "memory_mb": settings.MAX_MEMORY_MB,
+            "max_output": settings.MAX_OUTPUT_CHARS,
+            "deterministic": bench.seed is not None,
+        },
+        "exercises": {
+            "total": len(exercises),
+            "hint_solutions": sum(1 for p in programs if p.get("solution") == "hint"),
+        },
+        # Um valor por pool (não por execução: ver phases.startup/teardown)
+        "pool_startup_ms": round(pool_startup * 1000, 3),
+        "pool_teardown_ms": round(pool_teardown * 1000, 3),
+        "phases": phases,
+        "throughput": throughput,
+        "programs": results,
+        "pathological": pathological,
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
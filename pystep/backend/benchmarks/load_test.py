@@ -0,0 +1,271 @@
+"""
+API Load Test
+=============
+
+Teste de carga ponta a ponta da API com o cenário de uma aula: uma
+turma inteira começa ao mesmo tempo e cada aluno
+
+1. se cadastra (POST /api/auth/register)
+2. faz login (POST /api/auth/login)
+3. abre a trilha de lições (GET /api/lessons/user/{id})
+4. executa e submete exercícios (POST /api/execute/, modos run e submit)
+
+Relata vazão e latência p50/p95/p99 por rota, códigos de status e, no
+modo em processo, o atraso do event loop (um loop bloqueado por código
+síncrono aparece aqui antes de aparecer em produção).
+
+Modos:
+- Em processo (padrão): httpx.ASGITransport com a própria app, incluindo
+  o lifespan (pool do sandbox, consumidores da fila). Use um banco
+  separado, pois o teste cria usuários e submissões:
+      DATABASE_URL=sqlite:///./loadtest.db python -m benchmarks.load_test
+- Servidor rodando (uvicorn local ou remoto):
+      python -m benchmarks.load_test --base-url http://localhost:8000
+
+Sem exercícios no banco, use --seed para criar uma lição e um exercício
+de teste pela API.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.stats import percentiles
+
+
+PERCENTILES = (50, 95, 99)
+
+WRONG_SOLUTION = "print('resposta errada')\n"
+
+SEED_LESSON = {
+    "nivel": 1,
+    "titulo": "Teste de carga",
+    "descricao": "Lição criada pelo teste de carga",
+    "ordem": 999,
+}
+
+SEED_EXERCISE = {
+    "titulo": "Soma (teste de carga)",
+    "descricao": "Exiba a soma de 2 + 3",
+    "expected_output": "5",
+    "ordem": 1,
+}
+
+
+class LoadRecorder:
+    """Latências e status por rota (rota = caminho com os parâmetros como {id})"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        route: str,
+        url: str,
+        **kwargs: Any
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[route].append(time.perf_counter() - started)
+            self.statuses[route][type(e).__name__] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][str(response.status_code)] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            statuses = dict(self.statuses[route])
+            errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+            routes[route] = {
+                **percentiles(samples, PERCENTILES),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "errors": errors,
+                "statuses": statuses,
+            }
+        total = [s for samples in self.latencies.values() for s in samples]
+        return {
+            "routes": routes,
+            "total": {
+                **percentiles(total, PERCENTILES),
+                "throughput_rps": round(len(total) / elapsed, 2),
+            },
+        }
+
+
+async def _monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Atraso do event loop: quanto um sleep(interval) passa do previsto"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def _seed(client: httpx.AsyncClient) -> None:
+    """Cria uma lição e um exercício de teste pela API"""
+    response = await client.post("/api/lessons/", json=SEED_LESSON)
+    response.raise_for_status()
+    exercise = {**SEED_EXERCISE, "lesson_id": response.json()["id"]}
+    (await client.post("/api/exercises/", json=exercise)).raise_for_status()
+
+
+async def student(
+    index: int,
+    client: httpx.AsyncClient,
+    recorder: LoadRecorder,
+    exercises: List[Dict[str, Any]],
+    start: asyncio.Event,
+    args: argparse.Namespace,
+    run_id: str
+) -> None:
+    """Sessão de um aluno: cadastro, login, trilha e execuções"""
+    rng = random.Random(index)
+    credentials = {"email": f"aluno{index}-{run_id}@loadtest.pystep.dev", "password": "senha-teste"}
+    await start.wait()
+
+    response = await recorder.request(
+        client, "POST", "/api/auth/register", "/api/auth/register",
+        json={**credentials, "nome": f"Aluno {index}"}
+    )
+    if response is None or response.status_code != 201:
+        return
+    response = await recorder.request(
+        client, "POST", "/api/auth/login", "/api/auth/login", json=credentials
+    )
+    if response is None or response.status_code != 200:
+        return
+    body = response.json()
+    user_id = body["user"]["id"]
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+
+    await recorder.request(
+        client, "GET", "/api/lessons/user/{id}", f"/api/lessons/user/{user_id}", headers=headers
+    )
+
+    for attempt in range(args.submissions):
+        exercise = exercises[(index + attempt) % len(exercises)]
+        correct = rng.random() >= args.wrong_ratio
+        code = f"print({exercise['expected_output']!r})\n" if correct else WRONG_SOLUTION
+        for mode in ("run", "submit") if args.run_before_submit else ("submit",):
+            await asyncio.sleep(rng.uniform(0, args.think_time))
+            await recorder.request(
+                client, "POST", f"/api/execute/ [{mode}]", "/api/execute/",
+                headers=headers,
+                json={"code": code, "exercise_id": exercise["id"], "mode": mode}
+            )
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    async with AsyncExitStack() as stack:
+        if args.base_url:
+            client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        else:
+            from app.main import app
+
+            # ASGITransport não dispara o lifespan: pool e workers sobem aqui
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = httpx.AsyncClient(
+                # Exceções da app viram 500 no relatório em vez de abortar o teste
+                transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+                base_url="http://loadtest",
+                timeout=args.timeout
+            )
+        await stack.enter_async_context(client)
+
+        exercises = (await client.get("/api/exercises/")).json()
+        if not exercises and args.seed:
+            await _seed(client)
+            exercises = (await client.get("/api/exercises/")).json()
+        if not exercises:
+            raise SystemExit("Nenhum exercício cadastrado (use --seed ou rode seed_lessons.py)")
+
+        recorder = LoadRecorder()
+        start = asyncio.Event()
+        run_id = uuid.uuid4().hex[:8]
+        tasks = [
+            asyncio.create_task(student(i, client, recorder, exercises, start, args, run_id))
+            for i in range(args.students)
+        ]
+
+        lag: List[float] = []
+        stop = asyncio.Event()
+        monitor = None if args.base_url else asyncio.create_task(_monitor_loop_lag(lag, stop))
+
+        # Todos começam juntos: o pico do início da aula
+        started = time.perf_counter()
+        start.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        if monitor is not None:
+            await monitor
+
+    report = {
+        "benchmark": "api_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "target": args.base_url or "in-process",
+            "students": args.students,
+            "submissions": args.submissions,
+            "run_before_submit": args.run_before_submit,
+            "wrong_ratio": args.wrong_ratio,
+            "think_time": args.think_time,
+            "exercises": len(exercises),
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        **recorder.report(elapsed),
+    }
+    if not args.base_url:
+        report["event_loop_lag"] = percentiles(lag, PERCENTILES)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Teste de carga da API (cenário de aula)")
+    parser.add_argument("--base-url", help="URL de um servidor rodando (padrão: app em processo)")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--submissions", type=int, default=3, help="Exercícios submetidos por aluno")
+    parser.add_argument("--run-before-submit", action="store_true",
+                        help="Clica em Executar (mode=run) antes de cada submissão")
+    parser.add_argument("--wrong-ratio", type=float, default=0.3, help="Fração de respostas erradas")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Pausa máxima (s, aleatória) antes de cada execução")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", action="store_true", help="Criar um exercício se o banco estiver vazio")
+    parser.add_argument("--output", help="Arquivo JSON (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load_test(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Estatísticas comuns aos benchmarks.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+
+def percentiles(samples: List[float], points: Iterable[int] = (50, 90, 99)) -> Dict[str, Optional[float]]:
+    """Contagem, percentis (nearest-rank), máximo e média, em ms (amostras em segundos)"""
+    points = tuple(points)
+    if not samples:
+        return {"count": 0, **{f"p{p}": None for p in points}, "max": None, "mean": None}
+    ordered = sorted(samples)
+
+    def rank(p: int) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        "count": len(ordered),
+        **{f"p{p}": round(rank(p) * 1000, 3) for p in points},
+        "max": round(ordered[-1] * 1000, 3),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
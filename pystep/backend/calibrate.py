@@ -0,0 +1,91 @@
+"""
+Calibração dos Limites por Exercício
+====================================
+
+Roda a solução de referência de cada exercício várias vezes e grava os
+limites de tempo e memória usados na correção (ver
+app/services/calibration.py).
+
+Uso:
+    python calibrate.py --all
+    python calibrate.py --exercise 12 --runs 50 --factor 4
+    python calibrate.py --all --dry-run    # só mostra os limites
+    python calibrate.py --all --clear      # volta aos limites globais
+
+Rode com a máquina ociosa: a carga de outros processos infla as medições.
+Depois de recalibrar, reinicie a API (o cache de resultados usa os
+limites na chave, então resultados antigos não são reaproveitados).
+"""
+
+import argparse
+
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import engine, Base, SessionLocal
+from app.models import Exercise
+from app.services.calibration import CalibrationError, baseline_rss_kb, calibrate
+from app.services.executor import executor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra os limites de tempo/memória dos exercícios")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--exercise", type=int, action="append", help="ID do exercício (repetível)")
+    target.add_argument("--all", action="store_true", help="Todos os exercícios com solução de referência")
+    parser.add_argument("--runs", type=int, default=settings.EXECUTION_BUDGET_RUNS)
+    parser.add_argument("--factor", type=float, default=settings.EXECUTION_BUDGET_FACTOR,
+                        help="Limite = fator x p95 da solução")
+    parser.add_argument("--dry-run", action="store_true", help="Não grava no banco")
+    parser.add_argument("--clear", action="store_true", help="Remove os limites calibrados")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    query = db.query(Exercise).options(selectinload(Exercise.test_cases)).order_by(Exercise.id)
+    if args.all:
+        exercises = query.all() if args.clear else query.filter(Exercise.reference_solution.isnot(None)).all()
+    else:
+        exercises = query.filter(Exercise.id.in_(args.exercise)).all()
+
+    if args.clear:
+        for exercise in exercises:
+            exercise.time_budget = None
+            exercise.memory_budget_mb = None
+        if not args.dry_run:
+            db.commit()
+        db.close()
+        print(f"🧹 Limites removidos de {len(exercises)} exercícios")
+        return
+
+    executor.start()
+    calibrated = failed = 0
+    try:
+        baseline = baseline_rss_kb(executor)
+        for exercise in exercises:
+            try:
+                budget = calibrate(executor, exercise, args.runs, args.factor, baseline)
+            except CalibrationError as e:
+                failed += 1
+                print(f"❌ Exercício {exercise.id} ({exercise.titulo}): {e}")
+                continue
+            memory = f"{budget['memory_budget_mb']} MB" if budget["memory_budget_mb"] else "padrão"
+            print(
+                f"⏱️  Exercício {exercise.id} ({exercise.titulo}): p95 {budget['p95_time'] * 1000:.0f} ms "
+                f"→ limite {budget['time_budget']:g}s, memória {memory}"
+            )
+            exercise.time_budget = budget["time_budget"]
+            exercise.memory_budget_mb = budget["memory_budget_mb"]
+            calibrated += 1
+        if not args.dry_run:
+            db.commit()
+    finally:
+        executor.shutdown()
+        db.close()
+
+    suffix = " (dry run: nada gravado)" if args.dry_run else ""
+    print(f"✅ {calibrated} exercícios calibrados, {failed} com erro{suffix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Recorreção em Massa
+===================
+
+Recorrige as submissões guardadas depois que a correção de um exercício
+muda (expected_output ou casos de teste corrigidos no banco).
+
+Uso:
+    python regrade.py --exercise 12 --exercise 15
+    python regrade.py --all --concurrency 4
+
+Roda fora da API, com o próprio pool do sandbox; para recorrigir pela
+API em execução use POST /api/exercises/{id}/regrade.
+"""
+
+import asyncio
+import argparse
+
+from app.core.database import engine, Base, SessionLocal
+from app.models import Exercise
+from app.services.executor import executor
+from app.services.regrade import RegradeService, RegradeJob
+from app.services.scheduler import scheduler
+
+
+def _print_progress(job: RegradeJob) -> None:
+    view = job.view()
+    print(
+        f"   exercício {view['exercise_id']}: {view['processed']}/{view['total']} "
+        f"({view['changed']} alterados, {view['errors']} erros, {view['rate']}/s)"
+    )
+
+
+async def regrade(exercise_ids, concurrency=None):
+    service = RegradeService(executor, scheduler, concurrency=concurrency)
+    jobs = []
+    for exercise_id in exercise_ids:
+        print(f"🔁 Recorrigindo exercício {exercise_id}...")
+        job = await service.run(RegradeJob(exercise_id), on_progress=_print_progress)
+        if job.error:
+            print(f"❌ Exercício {exercise_id}: {job.error}")
+        jobs.append(job)
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recorrige submissões de exercícios")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--exercise", type=int, action="append", help="ID do exercício (repetível)")
+    target.add_argument("--all", action="store_true", help="Todos os exercícios")
+    parser.add_argument("--concurrency", type=int, help="Correções em paralelo (padrão: slots batch do pool)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    if args.all:
+        db = SessionLocal()
+        try:
+            exercise_ids = [row.id for row in db.query(Exercise.id).order_by(Exercise.id)]
+        finally:
+            db.close()
+    else:
+        exercise_ids = args.exercise
+
+    executor.start()
+    try:
+        jobs = asyncio.run(regrade(exercise_ids, args.concurrency))
+    finally:
+        executor.shutdown()
+
+    processed = sum(job.processed for job in jobs)
+    changed = sum(job.changed for job in jobs)
+    print(f"✅ {processed} submissões recorrigidas, {changed} com resultado alterado")
+
+
+if __name__ == "__main__":
+    main()
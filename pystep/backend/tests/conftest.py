@@ -0,0 +1,47 @@
+"""
+Configuração comum dos testes.
+
+As variáveis de ambiente são definidas antes de qualquer import de `app`:
+banco SQLite temporário, sem IA, sandbox pequeno e sem consumidores da
+fila dentro da API.
+"""
+
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="pystep-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}",
+    "DEBUG": "False",
+    "OPENAI_API_KEY": "",
+    "SANDBOX_POOL_SIZE": "2",
+    "JOB_QUEUE_BACKEND": "memory",
+    "JOB_QUEUE_LOCAL_CONSUMERS": "0",
+    "FEEDBACK_CACHE_BACKEND": "memory",
+    "EXECUTION_DETERMINISTIC": "False",
+})
+
+import pytest  # noqa: E402
+
+from app.core.database import Base, engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Tabelas criadas uma vez para a sessão de testes"""
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="session")
+def started_executor():
+    """O executor global com o pool do sandbox rodando"""
+    from app.services.executor import executor
+
+    executor.start()
+    yield executor
+    executor.shutdown()
@@ -0,0 +1,162 @@
+"""Testes do single-flight e do cache de feedback da IA tutora"""
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.ai_tutor import AITutor
+
+
+RESULT = {"status": "success", "output": "3\n", "error": "", "passed": False}
+EXPECTED = "4"
+FEEDBACK = {
+    "feedback": "Quase lá",
+    "hint": "Confira a soma",
+    "encouragement": "Continue!",
+    "severity": "warning",
+    "suggestions": [],
+}
+
+
+@pytest.fixture
+def tutor():
+    return AITutor()
+
+
+def _analyze_async(tutor, exercise_id=1):
+    return tutor._ai_analysis_async("print(3)", dict(RESULT), "Some 2 + 2", EXPECTED, 1, exercise_id)
+
+
+def _completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+async def test_concurrent_requests_share_one_call(tutor, monkeypatch):
+    calls = 0
+
+    async def complete(messages, **params):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return json.dumps(FEEDBACK)
+
+    monkeypatch.setattr(tutor, "_complete_async", complete)
+
+    results = await asyncio.gather(*(_analyze_async(tutor) for _ in range(10)))
+
+    assert calls == 1
+    assert tutor.coalesced == 9
+    assert all(result == FEEDBACK for result in results)
+    # Cada pedido recebe a sua cópia
+    results[0]["suggestions"].append("x")
+    assert results[1]["suggestions"] == []
+    # A próxima falha igual vem do cache, sem IA
+    assert tutor.feedback_cache.get(tutor.feedback_cache.key(1, RESULT, EXPECTED, 1)) == FEEDBACK
+    assert tutor._inflight == {}
+
+
+async def test_requests_without_exercise_are_not_coalesced(tutor, monkeypatch):
+    calls = 0
+
+    async def complete(messages, **params):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return json.dumps(FEEDBACK)
+
+    monkeypatch.setattr(tutor, "_complete_async", complete)
+
+    await asyncio.gather(*(_analyze_async(tutor, exercise_id=None) for _ in range(3)))
+
+    assert calls == 3
+    assert tutor.coalesced == 0
+
+
+async def test_failed_call_falls_back_for_every_waiter(tutor, monkeypatch):
+    async def complete(messages, **params):
+        await asyncio.sleep(0.01)
+        raise TimeoutError()
+
+    monkeypatch.setattr(tutor, "_complete_async", complete)
+
+    results = await asyncio.gather(*(_analyze_async(tutor) for _ in range(3)))
+
+    assert all(result["severity"] == "warning" for result in results)
+    assert tutor.feedback_cache.get(tutor.feedback_cache.key(1, RESULT, EXPECTED, 1)) is None
+    assert tutor._inflight == {}
+
+
+async def test_cancelled_request_does_not_cancel_shared_call(tutor, monkeypatch):
+    async def complete(messages, **params):
+        await asyncio.sleep(0.05)
+        return json.dumps(FEEDBACK)
+
+    monkeypatch.setattr(tutor, "_complete_async", complete)
+
+    first = asyncio.create_task(_analyze_async(tutor))
+    second = asyncio.create_task(_analyze_async(tutor))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == FEEDBACK
+
+
+def test_sync_threads_share_one_call(tutor):
+    calls = 0
+    lock = threading.Lock()
+
+    def create(**params):
+        nonlocal calls
+        with lock:
+            calls += 1
+        time.sleep(0.1)
+        return _completion(json.dumps(FEEDBACK))
+
+    tutor.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    results = []
+
+    def analyze():
+        results.append(tutor._ai_analysis("print(3)", dict(RESULT), "Some 2 + 2", EXPECTED, 1, 1))
+
+    threads = [threading.Thread(target=analyze) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == 1
+    assert tutor.coalesced == 4
+    assert results == [FEEDBACK] * 5
+    assert tutor._inflight_sync == {}
+
+
+def test_sync_failure_releases_waiters(tutor):
+    def create(**params):
+        time.sleep(0.05)
+        raise RuntimeError("indisponível")
+
+    tutor.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    results = []
+
+    def analyze():
+        results.append(tutor._ai_analysis("print(3)", dict(RESULT), "Some 2 + 2", EXPECTED, 1, 1))
+
+    threads = [threading.Thread(target=analyze) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(results) == 3
+    assert all(result["severity"] == "warning" for result in results)
+    assert tutor._inflight_sync == {}
+
+
+async def test_instant_feedback_without_api_key(tutor):
+    feedback = await tutor.instant_feedback("print(3)", dict(RESULT), EXPECTED, exercise_id=1)
+
+    assert feedback["severity"] == "warning"
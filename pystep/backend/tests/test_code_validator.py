@@ -0,0 +1,118 @@
+"""Testes da validação de código e da detecção de loops infinitos"""
+
+import time
+
+import pytest
+
+from app.services.code_validator import CodeValidator
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return CodeValidator(allowed_imports={"math", "random"})
+
+
+def _endless(validator, code: str) -> bool:
+    _, error = validator.validate(code)
+    return bool(error and error.startswith("Loop infinito"))
+
+
+@pytest.mark.parametrize("code", [
+    "while True:\n    pass",
+    "while True: pass",
+    "x = 0\nwhile x < 10:\n    print(x)",
+    "c = 0\nwhile c != 5:\n    print('oi')",
+    "a = 1\nb = 2\nwhile a < 5 and b < 5:\n    print(a, b)",
+    "x = 1\nwhile True:\n    while x:\n        break\n    print(x)",
+    "y = 1\nwhile True:\n    print(y)",
+    "x = 2\nwhile True:\n    print(x * 3 - 1, -x)",
+    "x = 'a'\nwhile True:\n    print(x == 1)",
+    "x = 1\nwhile True:\n    print(f'{x}')",
+    "done = False\nwhile not done:\n    print('x')",
+    "x = 0\nwhile x < 10:\n    y = x + 1",
+    "t = (1, 2)\nwhile t:\n    print('x')",
+    "n = 0\nwhile n < 3:\n    print('n', n)",
+])
+def test_endless_loop_is_rejected(validator, code):
+    assert _endless(validator, code)
+
+
+@pytest.mark.parametrize("code", [
+    "x = 0\nwhile x < 10:\n    print(x)\n    x += 1",
+    "x = 20\nwhile x < 10:\n    print(x)",
+    "x = int(input())\nwhile x < 10:\n    print(x)",
+    "while True:\n    n = input()\n    print(n)",
+    "while True:\n    if x: break",
+    "while True:\n    for i in range(3):\n        break",
+    "x = 1\nwhile True:\n    while x:\n        pass\n    else:\n        break",
+    "def f():\n    while True: pass",
+    "x = 0\ndef f():\n    global x\n    x = 5\nwhile x < 3:\n    print(x)",
+    "while 1:\n    x = 1\n    y = x + 1",
+    "while True:\n    x = 1/0",
+    "while True:\n    print(y)",
+    "x = 0\nwhile x < 10:\n    lista[x] = 1",
+    "while True:\n    try:\n        pass\n    except: pass",
+    "d = {}\nd['a'] = 1\nwhile not d:\n    print('vazio')\nprint('fim')",
+    "l = []\nl.append(1)\nwhile not l:\n    print('x')",
+    "while True:\n    print('a', sep=1)",
+    "while True:\n    print(*x)",
+    "def print(x):\n    return 1/0\nwhile True:\n    print('a')",
+    "print = len\nwhile True:\n    print('a')",
+    "if False:\n    y = 1\nwhile True:\n    print(y)",
+    "x = 1\ndel x\nwhile True:\n    print(x)",
+    # Operações que lançam exceção com valores que não são números
+    'n = 0\nwhile n < 10:\n    print("n: " + n)',
+    "x = 'a'\nwhile True:\n    print(-x)",
+    "x = 'a'\nwhile True:\n    print(x < 1)",
+    "x = 1\nwhile True:\n    print({[x]: 1})",
+    "x = 1.5\nwhile True:\n    print(f'{x:d}')",
+    # Nome definido só depois do loop: NameError na primeira volta
+    "while True:\n    print(y)\ny = 1",
+])
+def test_loop_that_can_end_is_accepted(validator, code):
+    assert not _endless(validator, code)
+
+
+def test_endless_loop_message_names_the_variable(validator):
+    _, error = validator.validate("x = 0\nwhile x < 10:\n    print(x)")
+
+    assert "linha 2" in error
+    assert "x += 1" in error
+
+
+def test_many_statements_scale_linearly(validator):
+    small = "\n".join(f"x{i} = {i}" for i in range(500)) + "\nwhile x0 < 1:\n    print(x0)"
+    large = "\n".join(f"x{i} = {i}" for i in range(4000)) + "\nwhile x0 < 1:\n    print(x0)"
+
+    start = time.perf_counter()
+    assert _endless(validator, small)
+    small_time = time.perf_counter() - start
+    start = time.perf_counter()
+    assert _endless(validator, large)
+    large_time = time.perf_counter() - start
+
+    # 8x mais código: longe de 64x (quadrático)
+    assert large_time < small_time * 30
+
+
+@pytest.mark.parametrize("code, message", [
+    ("import os", "Import não permitido: os"),
+    ("from subprocess import run", "Import não permitido: subprocess"),
+    ("from . import x", "Import relativo não permitido"),
+    ("eval('1')", "Função não permitida: eval"),
+    ("open('x')", "Função não permitida: open"),
+    ("print(().__class__)", "Acesso ao atributo não permitido: __class__"),
+    ("print(1", "Erro de sintaxe na linha 1"),
+])
+def test_unsafe_code_is_rejected(validator, code, message):
+    code_obj, error = validator.validate(code)
+
+    assert code_obj is None
+    assert message in error
+
+
+def test_valid_code_is_compiled(validator):
+    code_obj, error = validator.validate("import math\nprint(math.sqrt(4))")
+
+    assert error is None
+    assert code_obj.co_filename == "<string>"
@@ -0,0 +1,92 @@
+"""Testes do streaming da execução (executor.stream e WebSocket /stream)"""
+
+import asyncio
+import gc
+from contextlib import aclosing
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.main import app
+from app.services.executor import ExecutionError, StreamCancelled, executor
+
+
+NOISY_CODE = "for i in range(100000):\n    print('x' * 50)\n"
+
+
+@pytest.fixture
+def client(database):
+    with TestClient(app) as client:
+        yield client
+
+
+def _frames(client, request):
+    """Todos os frames até o servidor fechar, e o código de fechamento"""
+    frames = []
+    with client.websocket_connect("/api/execute/stream") as websocket:
+        websocket.send_json(request)
+        try:
+            while True:
+                frames.append(websocket.receive_json())
+        except WebSocketDisconnect as e:
+            return frames, e.code
+
+
+def test_websocket_streams_output_and_result(client):
+    frames, code = _frames(client, {"code": "print('a')\nprint('b')"})
+
+    assert code == 1000
+    output = "".join(f["data"] for f in frames if f["type"] == "stdout")
+    assert output == "a\nb\n"
+    assert frames[-1]["type"] == "result"
+    assert frames[-1]["status"] == "success"
+
+
+@pytest.mark.parametrize("error, detail", [
+    (StreamCancelled(), "Execução interrompida"),
+    (ExecutionError("pool indisponível"), "Erro ao executar o código: pool indisponível"),
+])
+def test_websocket_reports_execution_errors(client, monkeypatch, error, detail):
+    async def stream(*args, **kwargs):
+        yield {"type": "stdout", "data": "1\n"}
+        raise error
+
+    monkeypatch.setattr(executor, "stream", stream)
+
+    frames, code = _frames(client, {"code": "print(1)"})
+
+    assert code == 1011
+    assert frames[0] == {"type": "stdout", "data": "1\n"}
+    assert frames[-1]["type"] == "error"
+    assert detail in frames[-1]["detail"]
+
+
+async def test_stream_early_exit_retrieves_worker_error(started_executor):
+    errors = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+
+    async with aclosing(started_executor.stream(NOISY_CODE, timeout=2)) as frames:
+        async for frame in frames:
+            assert frame["type"] == "stdout"
+            break
+
+    # O worker termina com StreamCancelled logo depois
+    await asyncio.sleep(1)
+    gc.collect()
+    await asyncio.sleep(0)
+    assert errors == []
+
+
+async def test_slow_consumer_cancels_stream(started_executor):
+    with pytest.raises(StreamCancelled):
+        async with aclosing(started_executor.stream(NOISY_CODE, timeout=0.5)) as frames:
+            slow = True
+            async for frame in frames:
+                if slow:
+                    await asyncio.sleep(1.5)
+                    slow = False
+
+    # O pool continua disponível
+    result = await started_executor.run("print('ok')")
+    assert result["output"] == "ok\n"
@@ -0,0 +1,120 @@
+"""Testes da fila de execuções em memória (MemoryJobQueue)"""
+
+import threading
+import time
+
+import pytest
+
+from app.services.job_queue import DONE, FAILED, QUEUED, RUNNING, MemoryJobQueue
+
+
+@pytest.fixture
+def queue():
+    return MemoryJobQueue(result_ttl=3600)
+
+
+def test_lifecycle(queue):
+    job_id = queue.enqueue({"code": "print(1)"})
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.pending() == 1
+
+    claimed_id, payload = queue.claim(timeout=0)
+    assert claimed_id == job_id
+    assert payload == {"code": "print(1)"}
+    assert queue.get(job_id)["status"] == RUNNING
+    assert queue.stats() == {"backend": "memory", "pending": 0, "running": 1}
+
+    queue.complete(job_id, {"output": "1\n"})
+    job = queue.get(job_id)
+    assert job["status"] == DONE
+    assert job["result"] == {"output": "1\n"}
+
+
+def test_fail(queue):
+    job_id = queue.enqueue({})
+    queue.claim(timeout=0)
+
+    queue.fail(job_id, "boom")
+
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == "boom"
+
+
+def test_claim_is_fifo_and_times_out(queue):
+    first = queue.enqueue({"n": 1})
+    second = queue.enqueue({"n": 2})
+
+    assert queue.claim(timeout=0)[0] == first
+    assert queue.claim(timeout=0)[0] == second
+    assert queue.claim(timeout=0.05) is None
+
+
+def test_stale_job_is_requeued(queue):
+    job_id = queue.enqueue({"n": 1})
+    queue.claim(timeout=0)
+    # Lease ainda válido
+    assert queue.requeue_stale(lease=60) == 0
+
+    time.sleep(0.05)
+    assert queue.requeue_stale(lease=0.01) == 1
+    assert queue.get(job_id)["status"] == QUEUED
+
+    # Outro worker pega o job de novo, com o mesmo payload
+    assert queue.claim(timeout=0) == (job_id, {"n": 1})
+
+
+def test_touch_renews_lease(queue):
+    job_id = queue.enqueue({})
+    queue.claim(timeout=0)
+
+    time.sleep(0.05)
+    queue.touch(job_id)
+
+    assert queue.requeue_stale(lease=0.04) == 0
+    assert queue.get(job_id)["status"] == RUNNING
+
+
+def test_finished_jobs_are_not_requeued(queue):
+    job_id = queue.enqueue({})
+    queue.claim(timeout=0)
+    queue.complete(job_id, {})
+
+    time.sleep(0.02)
+    assert queue.requeue_stale(lease=0.01) == 0
+    assert queue.get(job_id)["status"] == DONE
+
+
+def test_wait_returns_when_job_completes(queue):
+    job_id = queue.enqueue({})
+
+    def worker():
+        claimed_id, _ = queue.claim(timeout=1)
+        time.sleep(0.05)
+        queue.complete(claimed_id, {"ok": True})
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    job = queue.wait(job_id, timeout=5)
+    thread.join()
+
+    assert job["status"] == DONE
+    assert job["result"] == {"ok": True}
+
+
+def test_wait_timeout_returns_current_state(queue):
+    job_id = queue.enqueue({})
+
+    assert queue.wait(job_id, timeout=0.05)["status"] == QUEUED
+    assert queue.wait("desconhecido", timeout=0.05) is None
+
+
+def test_expired_results_are_dropped():
+    queue = MemoryJobQueue(result_ttl=0)
+    job_id = queue.enqueue({})
+    queue.claim(timeout=0)
+    queue.complete(job_id, {})
+
+    time.sleep(0.01)
+    queue.enqueue({})
+    assert queue.get(job_id) is None
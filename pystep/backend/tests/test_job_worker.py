@@ -0,0 +1,94 @@
+"""Testes dos consumidores da fila de execuções (JobWorker)"""
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.models import Exercise, Lesson, Submission, User
+from app.services.job_queue import DONE, FAILED, MemoryJobQueue
+from app.services.job_worker import JobWorker, process_job
+
+
+@pytest.fixture(scope="module")
+def exercise(database):
+    db = SessionLocal()
+    try:
+        user = User(email="aluno@pystep.dev", nome="Aluno", hashed_password="x")
+        lesson = Lesson(nivel=1, titulo="Soma", descricao="Soma", ordem=1)
+        db.add_all([user, lesson])
+        db.flush()
+        exercise = Exercise(
+            lesson_id=lesson.id,
+            titulo="Dobro",
+            descricao="Imprima o dobro do número",
+            expected_output="42",
+            input_data="21",
+            ordem=1
+        )
+        db.add(exercise)
+        db.commit()
+        yield {"exercise_id": exercise.id, "user_id": user.id}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def worker(started_executor):
+    queue = MemoryJobQueue()
+    worker = JobWorker(queue, started_executor, concurrency=2)
+    worker.POLL_SECONDS = 0.1
+    worker.start()
+    yield worker
+    worker.stop()
+
+
+def _submissions(job_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Submission).filter(Submission.job_id == job_id).count()
+    finally:
+        db.close()
+
+
+def test_submit_job(worker, exercise):
+    job_id = worker.queue.enqueue({"code": "print(int(input()) * 2)", "mode": "submit", **exercise})
+
+    job = worker.queue.wait(job_id, timeout=10)
+
+    assert job["status"] == DONE
+    assert job["result"]["passed"] is True
+    assert job["result"]["output"] == "42\n"
+    assert job["result"]["feedback"]["severity"] == "success"
+    assert _submissions(job_id) == 1
+    assert worker.stats()["processed"] == 1
+
+
+def test_run_job_is_not_graded(worker, exercise):
+    job_id = worker.queue.enqueue({"code": "print('oi')", "mode": "run", **exercise})
+
+    job = worker.queue.wait(job_id, timeout=10)
+
+    assert job["status"] == DONE
+    assert job["result"]["output"] == "oi\n"
+    assert "passed" not in job["result"]
+    assert _submissions(job_id) == 0
+
+
+def test_missing_exercise_fails_job(worker):
+    job_id = worker.queue.enqueue({"code": "print(1)", "exercise_id": 999, "user_id": None})
+
+    job = worker.queue.wait(job_id, timeout=10)
+
+    assert job["status"] == FAILED
+    assert job["error"] == "Exercício não encontrado"
+
+
+def test_reprocessed_job_saves_one_submission(worker, exercise):
+    payload = {"code": "print(1)", "mode": "submit", **exercise}
+
+    # Mesmo job processado de novo depois do lease expirar
+    first = process_job(worker.executor, payload, worker.loop, job_id="lease-expirado")
+    second = process_job(worker.executor, payload, worker.loop, job_id="lease-expirado")
+
+    assert first["passed"] is False
+    assert second["output"] == first["output"]
+    assert _submissions("lease-expirado") == 1
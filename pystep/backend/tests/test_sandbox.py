@@ -0,0 +1,131 @@
+"""Testes do pool de processos do sandbox (fork-server)"""
+
+import marshal
+
+import pytest
+
+from app.services.sandbox import SandboxPool, SandboxTimeout
+
+
+def _bytecode(code: str) -> bytes:
+    return marshal.dumps(compile(code, "<string>", "exec"))
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(size=1, max_jobs_per_worker=100, allowed_imports={"math"}, max_output=1000)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_run_case_success(pool):
+    [result] = pool.run_cases(
+        _bytecode("print(int(input()) * 2)"),
+        [{"input_data": "21", "expected_output": "42"}],
+        timeout=5
+    )
+
+    assert result["status"] == "success"
+    assert result["output"] == "42\n"
+    assert result["passed"] is True
+    assert "queue_time" in result
+    assert result["stdout_bytes"] == 3
+
+
+def test_mismatch_reports_position(pool):
+    [result] = pool.run_cases(
+        _bytecode("print('abc')\nprint('xyz')"),
+        [{"input_data": "", "expected_output": "abc\nxyw"}],
+        timeout=5
+    )
+
+    assert result["status"] == "success"
+    assert result["passed"] is False
+    assert result["mismatch"]["line"] == 2
+
+
+def test_runtime_error(pool):
+    result = pool.run(_bytecode("1 / 0"), timeout=5)
+
+    assert result["status"] == "error"
+    assert result["error"].startswith("ZeroDivisionError")
+
+
+def test_blocked_import(pool):
+    result = pool.run(_bytecode("import os"), timeout=5)
+
+    assert result["status"] == "error"
+    assert "Import não permitido: os" in result["error"]
+
+
+def test_timeout_kills_worker_and_pool_recovers(pool):
+    with pytest.raises(SandboxTimeout):
+        pool.run(_bytecode("while True:\n    pass"), timeout=0.5)
+
+    result = pool.run(_bytecode("print('ok')"), timeout=5)
+    assert result["output"] == "ok\n"
+
+
+def test_jobs_do_not_share_state(pool):
+    pool.run(_bytecode("import math\nmath.pi = 3"), timeout=5)
+
+    result = pool.run(_bytecode("import math\nprint(math.pi > 3.1)"), timeout=5)
+    assert result["output"] == "True\n"
+
+
+def test_output_limit(pool):
+    result = pool.run(_bytecode("while True:\n    print('x' * 100)"), timeout=5)
+
+    assert result["status"] == "error"
+    assert "Limite de saída excedido" in result["error"]
+
+
+def test_fail_fast_stops_at_first_failure(pool):
+    cases = [
+        {"input_data": "1", "expected_output": "1"},
+        {"input_data": "2", "expected_output": "3"},
+        {"input_data": "3", "expected_output": "3"},
+    ]
+    code = _bytecode("print(input())")
+
+    results = pool.run_cases(code, cases, timeout=5, fail_fast=True)
+    assert [r["passed"] for r in results] == [True, False]
+
+    results = pool.run_cases(code, cases, timeout=5)
+    assert [r["passed"] for r in results] == [True, False, True]
+
+
+def test_streaming_output(pool):
+    chunks = []
+
+    [result] = pool.run_cases(
+        _bytecode("print('a')\nprint('b')"),
+        [{"input_data": ""}],
+        timeout=5,
+        on_output=lambda stream, data: chunks.append((stream, data))
+    )
+
+    assert result["status"] == "success"
+    assert result["output"] == ""
+    assert "".join(data for stream, data in chunks if stream == "stdout") == "a\nb\n"
+
+
+def test_deterministic_seed(pool):
+    code = _bytecode("import random\nprint(random.randint(0, 10**9))")
+
+    first = pool.run(code, timeout=5, seed=7)["output"]
+    second = pool.run(code, timeout=5, seed=7)["output"]
+    assert first == second
+
+
+def test_line_budget(pool):
+    [result] = pool.run_cases(
+        _bytecode("i = 0\nwhile i < 10**9:\n    i += 1"),
+        [{"input_data": ""}],
+        timeout=5,
+        line_budget=1000
+    )
+
+    assert result["status"] == "error"
+    assert "1000 linhas executadas" in result["error"]
@@ -0,0 +1,176 @@
+"""Testes do controle de admissão (ExecutionScheduler)"""
+
+import asyncio
+
+import pytest
+
+from app.services.scheduler import BATCH, INTERACTIVE, ExecutionScheduler, SchedulerBusy
+
+
+class _Holder:
+    """Ocupa um slot até release()"""
+
+    def __init__(self, scheduler: ExecutionScheduler, key: str, lane: str):
+        self._slot = scheduler.slot(key, lane)
+
+    async def acquire(self) -> "_Holder":
+        await self._slot.__aenter__()
+        return self
+
+    async def release(self) -> None:
+        await self._slot.__aexit__(None, None, None)
+
+
+async def _use_slot(scheduler, key, lane, order):
+    async with scheduler.slot(key, lane):
+        order.append((lane, key))
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_per_user_running_cap():
+    scheduler = ExecutionScheduler(capacity=2, interactive_reserved=0, max_running_per_user=1)
+    first = await _Holder(scheduler, "ana", BATCH).acquire()
+    order = []
+
+    second = asyncio.create_task(_use_slot(scheduler, "ana", BATCH, order))
+    await _settle()
+    # Há slot livre, mas ana já tem uma execução
+    assert order == []
+    assert scheduler.stats()["lanes"][BATCH]["queued"] == 1
+
+    await _use_slot(scheduler, "bia", BATCH, order)
+    assert order == [(BATCH, "bia")]
+
+    await first.release()
+    await second
+    assert order == [(BATCH, "bia"), (BATCH, "ana")]
+    assert scheduler.stats()["running"] == 0
+
+
+async def test_per_user_queue_cap():
+    scheduler = ExecutionScheduler(capacity=1, interactive_reserved=0, max_queued_per_user=1)
+    holder = await _Holder(scheduler, "ana", BATCH).acquire()
+    queued = asyncio.create_task(_use_slot(scheduler, "ana", BATCH, []))
+    await _settle()
+
+    with pytest.raises(SchedulerBusy) as busy:
+        async with scheduler.slot("ana", BATCH):
+            pass
+    assert busy.value.retry_after >= 1
+
+    queued.cancel()
+    await asyncio.gather(queued, return_exceptions=True)
+    assert scheduler.stats()["lanes"][BATCH]["queued"] == 0
+    await holder.release()
+    assert scheduler.stats()["running"] == 0
+
+
+async def test_lane_queue_full():
+    scheduler = ExecutionScheduler(capacity=1, interactive_reserved=0, queue_size=2)
+    holder = await _Holder(scheduler, "ana", BATCH).acquire()
+    order = []
+    waiting = [asyncio.create_task(_use_slot(scheduler, f"u{i}", BATCH, order)) for i in range(2)]
+    await _settle()
+
+    with pytest.raises(SchedulerBusy):
+        async with scheduler.slot("u9", BATCH):
+            pass
+
+    await holder.release()
+    await asyncio.gather(*waiting)
+    assert order == [(BATCH, "u0"), (BATCH, "u1")]
+
+
+async def test_weighted_round_robin_between_lanes():
+    scheduler = ExecutionScheduler(
+        capacity=1,
+        interactive_reserved=0,
+        interactive_weight=4,
+        batch_weight=1
+    )
+    holder = await _Holder(scheduler, "holder", BATCH).acquire()
+    order = []
+    tasks = []
+    for i in range(5):
+        tasks.append(asyncio.create_task(_use_slot(scheduler, f"i{i}", INTERACTIVE, order)))
+        tasks.append(asyncio.create_task(_use_slot(scheduler, f"b{i}", BATCH, order)))
+    await _settle()
+
+    await holder.release()
+    await asyncio.gather(*tasks)
+
+    lanes = [lane for lane, _ in order]
+    # Peso 4:1 (smooth weighted round-robin): a fila batch não fica sem vez
+    assert lanes[:5] == [INTERACTIVE, INTERACTIVE, BATCH, INTERACTIVE, INTERACTIVE]
+    assert lanes[5:] == [INTERACTIVE] + [BATCH] * 4
+
+
+async def test_round_robin_between_users():
+    scheduler = ExecutionScheduler(capacity=1, interactive_reserved=0, max_queued_per_user=3)
+    holder = await _Holder(scheduler, "holder", BATCH).acquire()
+    order = []
+    tasks = [asyncio.create_task(_use_slot(scheduler, "ana", BATCH, order)) for _ in range(3)]
+    tasks.append(asyncio.create_task(_use_slot(scheduler, "bia", BATCH, order)))
+    await _settle()
+
+    await holder.release()
+    await asyncio.gather(*tasks)
+
+    assert [key for _, key in order] == ["ana", "bia", "ana", "ana"]
+
+
+async def test_batch_does_not_take_interactive_reserve():
+    scheduler = ExecutionScheduler(capacity=2, interactive_reserved=1)
+    holder = await _Holder(scheduler, "ana", BATCH).acquire()
+    order = []
+
+    batch = asyncio.create_task(_use_slot(scheduler, "bia", BATCH, order))
+    await _settle()
+    assert order == []
+
+    await _use_slot(scheduler, "caio", INTERACTIVE, order)
+    assert order == [(INTERACTIVE, "caio")]
+
+    await holder.release()
+    await batch
+    assert order[-1] == (BATCH, "bia")
+
+
+async def test_rate_limit():
+    scheduler = ExecutionScheduler(capacity=1, rate_limit_requests=2, rate_limit_window=60)
+    for _ in range(2):
+        async with scheduler.slot("ana", INTERACTIVE):
+            pass
+
+    with pytest.raises(SchedulerBusy) as busy:
+        async with scheduler.slot("ana", INTERACTIVE):
+            pass
+    assert busy.value.retry_after >= 1
+    assert scheduler.stats()["rejected_rate_limit"] == 1
+
+    # Trabalho interno não conta para o limite de requisições
+    async with scheduler.slot("ana", BATCH, rate_limited=False):
+        pass
+    # Outro usuário tem a sua própria janela
+    async with scheduler.slot("bia", INTERACTIVE):
+        pass
+
+
+async def test_cancelled_waiter_leaves_queue():
+    scheduler = ExecutionScheduler(capacity=1, interactive_reserved=0)
+    holder = await _Holder(scheduler, "ana", BATCH).acquire()
+    order = []
+    cancelled = asyncio.create_task(_use_slot(scheduler, "bia", BATCH, order))
+    await _settle()
+
+    cancelled.cancel()
+    await asyncio.gather(cancelled, return_exceptions=True)
+    await holder.release()
+
+    await _use_slot(scheduler, "caio", BATCH, order)
+    assert order == [(BATCH, "caio")]
+    assert scheduler.stats()["running"] == 0
@@ -0,0 +1,52 @@
+"""
+Sandbox Worker - Consumidor da Fila de Execuções
+=================================================
+
+Processa os jobs enfileirados em POST /api/execute/jobs, em um processo
+separado da API (escala independente dos nós da API).
+
+Uso:
+    JOB_QUEUE_BACKEND=redis python worker.py
+
+Com o backend "memory" a fila só existe dentro da API; use os
+consumidores locais (JOB_QUEUE_LOCAL_CONSUMERS) em vez deste script.
+"""
+
+import signal
+
+from app.core.config import settings
+from app.core.database import engine, Base
+from app.services.executor import executor
+from app.services.job_queue import job_queue
+from app.services.job_worker import JobWorker
+
+
+def main():
+    if settings.JOB_QUEUE_BACKEND == "memory":
+        raise SystemExit("❌ JOB_QUEUE_BACKEND=memory: a fila não é compartilhada entre processos")
+    
+    if settings.FEEDBACK_CACHE_BACKEND != "redis":
+        print("⚠️  FEEDBACK_CACHE_BACKEND=memory: o feedback da IA dos jobs fica só na submissão")
+    
+    Base.metadata.create_all(bind=engine)
+    executor.start()
+    worker = JobWorker(job_queue, executor, concurrency=executor.pool.size)
+    
+    def handle_signal(signum, frame):
+        print("⏹️  Encerrando (aguardando jobs em andamento)...")
+        worker.stop()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    worker.start()
+    print(f"🧪 Worker iniciado: {worker.concurrency} consumidores ({settings.REDIS_URL})")
+    try:
+        worker.join()
+    finally:
+        executor.shutdown()
+        print(f"👋 Worker encerrado: {worker.processed} jobs processados, {worker.failed} falhas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
 import Editor from '@monaco-editor/react'
 import { lessonsAPI, exercisesAPI, executeAPI } from '../services/api'
 import { useAuthStore } from '../store/authStore'
 import { 
-  ArrowLeft, Play, Lightbulb, CheckCircle, XCircle, 
+  ArrowLeft, Play, Send, Lightbulb, CheckCircle, XCircle, 
   AlertCircle, Loader, Trophy 
 } from 'lucide-react'
 
@@ -20,12 +20,22 @@ export default function Lesson() {
   const [output, setOutput] = useState('')
   const [feedback, setFeedback] = useState(null)
   const [loading, setLoading] = useState(false)
-  const [executing, setExecuting] = useState(false)
+  // 'run' | 'submit' enquanto uma execução está em andamento
+  const [executing, setExecuting] = useState(null)
+  // Long polling do feedback em andamento (cancelado ao sair ou trocar de tentativa)
+  const feedbackPoll = useRef(null)
 
   useEffect(() => {
     loadLesson()
   }, [id])
 
+  useEffect(() => cancelFeedbackPoll, [])
+
+  const cancelFeedbackPoll = () => {
+    feedbackPoll.current?.abort()
+    feedbackPoll.current = null
+  }
+
   const loadLesson = async () => {
     setLoading(true)
     try {
@@ -47,9 +57,9 @@ export default function Lesson() {
     }
   }
 
+  // Execução rápida: só mostra a saída (sem correção, XP ou histórico)
   const handleRunCode = async () => {
-    setExecuting(true)
-    setFeedback(null)
+    setExecuting('run')
     
     try {
       const response = await executeAPI.run({
@@ -60,7 +70,36 @@ export default function Lesson() {
       
       const data = response.data
       setOutput(data.output || data.error)
-      setFeedback(data.feedback)
+    } catch (error) {
+      setOutput('Erro ao executar código')
+      console.error(error)
+    } finally {
+      setExecuting(null)
+    }
+  }
+
+  const handleSubmitCode = async () => {
+    cancelFeedbackPoll()
+    setExecuting('submit')
+    setFeedback(null)
+    
+    try {
+      const response = await executeAPI.submit({
+        code,
+        exercise_id: exercises[currentExercise].id,
+        input_data: ''
+      })
+      
+      const data = response.data
+      setOutput(data.output || data.error)
+      setFeedback(data.feedback || (data.feedback_ticket && {
+        feedback: data.passed ? '✅ Correto!' : '❌ Ainda não está certo.',
+        severity: data.passed ? 'success' : 'error',
+        encouragement: '🤖 A IA tutora está analisando seu código...'
+      }))
+      if (data.feedback_ticket) {
+        waitForFeedback(data.feedback_ticket)
+      }
       
       // Se passou, atualizar XP
       if (data.passed && data.xp_gained > 0) {
@@ -68,14 +107,39 @@ export default function Lesson() {
       }
       
     } catch (error) {
-      setOutput('Erro ao executar código')
+      setOutput('Erro ao enviar código')
       console.error(error)
     } finally {
-      setExecuting(false)
+      setExecuting(null)
+    }
+  }
+
+  const waitForFeedback = async (ticket) => {
+    cancelFeedbackPoll()
+    const controller = new AbortController()
+    feedbackPoll.current = controller
+    try {
+      let response = await executeAPI.getFeedback(ticket, 20, controller.signal)
+      while (response.data.status === 'pending' && !controller.signal.aborted) {
+        response = await executeAPI.getFeedback(ticket, 20, controller.signal)
+      }
+      // Resposta de uma tentativa anterior: descartar
+      if (!controller.signal.aborted && response.data.feedback) {
+        setFeedback(response.data.feedback)
+      }
+    } catch (error) {
+      if (!controller.signal.aborted) {
+        console.error('Erro ao buscar feedback:', error)
+      }
+    } finally {
+      if (feedbackPoll.current === controller) {
+        feedbackPoll.current = null
+      }
     }
   }
 
   const handleGetHint = async () => {
+    cancelFeedbackPoll()
     try {
       const response = await executeAPI.getHint(exercises[currentExercise].id, code)
       setFeedback({
@@ -89,6 +153,7 @@ export default function Lesson() {
   }
 
   const handleNextExercise = async () => {
+    cancelFeedbackPoll()
     if (currentExercise < exercises.length - 1) {
       setCurrentExercise(currentExercise + 1)
       setCode(exercises[currentExercise + 1].codigo_inicial)
@@ -236,23 +301,42 @@ export default function Lesson() {
             <div className="bg-white rounded-xl shadow overflow-hidden">
               <div className="bg-gray-800 px-6 py-3 flex items-center justify-between">
                 <span className="text-white font-semibold">editor.py</span>
-                <button
-                  onClick={handleRunCode}
-                  disabled={executing}
-                  className="flex items-center gap-2 px-4 py-2 bg-green-600 hover:bg-green-700 text-white rounded-lg transition disabled:opacity-50"
-                >
-                  {executing ? (
-                    <>
-                      <Loader className="w-4 h-4 animate-spin" />
-                      Executando...
-                    </>
-                  ) : (
-                    <>
-                      <Play className="w-4 h-4" />
-                      Executar
-                    </>
-                  )}
-                </button>
+                <div className="flex items-center gap-2">
+                  <button
+                    onClick={handleRunCode}
+                    disabled={executing !== null}
+                    className="flex items-center gap-2 px-4 py-2 bg-gray-600 hover:bg-gray-700 text-white rounded-lg transition disabled:opacity-50"
+                  >
+                    {executing === 'run' ? (
+                      <>
+                        <Loader className="w-4 h-4 animate-spin" />
+                        Executando...
+                      </>
+                    ) : (
+                      <>
+                        <Play className="w-4 h-4" />
+                        Executar
+                      </>
+                    )}
+                  </button>
+                  <button
+                    onClick={handleSubmitCode}
+                    disabled={executing !== null}
+                    className="flex items-center gap-2 px-4 py-2 bg-green-600 hover:bg-green-700 text-white rounded-lg transition disabled:opacity-50"
+                  >
+                    {executing === 'submit' ? (
+                      <>
+                        <Loader className="w-4 h-4 animate-spin" />
+                        Enviando...
+                      </>
+                    ) : (
+                      <>
+                        <Send className="w-4 h-4" />
+                        Enviar
+                      </>
+                    )}
+                  </button>
+                </div>
               </div>
               
               <Editor
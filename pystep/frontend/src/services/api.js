@@ -39,7 +39,13 @@ export const exercisesAPI = {
 
 // Execute
 export const executeAPI = {
-  run: (data) => api.post('/execute', data),
+  // Execução rápida, sem correção (fila interativa)
+  run: (data) => api.post('/execute', { ...data, mode: 'run' }),
+  // Submissão corrigida: feedback da IA, XP e histórico
+  submit: (data) => api.post('/execute', { ...data, mode: 'submit' }),
+  // Feedback da IA entregue depois do veredito (long polling)
+  getFeedback: (ticket, wait = 20, signal) =>
+    api.get(`/execute/feedback/${ticket}`, { params: { wait }, signal }),
   getHint: (exerciseId, code) => api.post('/execute/hint', { 
     exercise_id: exerciseId, 
     current_code: code 